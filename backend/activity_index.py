@@ -0,0 +1,240 @@
+# activity_index.py
+# Precomputed activity lists for popular destinations.
+#
+# A configured list of cities (data/popular_destinations.txt by default) is
+# generated ahead of time and stored in a local SQLite table keyed on the city
+# key, so /get_attractions answers them with one primary-key lookup; only
+# long-tail cities go to live generation. A background refresher keeps the
+# index current: it regenerates entries that are missing, older than
+# `max_age`, or whose retrieved context changed, at no more than
+# `rate_per_minute` model calls. Index entries are served even while they wait
+# for a refresh, so a fresh deploy reuses the existing index instead of
+# stampeding Gemini.
+#
+# Build or top up the index offline (uses the knowledge agent's model settings):
+#
+#   python backend/activity_index.py --destinations backend/data/popular_destinations.txt
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker refreshes on its own
+    fcntl = None
+
+import telemetry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(BACKEND_DIR, "cache", "activity_index.sqlite3")
+DEFAULT_DESTINATIONS_PATH = os.path.join(BACKEND_DIR, "data", "popular_destinations.txt")
+
+
+def load_destinations(path):
+    """City names from a text file, one per line; blank lines and # comments are skipped."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+class ActivityIndex:
+    """SQLite table of city key -> precomputed activity list."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS activities (
+                   city_key TEXT PRIMARY KEY,
+                   city TEXT NOT NULL,
+                   activities TEXT NOT NULL,
+                   context_hash TEXT NOT NULL,
+                   generated_at REAL NOT NULL
+               )"""
+        )
+        self._conn.commit()
+
+    def get(self, city_key):
+        """The indexed activity list for `city_key`, or None. Age is not checked here."""
+        with self._lock:
+            row = self._conn.execute("SELECT activities FROM activities WHERE city_key = ?", (city_key,)).fetchone()
+            self._stats["hits" if row else "misses"] += 1
+        return json.loads(row[0]) if row else None
+
+    def entry(self, city_key):
+        """(context hash, generated_at) of the indexed entry, or None."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT context_hash, generated_at FROM activities WHERE city_key = ?", (city_key,)
+            ).fetchone()
+
+    def set(self, city_key, city, ctx_hash, activities):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO activities (city_key, city, activities, context_hash, generated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (city_key, city, json.dumps(activities), ctx_hash, time.time()),
+            )
+            self._conn.commit()
+            self._stats["writes"] += 1
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["size"] = len(self)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class ActivityRefresher:
+    """
+    Keeps an ActivityIndex up to date for `destinations`.
+
+    `prepare(city)` must return (canonical city, context, (city key, context
+    hash)) and `generate(city, context)` the parsed activity list; both come
+    from the knowledge agent. Generations are spaced to `rate_per_minute`.
+    Only one process per index file refreshes at a time (file lock); the
+    others just serve what it writes.
+    """
+
+    def __init__(self, index, destinations, prepare, generate, rate_per_minute=30.0,
+                 max_age=7 * 86400.0, interval=3600.0):
+        self.index = index
+        self.destinations = list(destinations)
+        self.prepare = prepare
+        self.generate = generate
+        self.min_spacing = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.max_age = max_age
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_call = 0.0
+        self._stats = {"passes": 0, "generated": 0, "failed": 0, "up_to_date": 0, "last_pass_seconds": 0.0}
+
+    def due(self):
+        """
+        Destinations that need (re)generation, as prepare() tuples: missing
+        entries first, in list order, then stale ones, oldest first.
+        """
+        missing, stale = [], []
+        for name in self.destinations:
+            city, context, (key, ctx_hash) = self.prepare(name)
+            entry = self.index.entry(key)
+            if entry is None:
+                missing.append((city, context, (key, ctx_hash)))
+            elif entry[0] != ctx_hash or time.time() - entry[1] > self.max_age:
+                stale.append((entry[1], (city, context, (key, ctx_hash))))
+            else:
+                self._stats["up_to_date"] += 1
+        return missing + [item for _, item in sorted(stale, key=lambda pair: pair[0])]
+
+    def _wait_for_slot(self):
+        """Blocks until the next model call is allowed; False if stopping."""
+        delay = self._next_call - time.monotonic()
+        if delay > 0 and self._stop.wait(delay):
+            return False
+        self._next_call = time.monotonic() + self.min_spacing
+        return not self._stop.is_set()
+
+    def refresh_once(self):
+        """One incremental pass over the destinations. Returns the number generated."""
+        started = time.monotonic()
+        generated = 0
+        for city, context, (key, ctx_hash) in self.due():
+            if not self._wait_for_slot():
+                break
+            try:
+                self.index.set(key, city, ctx_hash, self.generate(city, context))
+                generated += 1
+                self._stats["generated"] += 1
+            except Exception as e:
+                # Keep the old entry (if any) and try again next pass.
+                telemetry.log(f"Activity index: refresh for {city} failed: {e}")
+                self._stats["failed"] += 1
+        self._stats["passes"] += 1
+        self._stats["last_pass_seconds"] = round(time.monotonic() - started, 1)
+        return generated
+
+    def _run(self):
+        lock_file = open(self.index.path + ".refresh.lock", "a")
+        try:
+            while not self._stop.is_set():
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # Another worker is the refresher; check again later.
+                        self._stop.wait(self.interval)
+                        continue
+                try:
+                    self.refresh_once()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+                self._stop.wait(self.interval)
+        finally:
+            lock_file.close()
+
+    def start(self):
+        """Starts the background refresher (first pass immediately: this is the warm-up)."""
+        if self._thread is None and self.destinations:
+            self._thread = threading.Thread(target=self._run, name="activity-index-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["destinations"] = len(self.destinations)
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or top up the precomputed activity index")
+    parser.add_argument("--destinations", default=DEFAULT_DESTINATIONS_PATH)
+    parser.add_argument("--index", default=None, help="index path (default: ACTIVITY_INDEX_PATH or cache/)")
+    parser.add_argument("--rate-per-minute", type=float, default=None,
+                        help="model calls per minute (default: ACTIVITY_INDEX_RATE_PER_MIN)")
+    args = parser.parse_args()
+
+    # The agent must not start its own background refresher for this run.
+    os.environ["ACTIVITY_INDEX_REFRESH"] = "0"
+    if args.index:
+        os.environ["ACTIVITY_INDEX_PATH"] = args.index
+    import knowledge_agent as agent
+
+    refresher = ActivityRefresher(
+        agent.ACTIVITY_INDEX, load_destinations(args.destinations), agent.prepare_city, agent.precompute_activities,
+        rate_per_minute=args.rate_per_minute or agent.ACTIVITY_INDEX_RATE_PER_MIN,
+        max_age=agent.ACTIVITY_INDEX_MAX_AGE,
+    )
+    generated = refresher.refresh_once()
+    stats = refresher.stats()
+    print(f"Generated {generated} entries ({stats['failed']} failed, {stats['up_to_date']} up to date) "
+          f"in {stats['last_pass_seconds']}s; index now holds {len(agent.ACTIVITY_INDEX)} cities.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# activity_prompt.py
+# Prompt construction and output parsing for the knowledge agent.
+#
+# Structured mode (the default) asks the model for a JSON array of short
+# strings under a hard output-token cap, instead of free prose that has to be
+# over-generated and stripped of bullets afterwards. Retrieved passages are
+# trimmed to a token budget that scales with their relevance: the budget
+# shrinks with the best passage's score, is split between passages in
+# proportion to their scores, and passages far below the best get nothing;
+# weak matches mostly add prompt tokens, not facts.
+#
+# Parsing takes whatever comes back in either mode: a JSON array (bare, in a
+# ```json fence, wrapped in an object, or cut off by the token cap) or
+# bulleted / numbered lines with markdown. Intro and closing lines ("Here are
+# some...", "Enjoy your trip!") are dropped. ActivityStreamParser yields each
+# activity as soon as it is complete, so a streamed answer never shows raw
+# JSON or half-parsed lines.
+#
+# Token counts here are estimates (about four characters per token), good
+# enough for budgeting; reported usage comes from the model's own metadata.
+
+import json
+import re
+
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•+]|\d{1,2}[.)])\s+")
+_MARKDOWN = re.compile(r"\*\*|__|`")
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# --- Context ---
+
+def _clip(text, max_tokens):
+    """Whole sentences of `text` within max_tokens; at least a word-cut first sentence."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    kept = ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{kept} {sentence}" if kept else sentence
+        if len(candidate) > max_chars:
+            break
+        kept = candidate
+    return kept or text[:max_chars].rsplit(" ", 1)[0]
+
+
+def trim_context(passages, budget, min_relative=0.5):
+    """
+    `passages` are (text, score) pairs, best first. Returns the context
+    string: passages scoring at least min_relative of the best one, sharing
+    `budget` * best score (capped at 1) tokens in proportion to their scores,
+    each cut at a sentence boundary.
+    """
+    if not passages or budget <= 0:
+        return ""
+    best = max(score for _, score in passages)
+    if best <= 0:
+        return ""
+    kept = [(text, score) for text, score in passages if score >= best * min_relative]
+    total = budget * min(1.0, best)
+    weight = sum(score for _, score in kept)
+    clipped = (_clip(text, int(total * score / weight)) for text, score in kept)
+    return "\n".join(text for text in clipped if text)
+
+
+# --- Prompt ---
+
+def build_prompt(city, context, structured=True, n_items=5):
+    if structured:
+        return (f"List the top {n_items} tourist attractions in {city}. Reply with a JSON array of {n_items} strings, "
+                f"each an attraction name and at most 12 words about it.\nContext:\n{context}")
+    return f"""
+        Based on the following information, suggest 3-5 top tourist attractions for {city}.
+        --- Retrieved Information ---
+        {context}
+        --- End of Information ---
+        Suggest activities for {city}:
+        """
+
+
+def generation_config(structured=True, max_output_tokens=None):
+    """Keyword arguments for GenerativeModel.generate_content's generation_config."""
+    config = {}
+    if structured:
+        config["response_mime_type"] = "application/json"
+    if max_output_tokens:
+        config["max_output_tokens"] = max_output_tokens
+    return config
+
+
+# --- Parsing ---
+
+def clean_line(line):
+    """(activity text, had a list marker) for one line of free-text output; text is "" for junk."""
+    marked = bool(_LIST_MARKER.match(line))
+    text = _MARKDOWN.sub("", _LIST_MARKER.sub("", line, count=1)).strip().strip("*").strip()
+    if not text or text.startswith(("#", "```")) or text.endswith(":"):
+        return "", marked
+    return text, marked
+
+
+class ActivityStreamParser:
+    """
+    Incremental parser for model output. feed() each chunk and get back the
+    activities completed by it; finish() flushes the rest. `items` holds
+    everything parsed so far (deduplicated, at most `limit`).
+    """
+
+    def __init__(self, limit=5):
+        self.limit = limit
+        self.items = []
+        self._seen = set()
+        self._chunks = []
+        self._buffer = ""
+        self._mode = None  # "json" or "lines", decided by the first non-blank output
+        # JSON scanner state
+        self._stack = []
+        self._string = None  # characters of the string literal being read
+        self._escape = False
+        # Lines mode: unmarked lines only count if the answer has no list markers at all.
+        self._unmarked = []
+        self._marked = False
+
+    def _add(self, text, new):
+        key = text.lower()
+        if text and key not in self._seen and len(self.items) < self.limit:
+            self._seen.add(key)
+            self.items.append(text)
+            new.append(text)
+
+    def feed(self, chunk):
+        new = []
+        self._chunks.append(chunk)
+        self._buffer += chunk
+        if self._mode is None:
+            head = self._buffer.lstrip()
+            if head.startswith("`"):
+                if "\n" not in head:
+                    return new  # wait for the whole fence line
+                head = head.split("\n", 1)[1].lstrip()
+            if not head:
+                return new
+            self._mode = "json" if head[0] in "[{" else "lines"
+            if self._mode == "json":
+                self._buffer = head
+        if self._mode == "json":
+            self._scan(new)
+        else:
+            *lines, self._buffer = self._buffer.split("\n")
+            for line in lines:
+                self._line(line, new)
+        return new
+
+    def _scan(self, new):
+        buffer, self._buffer = self._buffer, ""
+        for char in buffer:
+            if self._string is not None:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    raw, self._string = "".join(self._string), None
+                    if self._stack and self._stack[-1] == "[":
+                        try:
+                            self._add(json.loads(f'"{raw}"').strip(), new)
+                        except ValueError:
+                            pass
+                    continue
+                self._string.append(char)
+            elif char == '"':
+                self._string = []
+            elif char in "[{":
+                self._stack.append(char)
+            elif char in "]}" and self._stack:
+                self._stack.pop()
+
+    def _line(self, line, new):
+        text, marked = clean_line(line)
+        if marked:
+            self._marked = True
+            self._add(text, new)
+        elif text:
+            self._unmarked.append(text)
+
+    def finish(self):
+        new = []
+        if self._mode == "lines":
+            self._line(self._buffer, new)
+            if not self._marked:
+                for text in self._unmarked:
+                    self._add(text, new)
+        elif self._mode == "json" and not self.items:
+            # Objects rather than strings, e.g. [{"name": ..., "description": ...}].
+            for text in _object_items("".join(self._chunks)):
+                self._add(text, new)
+        self._buffer = ""
+        return new
+
+
+def _object_items(text):
+    try:
+        data = json.loads(_FENCE.sub("", text))
+    except ValueError:
+        return []
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [])
+    items = []
+    for entry in data if isinstance(data, list) else []:
+        if isinstance(entry, dict):
+            name = entry.get("name") or entry.get("title") or entry.get("attraction")
+            detail = entry.get("description")
+            if isinstance(name, str):
+                items.append(f"{name}: {detail}" if isinstance(detail, str) and detail else name)
+    return items
+
+
+def parse_activities(generated_text, limit=5):
+    """Activities from a complete model answer, either mode."""
+    parser = ActivityStreamParser(limit)
+    parser.feed(generated_text)
+    parser.finish()
+    return parser.items
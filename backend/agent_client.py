@@ -0,0 +1,253 @@
+# agent_client.py
+# Shared HTTP client layer for calls between the agents and their upstreams.
+# One pooled keep-alive Session per upstream, connect/read timeouts, a small
+# retry budget with jittered backoff, and a circuit breaker that fails fast
+# while an upstream is down. Third-party APIs can also get a rate_limiter.RateLimiter:
+# every attempt then waits for quota, and 429s slow the limiter down and are retried.
+# With an agent_registry.AgentRegistry the client calls paths rather than URLs,
+# and every attempt goes to the replica the registry picks.
+
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import retry_after
+import telemetry
+
+# Status codes worth retrying: the upstream is (probably) transiently unhealthy.
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of making a call while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is rejected for `reset_timeout` seconds. Then a single trial call is let
+    through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class AgentClient:
+    """
+    Connection-pooled HTTP client for a single upstream service.
+    Safe to share between threads; create one per upstream at module level.
+    """
+
+    def __init__(self, name, pool_size=10, connect_timeout=2.0, read_timeout=10.0,
+                 max_retries=2, backoff_base=0.1, backoff_cap=1.0,
+                 failure_threshold=5, reset_timeout=30.0, propagate_request_id=False, rate_limiter=None,
+                 registry=None):
+        self.name = name
+        # Forward the current X-Request-ID; only for our own agents, not third-party APIs.
+        self.propagate_request_id = propagate_request_id
+        self.rate_limiter = rate_limiter
+        self.registry = registry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        # One connection pool per host: one per replica with a registry.
+        hosts = len(registry.endpoints) if registry is not None else 1
+        adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        """
+        Builds a client whose settings can be overridden with environment
+        variables, e.g. FLIGHT_AGENT_POOL_SIZE or FLIGHT_AGENT_READ_TIMEOUT.
+        """
+        settings = {
+            "pool_size": int, "connect_timeout": float, "read_timeout": float,
+            "max_retries": int, "failure_threshold": int, "reset_timeout": float,
+        }
+        for key, cast in settings.items():
+            value = os.getenv(f"{prefix}_{key.upper()}")
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, **defaults)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _backoff(self, attempt):
+        # "Full jitter": sleep a random amount up to the exponential cap.
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    def _send(self, method, url, endpoint, **kwargs):
+        """
+        One attempt. With a registry, `url` is a path on `endpoint`, which is
+        released afterwards, or for a streamed response once its body has been
+        read or the response closed.
+        """
+        if endpoint is None:
+            return self.session.request(method, url, **kwargs)
+        healthy = held = False
+        try:
+            response = self.session.request(method, endpoint.url + url, **kwargs)
+            healthy = response.status_code not in RETRYABLE_STATUS_CODES
+            if kwargs.get("stream") and healthy:
+                self._release_with(response, endpoint)
+                held = True
+            return response
+        finally:
+            if not held:
+                self.registry.release(endpoint, healthy)
+
+    def _release_with(self, response, endpoint):
+        # urllib3 hands the connection back through release_conn() both when
+        # the body is exhausted and from Response.close(); release the
+        # endpoint with it, once.
+        raw, once = response.raw, threading.Lock()
+        release_conn = raw.release_conn
+
+        def release():
+            release_conn()
+            if once.acquire(blocking=False):
+                self.registry.release(endpoint, True)
+
+        raw.release_conn = release
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """
+        Sends a request and returns the response (already checked with
+        raise_for_status). `deadline` is a total time budget in seconds across
+        all attempts; when it runs out no further retries are made. With a rate
+        limiter, raises rate_limiter.RateLimitTimeout when no quota is left.
+        With a registry, `url` is a path and each attempt may use another replica.
+        """
+        # Wait for quota before taking a half-open trial slot, so a quota wait
+        # (or RateLimitTimeout) cannot hold the trial.
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name}: circuit open, skipping call to {url}")
+
+        if self.propagate_request_id:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **telemetry.propagation_headers()}
+
+        budget_end = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        endpoint = None
+        settled = False  # the breaker has been told how the call went
+        try:
+            while True:
+                read_timeout = self.read_timeout
+                if budget_end is not None:
+                    read_timeout = max(0.05, min(read_timeout, budget_end - time.monotonic()))
+                if self.rate_limiter is not None and attempt > 0:
+                    self.rate_limiter.acquire()
+                self._count("requests")
+                if self.registry is not None:
+                    endpoint = self.registry.acquire(avoid=endpoint)
+                attempt_started = time.perf_counter()
+                try:
+                    response = self._send(method, url, endpoint, timeout=(self.connect_timeout, read_timeout),
+                                          **kwargs)
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                        requests.exceptions.HTTPError) as e:
+                    outcome = "timeout" if isinstance(e, requests.exceptions.Timeout) else "error"
+                    telemetry.UPSTREAM_DURATION.observe(time.perf_counter() - attempt_started, self.name, outcome)
+                    pause = self._backoff(attempt)
+                    out_of_time = budget_end is not None and time.monotonic() + pause >= budget_end
+                    if attempt >= self.max_retries or out_of_time:
+                        self._count("failures")
+                        settled = True
+                        self.breaker.record_failure()
+                        raise
+                    self._count("retries")
+                    attempt += 1
+                    time.sleep(pause)
+                    continue
+
+                outcome = "ok" if response.status_code < 400 else "client_error"
+                telemetry.UPSTREAM_DURATION.observe(time.perf_counter() - attempt_started, self.name, outcome)
+                if self.rate_limiter is not None:
+                    if response.status_code == 429:
+                        # Over quota: slow down and queue for another slot.
+                        self.rate_limiter.record_throttled(retry_after(response))
+                        if attempt < self.max_retries:
+                            self._count("retries")
+                            attempt += 1
+                            continue
+                    elif response.status_code < 400:
+                        self.rate_limiter.record_success()
+                settled = True
+                self.breaker.record_success()
+                # 4xx responses are the caller's fault, not the upstream's: no retry,
+                # no breaker penalty, but still surfaced as an HTTPError.
+                response.raise_for_status()
+                return response
+        finally:
+            # Anything else (a broken body, RateLimitTimeout on a retry, ...)
+            # counts as a failure, so a half-open trial always ends.
+            if not settled:
+                self._count("failures")
+                self.breaker.record_failure()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
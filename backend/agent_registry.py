@@ -0,0 +1,186 @@
+# agent_registry.py
+# Client-side load balancing over the replicas of one agent.
+#
+# An AgentRegistry holds every endpoint (base URL) an agent is served from,
+# e.g. KNOWLEDGE_AGENT_URLS="http://127.0.0.1:5001,http://127.0.0.1:5011".
+# AgentClient / AsyncAgentClient take one and then call paths instead of
+# URLs: each attempt goes to the available endpoint with the fewest requests
+# outstanding from this process (ties in turn), so a slow or overloaded
+# replica gets less traffic without a central balancer, and a retry goes to
+# a different replica than the one that just failed.
+#
+# Health is tracked two ways:
+#   passive  `failure_threshold` consecutive failed calls (connection errors,
+#            timeouts, 502/503/504) eject an endpoint for `eject_time` seconds
+#   active   with more than one endpoint, a background thread GETs each
+#            endpoint's /readyz every `check_interval` seconds; a failed check
+#            ejects it, a passing one brings it straight back
+# If every endpoint is ejected, calls go to all of them again (fail open):
+# the client's retries and circuit breaker decide what happens next.
+#
+# The registry keeps no state beyond these counters, so any number of
+# orchestrator workers can run side by side, each balancing on its own view.
+
+import itertools
+import os
+import threading
+import time
+
+import requests
+
+import telemetry
+
+
+class Endpoint:
+    """One replica of an agent, by base URL."""
+
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.failures = 0  # consecutive
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def available(self, now):
+        return now >= self.ejected_until
+
+    def describe(self, now):
+        return {"url": self.url, "available": self.available(now), "outstanding": self.outstanding,
+                "requests": self.requests, "errors": self.errors}
+
+
+class AgentRegistry:
+    """
+    The endpoints of one agent, with least-outstanding-requests selection
+    and health checking. Thread-safe; create one per agent at module level.
+    """
+
+    def __init__(self, name, urls, health_path="/readyz", check_interval=5.0, check_timeout=1.0,
+                 failure_threshold=3, eject_time=10.0):
+        if not urls:
+            raise ValueError(f"{name}: an agent registry needs at least one endpoint")
+        self.name = name
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.health_path = health_path
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.failure_threshold = failure_threshold
+        self.eject_time = eject_time
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._checker_pid = None
+        self._stats = {"ejections": 0, "health_checks": 0, "health_check_failures": 0, "all_ejected": 0}
+
+    @classmethod
+    def from_env(cls, name, prefix, default_url, **defaults):
+        """
+        Endpoints from {prefix}_URLS (comma-separated base URLs), else
+        `default_url`; health settings from e.g. FLIGHT_AGENT_HEALTH_INTERVAL
+        and FLIGHT_AGENT_EJECT_TIME.
+        """
+        urls = [url.strip() for url in os.getenv(f"{prefix}_URLS", default_url).split(",") if url.strip()]
+        settings = {
+            "check_interval": ("HEALTH_INTERVAL", float), "check_timeout": ("HEALTH_TIMEOUT", float),
+            "failure_threshold": ("EJECT_AFTER", int), "eject_time": ("EJECT_TIME", float),
+        }
+        for key, (suffix, cast) in settings.items():
+            value = os.getenv(f"{prefix}_{suffix}")
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, urls, **defaults)
+
+    # --- Selection ---
+
+    def acquire(self, avoid=None):
+        """
+        Picks the endpoint for one request and counts it as outstanding; pair
+        with release(). `avoid` (the endpoint that just failed) is skipped
+        when there is any other choice.
+        """
+        self._ensure_checker()
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.available(now)]
+            if not candidates:
+                self._stats["all_ejected"] += 1
+                candidates = self.endpoints
+            if avoid is not None and len(candidates) > 1:
+                candidates = [e for e in candidates if e is not avoid] or candidates
+            fewest = min(e.outstanding for e in candidates)
+            tied = [e for e in candidates if e.outstanding == fewest]
+            endpoint = tied[next(self._turn) % len(tied)]
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint, healthy):
+        """Ends a request from acquire(); `healthy` is False for failures that say the replica is unwell."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if healthy:
+                endpoint.failures = 0
+                return
+            endpoint.errors += 1
+            endpoint.failures += 1
+            if endpoint.failures >= self.failure_threshold and endpoint.available(time.monotonic()):
+                self._eject(endpoint)
+
+    def _eject(self, endpoint):
+        """Caller holds the lock."""
+        endpoint.ejected_until = time.monotonic() + self.eject_time
+        endpoint.failures = 0
+        self._stats["ejections"] += 1
+        telemetry.log(f"AgentRegistry: {self.name} endpoint {endpoint.url} ejected for {self.eject_time:.0f}s")
+
+    # --- Active health checks ---
+
+    def _ensure_checker(self):
+        # One checker thread per process; a forked worker starts its own.
+        if self.check_interval <= 0 or len(self.endpoints) < 2 or self._checker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._checker_pid == os.getpid():
+                return
+            self._checker_pid = os.getpid()
+        threading.Thread(target=self._check_loop, name=f"health-{self.name}", daemon=True).start()
+
+    def _check_loop(self):
+        session = requests.Session()
+        while True:
+            for endpoint in self.endpoints:
+                self.check(endpoint, session)
+            time.sleep(self.check_interval)
+
+    def check(self, endpoint, session=requests):
+        """Probes one endpoint's readiness and ejects or restores it; returns whether it passed."""
+        try:
+            passed = session.get(endpoint.url + self.health_path, timeout=self.check_timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            passed = False
+        with self._lock:
+            self._stats["health_checks"] += 1
+            if passed:
+                endpoint.ejected_until = 0.0
+                endpoint.failures = 0
+            else:
+                self._stats["health_check_failures"] += 1
+                if endpoint.available(time.monotonic()):
+                    self._eject(endpoint)
+        return passed
+
+    # --- Reporting ---
+
+    def describe(self):
+        now = time.monotonic()
+        with self._lock:
+            return [endpoint.describe(now) for endpoint in self.endpoints]
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["endpoints"] = len(self.endpoints)
+            stats["available"] = sum(1 for e in self.endpoints if e.available(now))
+            stats["outstanding"] = sum(e.outstanding for e in self.endpoints)
+        return stats
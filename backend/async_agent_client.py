@@ -0,0 +1,189 @@
+# async_agent_client.py
+# Non-blocking counterpart of agent_client.AgentClient for the ASGI serving
+# mode: same pooling, timeouts, jittered retries, circuit breaker, optional
+# rate limiter and agent registry, on httpx.
+
+import asyncio
+import contextlib
+import os
+import random
+import time
+
+import httpx
+
+from agent_client import RETRYABLE_STATUS_CODES, CircuitBreaker, CircuitOpenError
+from rate_limiter import retry_after
+import telemetry
+
+
+class AsyncAgentClient:
+    """Connection-pooled async HTTP client for a single upstream service."""
+
+    def __init__(self, name, pool_size=100, connect_timeout=2.0, read_timeout=10.0,
+                 max_retries=2, backoff_base=0.1, backoff_cap=1.0,
+                 failure_threshold=5, reset_timeout=30.0, propagate_request_id=False, rate_limiter=None,
+                 registry=None):
+        self.name = name
+        self.propagate_request_id = propagate_request_id
+        self.rate_limiter = rate_limiter
+        self.registry = registry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    # Same environment overrides as AgentClient, e.g. FLIGHT_AGENT_POOL_SIZE.
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        settings = {
+            "pool_size": int, "connect_timeout": float, "read_timeout": float,
+            "max_retries": int, "failure_threshold": int, "reset_timeout": float,
+        }
+        for key, cast in settings.items():
+            value = os.getenv(f"{prefix}_{key.upper()}")
+            if value is not None:
+                defaults[key] = cast(value)
+        return cls(name, **defaults)
+
+    def _add_request_id(self, kwargs):
+        if self.propagate_request_id:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), **telemetry.propagation_headers()}
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    async def _send(self, method, url, endpoint, **kwargs):
+        """One attempt. With a registry, `url` is a path on `endpoint`, which is released afterwards."""
+        if endpoint is None:
+            return await self.client.request(method, url, **kwargs)
+        healthy = False
+        try:
+            response = await self.client.request(method, endpoint.url + url, **kwargs)
+            healthy = response.status_code not in RETRYABLE_STATUS_CODES
+            return response
+        finally:
+            self.registry.release(endpoint, healthy)
+
+    async def request(self, method, url, deadline=None, **kwargs):
+        """
+        Sends a request and returns the httpx response (already checked with
+        raise_for_status). `deadline` is a total time budget in seconds across
+        all attempts. With a registry, `url` is a path and each attempt may use
+        another replica.
+        """
+        # Quota first, as in AgentClient: a quota wait must not hold a half-open trial.
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire_async()
+        if not self.breaker.allow():
+            self._stats["short_circuited"] += 1
+            raise CircuitOpenError(f"{self.name}: circuit open, skipping call to {url}")
+
+        self._add_request_id(kwargs)
+        budget_end = time.monotonic() + deadline if deadline else None
+        attempt = 0
+        endpoint = None
+        settled = False
+        try:
+            while True:
+                read_timeout = self.read_timeout
+                if budget_end is not None:
+                    read_timeout = max(0.05, min(read_timeout, budget_end - time.monotonic()))
+                if self.rate_limiter is not None and attempt > 0:
+                    await self.rate_limiter.acquire_async()
+                self._stats["requests"] += 1
+                if self.registry is not None:
+                    endpoint = self.registry.acquire(avoid=endpoint)
+                attempt_started = time.perf_counter()
+                try:
+                    response = await self._send(method, url, endpoint,
+                                                timeout=httpx.Timeout(read_timeout, connect=self.connect_timeout),
+                                                **kwargs)
+                    if response.status_code in RETRYABLE_STATUS_CODES:
+                        response.raise_for_status()
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+                    telemetry.UPSTREAM_DURATION.observe(time.perf_counter() - attempt_started, self.name, outcome)
+                    pause = self._backoff(attempt)
+                    out_of_time = budget_end is not None and time.monotonic() + pause >= budget_end
+                    if attempt >= self.max_retries or out_of_time:
+                        self._stats["failures"] += 1
+                        settled = True
+                        self.breaker.record_failure()
+                        raise
+                    self._stats["retries"] += 1
+                    attempt += 1
+                    await asyncio.sleep(pause)
+                    continue
+
+                outcome = "ok" if response.status_code < 400 else "client_error"
+                telemetry.UPSTREAM_DURATION.observe(time.perf_counter() - attempt_started, self.name, outcome)
+                if self.rate_limiter is not None:
+                    if response.status_code == 429:
+                        self.rate_limiter.record_throttled(retry_after(response))
+                        if attempt < self.max_retries:
+                            self._stats["retries"] += 1
+                            attempt += 1
+                            continue
+                    elif response.status_code < 400:
+                        self.rate_limiter.record_success()
+                settled = True
+                self.breaker.record_success()
+                response.raise_for_status()
+                return response
+        finally:
+            # Cancellation (asyncio.wait_for) or any other error still ends a half-open trial.
+            if not settled:
+                self._stats["failures"] += 1
+                self.breaker.record_failure()
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method, url, deadline=None, **kwargs):
+        """Streamed request as an async context manager. No retries: partial output may already be consumed."""
+        if not self.breaker.allow():
+            self._stats["short_circuited"] += 1
+            raise CircuitOpenError(f"{self.name}: circuit open, skipping call to {url}")
+        self._add_request_id(kwargs)
+        self._stats["requests"] += 1
+        timeout = httpx.Timeout(deadline or self.read_timeout, connect=self.connect_timeout)
+        # The replica stays outstanding until the stream is closed.
+        endpoint = self.registry.acquire() if self.registry is not None else None
+        healthy = True
+        settled = False
+        try:
+            async with self.client.stream(method, endpoint.url + url if endpoint else url, timeout=timeout,
+                                          **kwargs) as response:
+                response.raise_for_status()
+                settled = True
+                self.breaker.record_success()
+                yield response
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            healthy = isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRYABLE_STATUS_CODES
+            settled = True
+            self._stats["failures"] += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            # Cancelled before the response arrived: still end a half-open trial.
+            if not settled:
+                self._stats["failures"] += 1
+                self.breaker.record_failure()
+            if endpoint is not None:
+                self.registry.release(endpoint, healthy)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["circuit"] = self.breaker.state
+        return stats
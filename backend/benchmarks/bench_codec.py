@@ -0,0 +1,155 @@
+# bench_codec.py
+# Serialization CPU per plan request, before and after codec.py, in-process
+# (no sockets, so only encode/decode work is measured):
+#
+#   before: agents jsonify(), the orchestrator parses with requests' .json()
+#           and answers with jsonify()
+#   after:  agents encode with codec (MessagePack if installed, else orjson or
+#           stdlib JSON), the orchestrator decodes the raw bytes and answers
+#           with codec.respond(), compressed for a gzip/br-accepting client
+#
+# Workloads: one /api/plan_trip, a 6-stop /api/plan_itinerary and a 100-trip
+# /api/plan_trips batch.
+#
+#   python backend/benchmarks/bench_codec.py --repeat 200 --json codec.json
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+from flight_agent import parse_flights  # noqa: E402
+import main_app  # noqa: E402
+from stubs import STUB_AIRPORTS, flight_record  # noqa: E402
+
+ACTIVITIES = [
+    "Walk the old town and its medieval walls at sunset.",
+    "Spend a morning in the national museum's modern art wing.",
+    "Take a food tour through the covered central market.",
+    "Ride the funicular up to the viewpoint above the harbour.",
+    "Catch a concert at the opera house.",
+]
+
+
+def flights_body(dep, arr, n_flights):
+    return {"flights": parse_flights({"data": [flight_record(dep, arr, n) for n in range(n_flights)]})}
+
+
+def activities_body(city):
+    return {"activities": [f"{city}: {activity}" for activity in ACTIVITIES], "source": "generated"}
+
+
+def ok(data):
+    return {"data": data, "status": "ok", "error": None, "elapsed_ms": 120.0}
+
+
+def workloads(n_flights, n_trips, n_stops):
+    """name -> (agent response bodies, function building the orchestrator's response from the decoded bodies)."""
+    single = [flights_body("JFK", "LHR", n_flights), activities_body("London")]
+
+    stops = STUB_AIRPORTS[1:n_stops + 1]
+    legs = [(origin, city, "2026-10-20") for origin, city in zip([STUB_AIRPORTS[0]] + stops, stops)]
+    itinerary = [flights_body(o, c, n_flights) for o, c, _ in legs] + [activities_body(c) for c in stops]
+
+    trips = [(STUB_AIRPORTS[i % 7], STUB_AIRPORTS[7 + i % 13]) for i in range(n_trips)]
+    batch = [{"results": [flights_body(o, c, n_flights) for o, c in trips]},
+             {"results": [activities_body(c) for _, c in trips]}]
+
+    def plan_trip(bodies):
+        return main_app.assemble_plan("LHR", "JFK", "2026-10-20",
+                                      {"flight": ok(bodies[0]), "knowledge": ok(bodies[1])})[0]
+
+    def plan_itinerary(bodies):
+        results = {f"flight:{i}": ok(body) for i, body in enumerate(bodies[:len(legs)])}
+        results.update({f"knowledge:{main_app.city_key(c)}": ok(body)
+                        for c, body in zip(stops, bodies[len(legs):])})
+        return main_app.assemble_itinerary(legs, results)[0]
+
+    def plan_trips(bodies):
+        flights, activities = bodies[0]["results"], bodies[1]["results"]
+        return {"results": [
+            {"index": i, "status": 200, "plan": main_app.assemble_plan(
+                c, o, "2026-10-20", {"flight": ok(flights[i]), "knowledge": ok(activities[i])})[0]}
+            for i, (o, c) in enumerate(trips)]}
+
+    return {
+        "plan_trip": (single, plan_trip),
+        "plan_itinerary": (itinerary, plan_itinerary),
+        "plan_trips": (batch, plan_trips),
+    }
+
+
+def requests_json(body, content_type):
+    """What main_app did before: requests.Response.json() on the agent's body."""
+    response = requests.Response()
+    response._content = body
+    response.headers["Content-Type"] = content_type
+    response.encoding = None
+    return response.json()
+
+
+def before(bodies, build):
+    with main_app.app.test_request_context():
+        wire = [main_app.jsonify(body).get_data() for body in bodies]
+        decoded = [requests_json(body, "application/json") for body in wire]
+        final = main_app.jsonify(build(decoded)).get_data()
+    return sum(map(len, wire)), final
+
+
+def after(bodies, build):
+    content_type = codec.negotiate(codec.AGENT_ACCEPT)
+    wire = [codec.encode(body, content_type) for body in bodies]
+    decoded = [codec.decode(body, content_type) for body in wire]
+    final, _ = codec.encode_body(build(decoded), "application/json", "gzip, deflate, br")
+    return sum(map(len, wire)), final
+
+
+def measure(fn, bodies, build, repeat):
+    fn(bodies, build)  # warm-up
+    started = time.process_time()
+    for _ in range(repeat):
+        wire_bytes, final = fn(bodies, build)
+    return (time.process_time() - started) / repeat * 1e6, wire_bytes, len(final)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serialization CPU per plan request, before and after codec.py")
+    parser.add_argument("--flights", type=int, default=5, help="flight options per route")
+    parser.add_argument("--trips", type=int, default=100, help="trips in the batch workload")
+    parser.add_argument("--stops", type=int, default=6, help="stops in the itinerary workload")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    encodings = {"agent_encoding": codec.negotiate(codec.AGENT_ACCEPT),
+                 "json": "orjson" if codec.orjson is not None else "stdlib",
+                 "compression": "br" if codec.brotli is not None else "gzip"}
+    print(encodings)
+    results = {"settings": {**vars(args), **encodings}, "workloads": {}}
+    print(f"{'workload':<16} {'before us':>10} {'after us':>10} {'saved':>7} "
+          f"{'agent B before':>15} {'after':>8} {'response B before':>18} {'after':>8}")
+    for name, (bodies, build) in workloads(args.flights, args.trips, args.stops).items():
+        repeat = max(1, args.repeat // 20) if name == "plan_trips" else args.repeat
+        cpu_before, wire_before, final_before = measure(before, bodies, build, repeat)
+        cpu_after, wire_after, final_after = measure(after, bodies, build, repeat)
+        row = {"cpu_us_before": round(cpu_before, 1), "cpu_us_after": round(cpu_after, 1),
+               "cpu_saved": round(1 - cpu_after / cpu_before, 3),
+               "agent_bytes_before": wire_before, "agent_bytes_after": wire_after,
+               "response_bytes_before": final_before, "response_bytes_after": final_after}
+        results["workloads"][name] = row
+        print(f"{name:<16} {row['cpu_us_before']:>10} {row['cpu_us_after']:>10} {row['cpu_saved']:>7.0%} "
+              f"{wire_before:>15} {wire_after:>8} {final_before:>18} {final_after:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
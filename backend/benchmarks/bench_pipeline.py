@@ -0,0 +1,161 @@
+# bench_pipeline.py
+# Offline benchmark of the full plan pipeline. Gemini and AviationStack are
+# replaced by local stubs with configurable latency distributions and error
+# rates, so runs cost no quota and are repeatable. Each target endpoint is
+# driven at fixed concurrency levels; throughput, p50/p95/p99 and the
+# per-stage breakdown from the Server-Timing header are written as JSON.
+#
+#   python backend/benchmarks/bench_pipeline.py --concurrency 1 8 32 --out before.json
+#   python backend/benchmarks/bench_pipeline.py --concurrency 1 8 32 --compare before.json
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+from harness import BACKEND_DIR, drive, service_env, start_services, start_stub, stop
+from stub_model import LATENCY_DISTRIBUTIONS, LatencyProfile
+
+AIRPORTS = ["JFK", "LAX", "LHR", "CDG", "HND", "SIN", "DXB", "SYD", "FRA", "AMS"]
+TRAVEL_DATE = "2026-10-20"
+
+
+# --- Degraded answers ---
+# The agents turn upstream failures into 200s with fallback data; count those
+# separately so injected error rates show up in the report.
+def mock_flights(body):
+    return any(flight.get("source") == "mock" for flight in body.get("flights", []))
+
+
+def fallback_activities(body):
+    return body.get("source") in ("fallback_due_to_api_error", "fallback_rate_limited")
+
+
+def degraded_plan(body):
+    # The plan drops the knowledge agent's "source" marker, so only agent
+    # failures and mock flights are visible here; see the attractions target.
+    statuses = body.get("metadata", {}).get("service_status", {}).values()
+    return any(s["status"] != "ok" for s in statuses) or mock_flights(body.get("raw_data", {}))
+
+
+# A large pool of made-up cities / routes keeps requests from being coalesced or
+# cached; --hot-set narrows it to measure the cached / coalesced path instead.
+def make_targets(hot_set):
+    def city(rng):
+        return f"Town{rng.randrange(hot_set)}"
+
+    return {
+        "plan_trip": ("http://127.0.0.1:5000/api/plan_trip", degraded_plan,
+                      lambda rng: {"city": city(rng), "origin": rng.choice(AIRPORTS), "travel_date": TRAVEL_DATE}),
+        "attractions": ("http://127.0.0.1:5001/get_attractions", fallback_activities,
+                        lambda rng: {"city": city(rng)}),
+        "flights": ("http://127.0.0.1:5002/get_flight_options", mock_flights,
+                    lambda rng: {"origin": rng.choice(AIRPORTS), "destination": city(rng), "date": TRAVEL_DATE}),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Prints throughput and p95 changes against an earlier run's JSON."""
+    before = {(row["target"], row["concurrency"]): row for row in baseline["results"]}
+    print(f"\nvs {baseline['meta'].get('revision') or 'baseline'}:")
+    print(f"{'target':<12} {'conc':>5} {'req/s':>16} {'p95 ms':>18}")
+    for row in results:
+        old = before.get((row["target"], row["concurrency"]))
+        if old is None:
+            continue
+
+        def change(key):
+            if not old[key] or row[key] is None:
+                return f"{old[key]} -> {row[key]}"
+            return f"{old[key]} -> {row[key]} ({(row[key] - old[key]) / old[key]:+.0%})"
+
+        print(f"{row['target']:<12} {row['concurrency']:>5} {change('rps'):>16} {change('p95_ms'):>18}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline plan-pipeline benchmark against stub upstreams")
+    parser.add_argument("--mode", default="flask", choices=["flask", "asgi"])
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per service (asgi mode)")
+    parser.add_argument("--targets", nargs="+", default=["plan_trip", "attractions", "flights"],
+                        choices=["plan_trip", "attractions", "flights"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per (target, concurrency)")
+    parser.add_argument("--caches", action="store_true", help="keep the generation and route caches on")
+    parser.add_argument("--hot-set", type=int, default=100000, help="distinct cities requested")
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--model-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--model-latency-dist", default="lognormal", choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--model-error-rate", type=float, default=0.0)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--upstream-latency-dist", default="lognormal", choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier --out file to compare against")
+    args = parser.parse_args()
+
+    model = LatencyProfile(args.model_latency_ms, args.model_jitter_ms, args.model_latency_dist, args.model_error_rate)
+    upstream = LatencyProfile(args.upstream_latency_ms, args.upstream_jitter_ms,
+                              args.upstream_latency_dist, args.upstream_error_rate)
+    targets = make_targets(args.hot_set)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(upstream)
+        processes = start_services(args.mode, service_env(workdir, model, caches=args.caches), workdir, args.workers)
+        try:
+            # Warm-up: imports, connection pools, first-request lazy work.
+            for target in args.targets:
+                url, _, make_body = targets[target]
+                asyncio.run(drive(url, make_body, 2, 1.0, seed=-1))
+
+            for target in args.targets:
+                url, degraded, make_body = targets[target]
+                for concurrency in args.concurrency:
+                    row = asyncio.run(drive(url, make_body, concurrency, args.duration,
+                                            seed=concurrency, degraded=degraded))
+                    results.append({"target": target, "concurrency": concurrency, **row})
+                    print(f"{target:<12} c={concurrency:<4} {row['rps']:>7} req/s  p50 {row['p50_ms']}  "
+                          f"p95 {row['p95_ms']}  p99 {row['p99_ms']}  errors {row['errors']}  degraded {row['degraded']}")
+                    for name, stage in row["stages"].items():
+                        print(f"{'':<14}{name:<14} p50 {stage['p50_ms']}  p95 {stage['p95_ms']}  p99 {stage['p99_ms']}")
+        finally:
+            stop(processes + [stub])
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "mode": args.mode,
+            "workers": args.workers,
+            "duration_s": args.duration,
+            "caches": args.caches,
+            "hot_set": args.hot_set,
+            "model": model.describe(),
+            "aviationstack": upstream.describe(),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
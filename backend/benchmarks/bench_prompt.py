@@ -0,0 +1,139 @@
+# bench_prompt.py
+# Tokens and latency per knowledge-agent request, before and after
+# activity_prompt.py, against the stub model (stub_model.py) in-process:
+#
+#   before: top-k passages joined in full, the original free-text prompt, no
+#           output cap, lines parsed with .replace('* ', '').replace('- ', '')
+#   after:  passages trimmed to the relevance-scaled context budget, JSON
+#           mode, max_output_tokens, activity_prompt.parse_activities
+#
+# The stub decodes at --ms-per-token on top of a fixed --latency-ms, so output
+# tokens turn into latency the way they do with Gemini. Requests run
+# concurrently (one thread each); latency is per request. "junk" counts parsed
+# items that are not attractions (intro and closing lines, blanks).
+#
+#   python backend/benchmarks/bench_prompt.py --queries 40 --json prompt.json
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import activity_prompt  # noqa: E402
+from bench_retrieval import WORDS  # noqa: E402
+from retrieval import HashingEmbedder, Retriever  # noqa: E402
+from stub_model import LatencyProfile, StubGenerativeModel  # noqa: E402
+
+MAX_ACTIVITIES = 5
+ATTRACTION = re.compile(r"attraction \d+")
+
+
+def corpus(n_cities, docs_per_city, seed=11):
+    """A few multi-sentence passages per city, like a chunked travel guide."""
+    rng = random.Random(seed)
+    cities = [f"City{i}" for i in range(n_cities)]
+    docs = []
+    for city in cities:
+        for _ in range(docs_per_city):
+            sentences = [f"{city} is known for its {' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 16)))}."
+                         for _ in range(rng.randint(3, 6))]
+            docs.append(" ".join(sentences))
+    return docs, cities
+
+
+def legacy_prompt(city, context):
+    return activity_prompt.build_prompt(city, context, structured=False)
+
+
+def legacy_parse(generated_text):
+    attractions = [
+        item.strip().replace('* ', '').replace('- ', '')
+        for item in generated_text.strip().split('\n')
+        if item.strip()
+    ]
+    return attractions[:5]
+
+
+def pipelines(retriever, top_k, min_score, budget, max_output_tokens):
+    def before(model, city):
+        docs = [doc for doc, _ in retriever.search(city, k=top_k, min_score=min_score)]
+        context = "\n".join(docs)
+        response = model.generate_content(legacy_prompt(city, context))
+        return response, legacy_parse(response.text)
+
+    config = activity_prompt.generation_config(True, max_output_tokens)
+
+    def after(model, city):
+        context = activity_prompt.trim_context(retriever.search(city, k=top_k, min_score=min_score), budget)
+        response = model.generate_content(activity_prompt.build_prompt(city, context, True, MAX_ACTIVITIES),
+                                          generation_config=config)
+        return response, activity_prompt.parse_activities(response.text, MAX_ACTIVITIES)
+
+    return {"before": before, "after": after}
+
+
+def run(pipeline, model, cities):
+    def one(city):
+        started = time.perf_counter()
+        response, items = pipeline(model, city)
+        return (time.perf_counter() - started) * 1000, response.usage_metadata, items
+
+    with ThreadPoolExecutor(max_workers=len(cities)) as pool:
+        rows = list(pool.map(one, cities))
+    latencies = sorted(ms for ms, _, _ in rows)
+    n = len(rows)
+    return {
+        "prompt_tokens": round(sum(u.prompt_token_count for _, u, _ in rows) / n, 1),
+        "output_tokens": round(sum(u.candidates_token_count for _, u, _ in rows) / n, 1),
+        "latency_ms_p50": round(latencies[n // 2], 1),
+        "latency_ms_max": round(latencies[-1], 1),
+        "items": round(sum(len(items) for _, _, items in rows) / n, 2),
+        "junk": round(sum(sum(1 for item in items if not ATTRACTION.search(item)) for _, _, items in rows) / n, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens and latency per request, before and after activity_prompt.py")
+    parser.add_argument("--queries", type=int, default=40, help="concurrent requests per pipeline")
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--docs-per-city", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-score", type=float, default=0.2)
+    parser.add_argument("--context-tokens", type=int, default=240)
+    parser.add_argument("--max-output-tokens", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="fixed model latency per call")
+    parser.add_argument("--ms-per-token", type=float, default=5.0, help="model decode time per output token")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    docs, cities = corpus(args.cities, args.docs_per_city)
+    retriever = Retriever(HashingEmbedder(), docs)
+    model = StubGenerativeModel(latency=LatencyProfile(args.latency_ms, dist="fixed"), n_items=MAX_ACTIVITIES,
+                                ms_per_token=args.ms_per_token)
+    queries = cities[:args.queries]
+
+    results = {"settings": vars(args), "pipelines": {}}
+    print(f"{'pipeline':<8} {'prompt tok':>10} {'output tok':>10} {'p50 ms':>8} {'max ms':>8} {'items':>6} {'junk':>5}")
+    for name, pipeline in pipelines(retriever, args.top_k, args.min_score, args.context_tokens,
+                                    args.max_output_tokens).items():
+        row = results["pipelines"][name] = run(pipeline, model, queries)
+        print(f"{name:<8} {row['prompt_tokens']:>10} {row['output_tokens']:>10} {row['latency_ms_p50']:>8} "
+              f"{row['latency_ms_max']:>8} {row['items']:>6} {row['junk']:>5}")
+    before, after = results["pipelines"]["before"], results["pipelines"]["after"]
+    results["saved"] = {key: round(1 - after[key] / before[key], 3)
+                        for key in ("prompt_tokens", "output_tokens", "latency_ms_p50")}
+    print("saved: " + ", ".join(f"{key} {value:.0%}" for key, value in results["saved"].items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
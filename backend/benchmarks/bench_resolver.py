@@ -0,0 +1,87 @@
+# bench_resolver.py
+# Place resolution and autocomplete latency (resolver.py) for the query mixes
+# the orchestrator sees: exact names and aliases, IATA codes, typos, and
+# keystroke-by-keystroke prefixes. Also reports how many typo queries fuzzy
+# resolution (autocomplete's, not the plans') maps to the intended city.
+#
+#   python backend/benchmarks/bench_resolver.py --repeat 2000
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resolver import Resolver  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 2)
+
+
+def typo(name, rng):
+    """One dropped, doubled or swapped letter."""
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.choice(("drop", "double", "swap"))
+    if kind == "drop":
+        return name[:i] + name[i + 1:]
+    if kind == "double":
+        return name[:i] + name[i] + name[i:]
+    return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+
+
+def time_calls(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            fn(query)
+            samples.append((time.perf_counter() - started) * 1e6)
+    return {"p50_us": percentile(samples, 50), "p99_us": percentile(samples, 99)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place resolution and autocomplete latency")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over each query set")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    resolver = Resolver.from_file()
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"{resolver.stats()} built in {build_ms:.1f}ms")
+
+    rng = random.Random(3)
+    cities = [place for place in resolver.places if place.kind == "city" and len(place.city) >= 5]
+    typos = [(typo(place.city.lower(), rng), place.city) for place in cities]
+    query_sets = {
+        "exact": [place.city for place in cities],
+        "iata": [place.iata for place in resolver.places if place.kind == "airport"],
+        "typo": [query for query, _ in typos],
+    }
+    prefixes = [place.city.lower()[:n] for place in cities for n in range(1, min(len(place.city), 6) + 1)]
+
+    results = {"index": resolver.stats(), "build_ms": round(build_ms, 1), "resolve": {}}
+    print(f"{'queries':<12} {'p50 us':>8} {'p99 us':>8}")
+    for name, queries in query_sets.items():
+        row = results["resolve"][name] = time_calls(resolver.resolve, queries, args.repeat)
+        print(f"{name:<12} {row['p50_us']:>8} {row['p99_us']:>8}")
+    row = results["autocomplete"] = time_calls(resolver.complete, prefixes, max(1, args.repeat // 5))
+    print(f"{'autocomplete':<12} {row['p50_us']:>8} {row['p99_us']:>8}")
+
+    found = [resolver.resolve(query, fuzzy=True) for query, _ in typos]
+    correct = sum(1 for match, (_, city) in zip(found, typos) if match and match.place.city == city)
+    results["typo_accuracy"] = round(correct / len(typos), 3)
+    print(f"typo queries resolved to the intended city: {results['typo_accuracy']:.1%}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
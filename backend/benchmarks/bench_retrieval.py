@@ -0,0 +1,92 @@
+# bench_retrieval.py
+# Query latency of the retrieval engine as the corpus grows, compared with the
+# old linear substring scan over KNOWLEDGE_BASE.
+#
+#   python backend/benchmarks/bench_retrieval.py --sizes 1000 10000 100000
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import HashingEmbedder, Retriever  # noqa: E402
+
+WORDS = (
+    "museum park cathedral market harbour beach temple palace tower bridge garden castle "
+    "river old town festival cuisine street food gallery opera square zoo island canal "
+    "skyline mountain lake district nightlife shopping historic modern quarter"
+).split()
+
+
+def synthetic_corpus(n_docs, seed=7):
+    rng = random.Random(seed)
+    cities = [f"city{i}" for i in range(max(10, n_docs // 10))]
+    docs = []
+    for _ in range(n_docs):
+        city = rng.choice(cities)
+        body = " ".join(rng.choice(WORDS) for _ in range(30))
+        docs.append(f"{city.title()} is known for its {body}.")
+    return docs, cities
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_queries(search, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": round(percentile(samples, 50), 3), "p95_ms": round(percentile(samples, 95), 3)}
+
+
+def run(sizes, n_queries, k):
+    results = []
+    for size in sizes:
+        docs, cities = synthetic_corpus(size)
+        queries = [random.Random(size + i).choice(cities).title() for i in range(n_queries)]
+
+        started = time.perf_counter()
+        retriever = Retriever(HashingEmbedder(), docs)
+        build_s = time.perf_counter() - started
+        dense_only = Retriever(HashingEmbedder(), retriever.documents, use_keywords=False,
+                               vector_index=retriever.vectors)
+
+        results.append({
+            "docs": size,
+            "build_s": round(build_s, 2),
+            "linear_scan": time_queries(lambda q: [d for d in docs if q.lower() in d.lower()], queries),
+            "dense": time_queries(lambda q: dense_only.search(q, k), queries),
+            "hybrid": time_queries(lambda q: retriever.search(q, k), queries),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.queries, args.k)
+    print(f"{'docs':>8} {'build s':>8} {'scan p50':>9} {'dense p50':>10} {'dense p95':>10} {'hybrid p50':>11} {'hybrid p95':>11}")
+    for row in results:
+        print(f"{row['docs']:>8} {row['build_s']:>8} {row['linear_scan']['p50_ms']:>9} "
+              f"{row['dense']['p50_ms']:>10} {row['dense']['p95_ms']:>10} "
+              f"{row['hybrid']['p50_ms']:>11} {row['hybrid']['p95_ms']:>11}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# bench_route_search.py
+# Connection search latency on a synthetic global schedule: hub airports
+# densely connected to each other, spokes feeding one to three hubs, about
+# 100k flights per day with the defaults. Queries are spoke-to-spoke (mostly
+# two stops), spoke-to-hub and hub-to-hub.
+#
+#   python backend/benchmarks/bench_route_search.py --airports 3000 --hubs 150
+
+import argparse
+from datetime import date, timedelta
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from route_search import FlightGraph  # noqa: E402
+
+BASE_DATE = date(2026, 10, 20)
+
+
+def airport_code(i):
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return letters[i // 676 % 26] + letters[i // 26 % 26] + letters[i % 26]
+
+
+def synthetic_schedule(n_airports, n_hubs, days=2, hub_density=0.4, seed=11):
+    """day_flights()-shaped rows for a hub-and-spoke network."""
+    rng = random.Random(seed)
+    codes = [airport_code(i) for i in range(n_airports)]
+    hubs, spokes = codes[:n_hubs], codes[n_hubs:]
+
+    routes = []  # (dep, arr, flights per day)
+    for a in hubs:
+        for b in hubs:
+            if a != b and rng.random() < hub_density:
+                routes.append((a, b, rng.randint(3, 10)))
+    for spoke in spokes:
+        for hub in rng.sample(hubs, rng.randint(1, 3)):
+            per_day = rng.randint(2, 6)
+            routes.extend([(spoke, hub, per_day), (hub, spoke, per_day)])
+
+    rows = []
+    for day in range(days):
+        flight_date = BASE_DATE + timedelta(days=day)
+        for n, (dep, arr, per_day) in enumerate(routes):
+            duration = 45 + zlib.crc32(f"{dep}{arr}".encode()) % 540
+            for _ in range(per_day):
+                departs = flight_date.isoformat() + f"T{rng.randint(5, 22):02d}:{rng.choice((0, 15, 30, 45)):02d}"
+                start = (int(departs[11:13]) * 60 + int(departs[14:16])) + duration
+                arrives = (flight_date + timedelta(days=start // 1440)).isoformat() + \
+                    f"T{start % 1440 // 60:02d}:{start % 60:02d}"
+                rows.append((dep, arr, departs + ":00+00:00", arrives + ":00+00:00", f"{dep} Intl", f"{arr} Intl",
+                             f"Air {n % 40}", f"X{n % 9000}", "scheduled"))
+    return rows, hubs, spokes
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection search latency on a synthetic global schedule")
+    parser.add_argument("--airports", type=int, default=3000)
+    parser.add_argument("--hubs", type=int, default=150)
+    parser.add_argument("--queries", type=int, default=300, help="per query class")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-stops", type=int, default=2)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rows, hubs, spokes = synthetic_schedule(args.airports, args.hubs)
+    started = time.perf_counter()
+    graph = FlightGraph(rows, BASE_DATE)
+    build_s = time.perf_counter() - started
+    print(f"{graph.stats()} built in {build_s:.2f}s")
+
+    rng = random.Random(5)
+    classes = {
+        "spoke_spoke": lambda: rng.sample(spokes, 2),
+        "spoke_hub": lambda: (rng.choice(spokes), rng.choice(hubs)),
+        "hub_hub": lambda: rng.sample(hubs, 2),
+    }
+    results = {"graph": graph.stats(), "build_s": round(build_s, 2), "queries": {}}
+    print(f"{'class':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'found':>6}")
+    for name, pick in classes.items():
+        samples, found = [], 0
+        for _ in range(args.queries):
+            origin, destination = pick()
+            started = time.perf_counter()
+            itineraries = graph.search(origin, destination, k=args.k, max_stops=args.max_stops)
+            samples.append((time.perf_counter() - started) * 1000)
+            found += bool(itineraries)
+        row = {"p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95),
+               "p99_ms": percentile(samples, 99), "found_rate": round(found / args.queries, 3)}
+        results["queries"][name] = row
+        print(f"{name:<12} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['found_rate']:>6}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# bench_scaling.py
+# Horizontal scaling of the agent tier (agent_registry.py, cache_backend.py),
+# offline against local stand-ins:
+#
+#   throughput  1..N agent replicas (benchmarks/stubs.py --agent-slots), each
+#               with a fixed capacity of --slots concurrent requests taking
+#               --service-ms, behind one AgentRegistry + AgentClient driven
+#               at --concurrency like the orchestrator's agent pool. Reports
+#               requests/s and its efficiency against N x the single replica.
+#   failover    the largest replica set again, with one replica killed halfway
+#               through: errors seen by callers, and when it was ejected.
+#   cache       N replicas' route caches fed a skewed key stream through the
+#               balancer: separate in-process caches vs one cache_server.py.
+#               Reports the hit rate and upstream calls (misses).
+#
+#   python backend/benchmarks/bench_scaling.py --replicas 1 2 4 8 --duration 10
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from harness import BACKEND_DIR, latency_summary, stop, wait_for_port
+
+from agent_client import AgentClient
+from agent_registry import AgentRegistry
+from cache_backend import SocketBackend
+from ttl_cache import TTLCache
+
+BASE_PORT = 6100
+
+
+def start_replicas(n, slots, service_ms):
+    processes = []
+    for port in range(BASE_PORT, BASE_PORT + n):
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stubs.py"), "--port", str(port),
+            "--agent-slots", str(slots), "--latency-ms", str(service_ms), "--latency-dist", "fixed",
+        ]))
+    for port in range(BASE_PORT, BASE_PORT + n):
+        wait_for_port(port)
+    return processes
+
+
+def drive(client, concurrency, duration, on_tick=None):
+    """Closed loop: `concurrency` threads POSTing back to back for `duration` seconds."""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(worker_id):
+        for n in itertools.count():
+            if time.monotonic() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                client.post("/get_flight_options", json={"worker": worker_id, "n": n}, deadline=5.0)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        for i in range(concurrency):
+            pool.submit(worker, i)
+        if on_tick is not None:
+            pool.submit(on_tick, deadline)
+    elapsed = time.monotonic() - started
+    summary = latency_summary(latencies)
+    return {"rps": round(len(latencies) / elapsed, 1), "errors": errors[0],
+            "p50_ms": summary["p50_ms"], "p99_ms": summary["p99_ms"]}
+
+
+def balanced_client(n, concurrency, **registry_settings):
+    registry = AgentRegistry("bench", [f"http://127.0.0.1:{port}" for port in range(BASE_PORT, BASE_PORT + n)],
+                             **registry_settings)
+    client = AgentClient("bench", pool_size=concurrency, read_timeout=5.0, max_retries=2, backoff_base=0.01,
+                         failure_threshold=10 ** 6, registry=registry)
+    return registry, client
+
+
+def throughput(args):
+    rows = {}
+    print(f"{'replicas':>8} {'rps':>8} {'efficiency':>10} {'p50 ms':>8} {'p99 ms':>8} {'errors':>6}")
+    for n in args.replicas:
+        processes = start_replicas(n, args.slots, args.service_ms)
+        try:
+            _, client = balanced_client(n, args.concurrency)
+            drive(client, args.concurrency, 1.0)  # warm up connections
+            row = rows[n] = drive(client, args.concurrency, args.duration)
+        finally:
+            stop(processes)
+        row["efficiency"] = round(row["rps"] / (n * rows[args.replicas[0]]["rps"] / args.replicas[0]), 3)
+        print(f"{n:>8} {row['rps']:>8} {row['efficiency']:>10.0%} {row['p50_ms']:>8} {row['p99_ms']:>8} "
+              f"{row['errors']:>6}")
+    return rows
+
+
+def failover(args):
+    n = max(args.replicas)
+    if n < 2:
+        return None
+    processes = start_replicas(n, args.slots, args.service_ms)
+    registry, client = balanced_client(n, args.concurrency, check_interval=1.0)
+    events = {}
+
+    def kill_one(deadline):
+        time.sleep(args.duration / 2)
+        processes[-1].kill()
+        events["killed_at"] = time.monotonic()
+        while time.monotonic() < deadline and "ejected_after_s" not in events:
+            if not registry.describe()[-1]["available"]:
+                events["ejected_after_s"] = round(time.monotonic() - events["killed_at"], 2)
+            time.sleep(0.01)
+
+    try:
+        row = drive(client, args.concurrency, args.duration, on_tick=kill_one)
+    finally:
+        stop(processes)
+    row.update(replicas=n, ejected_after_s=events.get("ejected_after_s"), registry=registry.stats())
+    print(f"failover: {n} replicas, one killed mid-run -> {row['rps']} rps, {row['errors']} errors, "
+          f"ejected after {row['ejected_after_s']}s")
+    return row
+
+
+def cache_sharing(args, workdir):
+    n = max(args.replicas)
+    rng = random.Random(5)
+    # Skewed popularity: a few routes are hot, most are rare.
+    weights = [1 / (rank + 1) for rank in range(args.routes)]
+    stream = rng.choices(range(args.routes), weights=weights, k=args.lookups)
+
+    sock = os.path.join(workdir, "cache_server.sock")
+    server = subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "cache_server.py"), "--socket", sock],
+                              stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(sock) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    rows = {}
+    try:
+        for name in ("memory", "socket"):
+            if name == "memory":
+                caches = [TTLCache(max_entries=args.routes, ttl=3600) for _ in range(n)]
+            else:
+                caches = [TTLCache(ttl=3600, backend=SocketBackend(sock, namespace="route")) for _ in range(n)]
+            turn = itertools.cycle(caches)  # the balancer spreads lookups evenly
+            upstream_calls = 0
+            started = time.perf_counter()
+            for route in stream:
+                cache = next(turn)
+                if cache.get(route) is None:
+                    upstream_calls += 1
+                    cache.set(route, {"route": route})
+            elapsed = time.perf_counter() - started
+            rows[name] = {"hit_rate": round(1 - upstream_calls / len(stream), 4), "upstream_calls": upstream_calls,
+                          "lookup_us": round(elapsed / len(stream) * 1e6, 1)}
+            print(f"cache {name:<6} across {n} replicas: hit rate {rows[name]['hit_rate']:.1%}, "
+                  f"{upstream_calls} upstream calls, {rows[name]['lookup_us']} us per lookup")
+    finally:
+        stop([server])
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent-tier throughput, failover and cache sharing across replicas")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--slots", type=int, default=4, help="concurrent requests each replica serves")
+    parser.add_argument("--service-ms", type=float, default=100.0, help="time per request on a replica")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--routes", type=int, default=2000, help="distinct keys in the cache test")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {"settings": vars(args)}
+    results["throughput"] = throughput(args)
+    results["failover"] = failover(args)
+    with tempfile.TemporaryDirectory() as workdir:
+        results["cache"] = cache_sharing(args, workdir)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
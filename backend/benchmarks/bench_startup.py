@@ -0,0 +1,141 @@
+# bench_startup.py
+# Cold-start cost of each service (startup.py), eager vs lazy initialization.
+# Every run is a fresh interpreter:
+#
+#   import_ms  process start until the service module is imported
+#   first_ms   process start until the first cache-served request is answered
+#              (an activity-index hit, an autocomplete, a cache_stats call)
+#   ready_ms   process start until every component is built (/startup)
+#   fork_ms    a preloaded, warmed parent forks; fork until the child has
+#              answered the same request (a pre-fork server's worker boot)
+#
+# plus the slowest imports from python -X importtime. The knowledge agent is
+# configured for Gemini with a placeholder key, so the eager mode pays for the
+# google.generativeai import but no request reaches the API: the probe city is
+# served from the cache a first run (against the stub model) primed. All stores
+# live in a temporary directory.
+#
+#   python backend/benchmarks/bench_startup.py --runs 5 --json startup.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBES = {
+    "knowledge_agent": ("POST", "/get_attractions", {"city": "Lisbon"}),
+    "flight_agent": ("GET", "/cache_stats", None),
+    "main_app": ("GET", "/api/autocomplete?q=lis", None),
+}
+
+# Runs in the child interpreter: argv is service, method, path, JSON body, fork (0/1).
+CHILD = """
+import json, os, sys, time
+service, method, path, body, fork = sys.argv[1:6]
+module = __import__(service)
+import startup
+client = module.app.test_client()
+def probe():
+    kwargs = {"json": json.loads(body)} if body != "null" else {}
+    response = client.open(path, method=method, **kwargs)
+    assert response.status_code == 200, (path, response.status_code)
+result = {"import_ms": startup.profile()["import_ms"]}
+def settle():
+    deadline = time.perf_counter() + 30
+    while startup.readiness()[0] not in ("ready", "degraded") and time.perf_counter() < deadline:
+        time.sleep(0.005)
+if fork == "1":
+    settle()
+    read_end, write_end = os.pipe()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        probe()
+        os.write(write_end, str((time.perf_counter() - forked) * 1000).encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    result["fork_ms"] = float(os.read(read_end, 64))
+else:
+    probe()
+    result["first_ms"] = startup.profile()["uptime_ms"]
+    settle()
+    result["ready_ms"] = startup.profile()["ready_ms"]
+print(json.dumps(result))
+"""
+
+
+def run_child(service, env, fork=False):
+    method, path, body = PROBES[service]
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD, service, method, path, json.dumps(body), str(int(fork))],
+        cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{service} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_imports(importtime_log, n):
+    """Top-level (non-nested) imports by cumulative time, from -X importtime output."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and name.startswith(" ") and not name.startswith("   "):
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in sorted(rows, reverse=True)[:n]]
+
+
+def median(values):
+    values = sorted(v for v in values if v is not None)
+    return round(values[len(values) // 2], 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start cost of each service, eager vs lazy initialization")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per service and mode")
+    parser.add_argument("--services", nargs="+", default=list(PROBES), choices=list(PROBES))
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to report")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    base = dict(os.environ, KNOWLEDGE_MODEL="gemini", GEMINI_API_KEY="placeholder", ACTIVITY_INDEX_REFRESH="0",
+                ACTIVITY_INDEX_PATH=os.path.join(tmp, "activity_index.sqlite3"),
+                GENERATION_CACHE_PATH=os.path.join(tmp, "generation_cache.sqlite3"),
+                SCHEDULE_STORE_PATH=os.path.join(tmp, "schedules.sqlite3"),
+                PLAN_STORE_PATH=os.path.join(tmp, "plan_store.sqlite3"))
+    run_child("knowledge_agent", dict(base, KNOWLEDGE_MODEL="stub", STUB_MODEL_LATENCY_MS="0"))  # primes the cache
+
+    results = {"settings": vars(args), "services": {}}
+    print(f"{'service':<16} {'mode':<6} {'import ms':>9} {'first ms':>9} {'ready ms':>9} {'fork ms':>8}")
+    for service in args.services:
+        results["services"][service] = {}
+        for mode, lazy in (("eager", "0"), ("lazy", "1")):
+            env = dict(base, LAZY_INIT=lazy)
+            runs, log = [], ""
+            for _ in range(args.runs):
+                result, log = run_child(service, env)
+                result.update(run_child(service, env, fork=True)[0])
+                runs.append(result)
+            row = results["services"][service][mode] = {
+                key: median(r.get(key) for r in runs) for key in ("import_ms", "first_ms", "ready_ms", "fork_ms")}
+            row["slowest_imports"] = slowest_imports(log, args.top)
+            print(f"{service:<16} {mode:<6} {row['import_ms']:>9} {row['first_ms']:>9} {row['ready_ms']!s:>9} "
+                  f"{row['fork_ms']:>8}")
+        for mode in ("eager", "lazy"):
+            top = ", ".join(f"{i['module']} {i['ms']}" for i in results["services"][service][mode]["slowest_imports"])
+            print(f"  {mode} slowest imports (ms): {top}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# harness.py
+# Shared plumbing for the end-to-end benchmarks (load_test.py, bench_pipeline.py):
+# starting the stub AviationStack and the three services, driving an endpoint
+# at fixed concurrency, and summarizing latencies and Server-Timing stages.
+
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from server_timing import parse_header  # noqa: E402
+
+STUB_PORT = 5999
+SERVICES = [  # (flask module, asgi module, port)
+    ("knowledge_agent", "knowledge_agent_asgi", 5001),
+    ("flight_agent", "flight_agent_asgi", 5002),
+    ("main_app", "main_app_asgi", 5000),
+]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"nothing listening on port {port} after {timeout}s")
+
+
+def start_stub(latency):
+    """Runs benchmarks/stubs.py with a stub_model.LatencyProfile; returns the process."""
+    process = subprocess.Popen([
+        sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "stubs.py"), "--port", str(STUB_PORT),
+        "--latency-ms", str(latency.mean_ms), "--jitter-ms", str(latency.jitter_ms),
+        "--latency-dist", latency.dist, "--error-rate", str(latency.error_rate),
+    ])
+    wait_for_port(STUB_PORT)
+    return process
+
+
+def service_env(workdir, model_latency, caches=False):
+    """Environment for the services: stub model, stub AviationStack, caches off unless asked."""
+    env = dict(os.environ)
+    env.update({
+        "KNOWLEDGE_MODEL": "stub",
+        "STUB_MODEL_LATENCY_MS": str(model_latency.mean_ms),
+        "STUB_MODEL_JITTER_MS": str(model_latency.jitter_ms),
+        "STUB_MODEL_LATENCY_DIST": model_latency.dist,
+        "STUB_MODEL_ERROR_RATE": str(model_latency.error_rate),
+        "AVIATIONSTACK_API_KEY": "stub",
+        "AVIATIONSTACK_API_URL": f"http://127.0.0.1:{STUB_PORT}/v1/flights",
+        "GENERATION_CACHE_PATH": os.path.join(workdir, "generation_cache.sqlite3"),
+        "ACTIVITY_INDEX_PATH": os.path.join(workdir, "activity_index.sqlite3"),
+        "SCHEDULE_STORE_PATH": os.path.join(workdir, "schedules.sqlite3"),
+        "PYTHONUNBUFFERED": "1",
+    })
+    # The stubs have no quota: leave the rate limiters off unless the caller configured them.
+    for name in ("GEMINI_RATE_PER_MIN", "AVIATIONSTACK_RATE_PER_MIN"):
+        env.setdefault(name, "0")
+    if not caches:
+        env.update({"GENERATION_CACHE_TTL": "0", "ROUTE_CACHE_TTL": "0", "ROUTE_CACHE_STALE_TTL": "0",
+                    "ACTIVITY_INDEX_REFRESH": "0"})
+    return env
+
+
+def start_services(mode, env, workdir, workers=1):
+    """Starts all three services in "flask" or "asgi" mode; child logs go to `workdir`."""
+    processes = []
+    for flask_module, asgi_module, port in SERVICES:
+        if mode == "flask":
+            command = [sys.executable, f"{flask_module}.py"]
+        else:
+            command = [sys.executable, "-m", "uvicorn", f"{asgi_module}:app", "--port", str(port),
+                       "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+        log = open(os.path.join(workdir, f"{mode}-{flask_module}.log"), "w")
+        processes.append(subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT))
+        wait_for_port(port)
+    return processes
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))], 1)
+
+
+def latency_summary(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 1) if samples else None,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+    }
+
+
+async def drive(url, make_body, concurrency, duration, seed=0, degraded=None):
+    """
+    Closed-loop load: `concurrency` clients, each POSTing back-to-back for
+    `duration` seconds. Only 200s count towards latency; anything else is an
+    error. `degraded(body)` flags 200s that carry fallback data. Returns
+    throughput, latency percentiles, and the same percentiles per
+    Server-Timing stage.
+    """
+    latencies, stages, errors, fallbacks = [], {}, 0, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+        deadline = time.monotonic() + duration
+
+        async def worker(worker_id):
+            nonlocal errors, fallbacks
+            rng = random.Random(seed * 100003 + worker_id)
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=make_body(rng))
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+                if degraded is not None and degraded(response.json()):
+                    fallbacks += 1
+                for name, elapsed_ms in parse_header(response.headers.get("server-timing")).items():
+                    stages.setdefault(name, []).append(elapsed_ms)
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "degraded": fallbacks,
+        "rps": round(len(latencies) / elapsed, 1),
+        **{key: value for key, value in latency_summary(latencies).items() if key != "count"},
+        "stages": {name: latency_summary(samples) for name, samples in sorted(stages.items())},
+    }
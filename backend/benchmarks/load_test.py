@@ -0,0 +1,62 @@
+# load_test.py
+# Compares the Flask (threaded dev server) and ASGI (uvicorn) serving modes
+# end to end: stub AviationStack + stub Gemini -> both agents -> main_app.
+# Caches are disabled so every request pays the (stubbed) upstream latency.
+#
+#   python backend/benchmarks/load_test.py --concurrency 64 --duration 15 --workers 4
+
+import argparse
+import asyncio
+import json
+import tempfile
+
+from harness import drive, service_env, start_services, start_stub, stop
+from stub_model import LatencyProfile
+
+AIRPORTS = ["JFK", "LAX", "LHR", "CDG", "HND", "SIN", "DXB", "SYD", "FRA", "AMS"]
+
+
+def plan_body(rng):
+    # A large pool of made-up cities keeps requests from being coalesced.
+    return {"city": f"Town{rng.randrange(100000)}", "origin": rng.choice(AIRPORTS), "travel_date": "2026-10-20"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask vs ASGI load test against local stub upstreams")
+    parser.add_argument("--modes", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--workers", type=int, default=4, help="uvicorn workers per service (asgi mode)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0)
+    parser.add_argument("--model-latency-ms", type=float, default=300.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        stub = start_stub(LatencyProfile(mean_ms=args.upstream_latency_ms))
+        env = service_env(workdir, LatencyProfile(mean_ms=args.model_latency_ms))
+        try:
+            for mode in args.modes:
+                processes = start_services(mode, env, workdir, args.workers)
+                try:
+                    asyncio.run(drive("http://127.0.0.1:5000/api/plan_trip", plan_body, 4, 2))  # warm-up
+                    results[mode] = asyncio.run(drive("http://127.0.0.1:5000/api/plan_trip", plan_body,
+                                                      args.concurrency, args.duration))
+                finally:
+                    stop(processes)
+        finally:
+            stop([stub])
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s model={args.model_latency_ms}ms "
+          f"aviationstack={args.upstream_latency_ms}ms")
+    print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode, row in results.items():
+        print(f"{mode:<6} {row['rps']:>8} {row['p50_ms']!s:>8} {row['p95_ms']!s:>8} {row['p99_ms']!s:>8} {row['errors']:>7}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# stubs.py
+# Local stand-in for the AviationStack /v1/flights API, so benchmarks and load
+# tests never touch the real provider or its quota.
+#
+#   python backend/benchmarks/stubs.py --port 5999 --latency-ms 50
+#
+# Point the flight agent (or the schedule sync job in schedule_store.py) at it
+# with AVIATIONSTACK_API_URL=http://127.0.0.1:5999/v1/flights.
+# The Gemini side is stubbed in-process instead: run the knowledge agent with
+# KNOWLEDGE_MODEL=stub (see stub_model.py).
+#
+# With --agent-slots it serves a stand-in agent replica instead: the agents'
+# POST endpoints and /readyz, at most that many requests at a time (the rest
+# queue), each taking --latency-ms. A fixed capacity per replica is what the
+# replica-scaling benchmark (bench_scaling.py) needs to measure balancing.
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import math
+import os
+import sys
+import time
+import zlib
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_model import LATENCY_DISTRIBUTIONS, LatencyProfile  # noqa: E402
+
+
+STUB_AIRPORTS = ["JFK", "LAX", "ORD", "ATL", "SFO", "LHR", "CDG", "FRA", "AMS", "MAD",
+                 "FCO", "DXB", "SIN", "HND", "ICN", "SYD", "GRU", "MEX", "YYZ", "BCN"]
+FLIGHTS_PER_ROUTE = 6
+
+
+def flight_record(dep_iata, arr_iata, n, flight_date="2026-10-20"):
+    """The n-th daily flight on a route; deterministic, so syncs are repeatable."""
+    seed = zlib.crc32(f"{dep_iata}-{arr_iata}".encode())
+    departure = datetime.fromisoformat(flight_date) + timedelta(
+        hours=6 + 2 * n + seed % 2, minutes=15 * (seed % 4))
+    arrival = departure + timedelta(minutes=90 + seed % 600)
+    airline = n % 3 + 1
+    return {
+        "flight_date": flight_date,
+        "flight_status": "scheduled",
+        "departure": {"airport": f"{dep_iata} International", "iata": dep_iata,
+                      "scheduled": departure.isoformat() + "+00:00"},
+        "arrival": {"airport": f"{arr_iata} International", "iata": arr_iata,
+                    "scheduled": arrival.isoformat() + "+00:00"},
+        "airline": {"name": f"Stub Air {airline}", "iata": f"S{airline}"},
+        "flight": {"number": f"{100 + n}", "iata": f"S{airline}{100 + n}"},
+    }
+
+
+def make_aviationstack_app(latency=None, quota_per_minute=0.0):
+    """
+    Starlette app serving /v1/flights; `latency` is a stub_model.LatencyProfile.
+    Supports dep_iata, arr_iata (optional: every STUB_AIRPORTS destination),
+    flight_date, limit and offset, with AviationStack's pagination block.
+    With `quota_per_minute`, requests beyond it (per one-second window) get a
+    429 with Retry-After, like a provider quota.
+    """
+    latency = latency or LatencyProfile(mean_ms=50.0)
+    per_second = math.ceil(quota_per_minute / 60) if quota_per_minute > 0 else None
+    window = {"second": 0, "count": 0}
+
+    async def flights(request):
+        if per_second is not None:
+            second = int(time.monotonic())
+            if second != window["second"]:
+                window.update(second=second, count=0)
+            window["count"] += 1
+            if window["count"] > per_second:
+                return JSONResponse({"error": {"code": "rate_limit_reached", "message": "quota exceeded"}},
+                                    status_code=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(latency.sample())
+        if latency.should_fail():
+            return JSONResponse({"error": {"code": "stub_error", "message": "injected failure"}}, status_code=503)
+        params = request.query_params
+        dep_iata = params.get("dep_iata", "AAA")
+        flight_date = params.get("flight_date", "2026-10-20")
+        limit, offset = min(int(params.get("limit", "100")), 100), int(params.get("offset", "0"))
+        destinations = [params["arr_iata"]] if params.get("arr_iata") else [a for a in STUB_AIRPORTS if a != dep_iata]
+        everything = [flight_record(dep_iata, arr_iata, n, flight_date)
+                      for arr_iata in destinations for n in range(FLIGHTS_PER_ROUTE)]
+        data = everything[offset:offset + limit]
+        return JSONResponse({"pagination": {"limit": limit, "offset": offset, "count": len(data),
+                                            "total": len(everything)},
+                             "data": data})
+
+    return Starlette(routes=[Route("/v1/flights", flights)])
+
+
+def make_agent_replica_app(latency=None, slots=4):
+    """Starlette app standing in for one agent replica with `slots` concurrent requests of capacity."""
+    latency = latency or LatencyProfile(mean_ms=50.0)
+    capacity = asyncio.Semaphore(slots)
+
+    async def answer(request):
+        body = await request.json()
+        async with capacity:
+            await asyncio.sleep(latency.sample())
+        if latency.should_fail():
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+        return JSONResponse({"echo": body, "flights": [], "activities": []})
+
+    async def readyz(request):
+        return JSONResponse({"status": "ready"})
+
+    return Starlette(routes=[Route(path, answer, methods=["POST"])
+                             for path in ("/get_attractions", "/get_flight_options")]
+                     + [Route("/readyz", readyz)])
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub AviationStack server (or agent replica)")
+    parser.add_argument("--port", type=int, default=5999)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--latency-dist", default="uniform", choices=LATENCY_DISTRIBUTIONS)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--quota-per-min", type=float, default=0.0, help="answer 429 above this rate (0: no quota)")
+    parser.add_argument("--agent-slots", type=int, default=0,
+                        help="serve an agent replica with this many concurrent requests of capacity instead")
+    args = parser.parse_args()
+    latency = LatencyProfile(args.latency_ms, args.jitter_ms, args.latency_dist, args.error_rate)
+    if args.agent_slots:
+        app = make_agent_replica_app(latency, args.agent_slots)
+    else:
+        app = make_aviationstack_app(latency, args.quota_per_min)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
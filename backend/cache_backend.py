@@ -0,0 +1,204 @@
+# cache_backend.py
+# Storage behind ttl_cache.TTLCache: in-process, or shared by every replica on
+# the host through cache_server.py.
+#
+#   memory  an LRU dict in this process (the default); each worker and replica
+#           warms its own copy
+#   socket  a cache_server.py process on a Unix socket; a route fetched by one
+#           replica is a hit in all of them
+#
+# Pick one with CACHE_BACKEND=memory|socket (and CACHE_SERVER_SOCKET for the
+# socket path). Both store (value, stored_at) with a hard expiry; freshness and
+# stale-while-revalidate stay in TTLCache. The socket backend keeps one
+# connection per thread. If the server is unreachable, lookups miss and writes
+# are dropped, so the cache never takes a request down with it; it reconnects
+# after `retry_interval` seconds.
+
+from collections import OrderedDict
+import os
+import socket
+import struct
+import threading
+import time
+
+import codec
+import telemetry
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "cache_server.sock")
+
+_FRAME = struct.Struct(">II")  # header length, body length
+
+
+class MemoryBackend:
+    """Thread-safe LRU of (value, stored_at), each entry dropped `expire_after` seconds after it was set."""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, stored_at, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {"evictions": 0, "expirations": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            return value, stored_at
+
+    def set(self, key, value, stored_at, expire_after):
+        with self._lock:
+            self._entries[key] = (value, stored_at, time.monotonic() + expire_after)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self, prefix=None):
+        with self._lock:
+            stats = dict(self._stats)
+            if prefix is None:
+                stats["size"] = len(self._entries)
+            else:
+                stats["size"] = sum(1 for key in self._entries if key.startswith(prefix))
+        return stats
+
+
+# --- Wire format (shared with cache_server.py) ---
+# Each message is a frame: header and body lengths, a JSON header, then the
+# body bytes. Requests: [op, key, stored_at, expire_after] + the encoded value
+# for "set". Replies: ["hit", stored_at] + the value, ["miss"], ["ok"] or
+# ["ok", stats].
+
+def send_frame(sock, header, body=b""):
+    header = codec.dumps(header)
+    sock.sendall(_FRAME.pack(len(header), len(body)) + header + body)
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise ConnectionError("cache server closed the connection")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_frame(sock):
+    """(header, body) of the next frame; raises ConnectionError at end of stream."""
+    header_length, body_length = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    header = codec.loads(_recv_exact(sock, header_length))
+    return header, _recv_exact(sock, body_length) if body_length else b""
+
+
+class SocketBackend:
+    """
+    Client of a cache_server.py on a Unix socket. Keys live under
+    `namespace`; values must be JSON-serializable.
+    """
+
+    clock = staticmethod(time.time)  # stored_at has to mean the same in every process
+
+    def __init__(self, path=DEFAULT_SOCKET_PATH, namespace="cache", timeout=0.5, retry_interval=1.0):
+        self.path = path
+        self.namespace = namespace
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._local = threading.local()
+        self._down_until = 0.0
+        self._stats_lock = threading.Lock()
+        self._stats = {"errors": 0, "skipped": 0}
+
+    def _key(self, key):
+        if isinstance(key, tuple):
+            key = "|".join(map(str, key))
+        return f"{self.namespace}:{key}"
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None or getattr(self._local, "pid", None) != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._local.sock, self._local.pid = sock, os.getpid()
+        return sock
+
+    def _call(self, header, body=b""):
+        """The server's reply, or None while it is unreachable."""
+        if time.monotonic() < self._down_until:
+            self._count("skipped")
+            return None
+        try:
+            sock = self._connection()
+            send_frame(sock, header, body)
+            return recv_frame(sock)
+        except (OSError, ValueError) as e:
+            sock, self._local.sock = getattr(self._local, "sock", None), None
+            if sock is not None:
+                sock.close()
+            self._count("errors")
+            if time.monotonic() >= self._down_until:
+                telemetry.log(f"SocketBackend: cache server at {self.path} unreachable ({e}); "
+                              f"retrying in {self.retry_interval:.0f}s")
+            self._down_until = time.monotonic() + self.retry_interval
+            return None
+
+    def get(self, key):
+        reply = self._call(["get", self._key(key), 0, 0])
+        if reply is None or reply[0][0] != "hit":
+            return None
+        header, body = reply
+        return codec.loads(body), header[1]
+
+    def set(self, key, value, stored_at, expire_after):
+        self._call(["set", self._key(key), stored_at, expire_after], codec.dumps(value))
+
+    def delete(self, key):
+        self._call(["delete", self._key(key), 0, 0])
+
+    def clear(self):
+        self._call(["clear", f"{self.namespace}:", 0, 0])
+
+    def stats(self):
+        """This namespace's size and the server's evictions, plus this client's errors."""
+        reply = self._call(["stats", f"{self.namespace}:", 0, 0])
+        stats = dict(reply[0][1]) if reply is not None else {"size": 0, "evictions": 0, "expirations": 0}
+        with self._stats_lock:
+            stats.update(self._stats)
+        return stats
+
+
+def from_env(namespace, max_entries):
+    """The backend selected by CACHE_BACKEND for the cache called `namespace`."""
+    kind = os.getenv("CACHE_BACKEND", "memory")
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    if kind == "socket":
+        # The server's own limit (cache_server.py --max-entries) applies instead of max_entries.
+        return SocketBackend(os.getenv("CACHE_SERVER_SOCKET", DEFAULT_SOCKET_PATH), namespace)
+    raise ValueError(f"CACHE_BACKEND must be memory or socket, not {kind!r}")
@@ -0,0 +1,83 @@
+# cache_server.py
+# Shared cache tier for the replicas on one host: a small key-value server on
+# a Unix socket that cache_backend.SocketBackend talks to. Entries are kept
+# in memory, LRU-evicted past --max-entries and dropped at the expiry their
+# writer set; values are stored as the encoded bytes the client sent.
+#
+#   python backend/cache_server.py --socket backend/cache/cache_server.sock
+#   CACHE_BACKEND=socket python backend/flight_agent.py
+#
+# Restarting the server empties the cache; the agents treat it as cold and
+# keep serving meanwhile (see cache_backend.py).
+
+import argparse
+import os
+import socketserver
+
+from cache_backend import DEFAULT_SOCKET_PATH, MemoryBackend, recv_frame, send_frame
+
+
+class CacheHandler(socketserver.BaseRequestHandler):
+    """Serves one client connection until it closes."""
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                (op, key, stored_at, expire_after), body = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            except ValueError:
+                return  # not our protocol; drop the connection
+            if op == "get":
+                entry = store.get(key)
+                if entry is None:
+                    send_frame(self.request, ["miss"])
+                else:
+                    value, stored_at = entry
+                    send_frame(self.request, ["hit", stored_at], value)
+            elif op == "set":
+                store.set(key, body, stored_at, expire_after)
+                send_frame(self.request, ["ok"])
+            elif op == "delete":
+                store.delete(key)
+                send_frame(self.request, ["ok"])
+            elif op == "clear":
+                store.clear(prefix=key)
+                send_frame(self.request, ["ok"])
+            elif op == "stats":
+                send_frame(self.request, ["ok", store.stats(prefix=key)])
+            else:
+                send_frame(self.request, ["error", f"unknown op {op!r}"])
+
+
+class CacheServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, max_entries):
+        self.store = MemoryBackend(max_entries)
+        if os.path.exists(path):
+            os.unlink(path)  # left behind by a previous run
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        super().__init__(path, CacheHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache server for the agent replicas on this host")
+    parser.add_argument("--socket", default=os.getenv("CACHE_SERVER_SOCKET", DEFAULT_SOCKET_PATH))
+    parser.add_argument("--max-entries", type=int, default=int(os.getenv("CACHE_SERVER_MAX_ENTRIES", "100000")))
+    args = parser.parse_args()
+
+    server = CacheServer(args.socket, args.max_entries)
+    print(f"Cache server listening on {args.socket} (max {args.max_entries} entries)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
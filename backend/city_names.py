@@ -0,0 +1,59 @@
+# city_names.py
+# Normalization of free-text city names so that aliases and case variants
+# ("NYC", "new york city", "New York") map to one canonical name.
+
+import re
+
+# alias (lowercase, punctuation stripped) -> canonical display name
+CITY_ALIASES = {
+    "nyc": "New York City",
+    "ny": "New York City",
+    "new york": "New York City",
+    "new york city": "New York City",
+    "the big apple": "New York City",
+    "manhattan": "New York City",
+    "la": "Los Angeles",
+    "l a": "Los Angeles",
+    "sf": "San Francisco",
+    "san fran": "San Francisco",
+    "dc": "Washington",
+    "washington dc": "Washington",
+    "washington d c": "Washington",
+    "paris france": "Paris",
+    "city of light": "Paris",
+    "london uk": "London",
+    "london england": "London",
+    "tokyo japan": "Tokyo",
+    "tokio": "Tokyo",
+    "roma": "Rome",
+    "rome italy": "Rome",
+    "mumbai india": "Mumbai",
+    "bombay": "Mumbai",
+    "bengaluru": "Bangalore",
+    "madras": "Chennai",
+    "calcutta": "Kolkata",
+    "sydney australia": "Sydney",
+    "dubai uae": "Dubai",
+    "singapore city": "Singapore",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def clean_city(city):
+    """Lowercases, strips punctuation and collapses whitespace."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", city.lower())).strip()
+
+
+def canonical_city(city):
+    """Returns the canonical display name for a city, e.g. "nyc" -> "New York City"."""
+    cleaned = clean_city(city)
+    if cleaned in CITY_ALIASES:
+        return CITY_ALIASES[cleaned]
+    return cleaned.title()
+
+
+def city_key(city):
+    """Stable lookup key for a city: its canonical name, lowercased."""
+    return canonical_city(city).lower()
@@ -0,0 +1,169 @@
+# codec.py
+# Wire encoding for the bodies the services exchange.
+#
+# Internal agent endpoints pick their response encoding from the caller's
+# Accept header: MessagePack when the msgpack package is installed on both
+# ends, otherwise JSON. JSON is written and read with orjson when it is
+# installed and with the standard library otherwise; both produce the same
+# documents. The orchestrator decodes agent bodies straight from the response
+# bytes (requests' .json() first decodes the body to text, sniffing its
+# charset) and encodes its own responses exactly once.
+#
+# Public plan responses are compressed when the client accepts it: brotli if
+# the brotli package is installed, else gzip, and only above
+# COMPRESS_MIN_BYTES, below which compression costs more than it saves. The
+# SSE and NDJSON streams are never compressed; they must reach the client
+# chunk by chunk. See benchmarks/bench_codec.py.
+
+import gzip
+import json
+import os
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # standard library JSON: same output, slower
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # agents answer in JSON only
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack")
+
+# Accept header the orchestrator sends to the agents.
+AGENT_ACCEPT = f"{MSGPACK}, {JSON};q=0.9" if msgpack is not None else JSON
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+
+# --- JSON ---
+
+def dumps(obj):
+    """Compact JSON as UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """JSON bytes (or text) -> object. Raises ValueError."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+# --- Negotiation ---
+
+def _media_types(header):
+    """Media types in an Accept / Accept-Encoding header, minus the ones with q=0."""
+    accepted = set()
+    for entry in (header or "").lower().split(","):
+        name, *params = (part.strip() for part in entry.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def negotiate(accept):
+    """The response content type for an Accept header: MessagePack only when asked for and available."""
+    if msgpack is not None and _media_types(accept) & set(MSGPACK_TYPES):
+        return MSGPACK
+    return JSON
+
+
+def encode(obj, content_type=JSON):
+    if content_type in MSGPACK_TYPES:
+        return msgpack.packb(obj, use_bin_type=True)
+    return dumps(obj)
+
+
+def decode(body, content_type=JSON):
+    """Body bytes -> object, by Content-Type. Raises ValueError for a malformed body."""
+    if (content_type or "").split(";")[0].strip().lower() in MSGPACK_TYPES:
+        if msgpack is None:
+            raise ValueError("MessagePack body received but msgpack is not installed")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except Exception as e:  # msgpack raises several unrelated exception types
+            raise ValueError(f"malformed MessagePack body: {e}") from e
+    return loads(body)
+
+
+def decode_response(response):
+    """Decodes a requests or httpx response by its Content-Type, replacing response.json()."""
+    return decode(response.content, response.headers.get("Content-Type"))
+
+
+# --- Compression ---
+
+def content_encoding(accept_encoding):
+    """"br", "gzip" or None for an Accept-Encoding header."""
+    accepted = _media_types(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def encode_body(obj, accept=None, accept_encoding=None):
+    """
+    Encodes `obj` for a client's Accept / Accept-Encoding headers; pass
+    accept_encoding only for responses worth compressing. Returns
+    (body, headers).
+    """
+    content_type = negotiate(accept)
+    body = encode(obj, content_type)
+    headers = {"Content-Type": content_type}
+    if accept_encoding is not None:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = content_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+        if encoding:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+# --- Responses ---
+
+def respond(obj, status=200, compress=False):
+    """jsonify() replacement for Flask views, negotiated against the current request."""
+    body, headers = encode_body(obj, request.headers.get("Accept"),
+                                request.headers.get("Accept-Encoding", "") if compress else None)
+    return Response(body, status=status, headers=headers)
+
+
+def asgi_response(http_request, obj, status_code=200, compress=False):
+    """respond() for the Starlette handlers."""
+    # Starlette is only needed in ASGI mode.
+    from starlette.responses import Response as StarletteResponse
+
+    body, headers = encode_body(obj, http_request.headers.get("accept"),
+                                http_request.headers.get("accept-encoding", "") if compress else None)
+    return StarletteResponse(body, status_code=status_code, headers=headers)
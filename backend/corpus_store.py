@@ -0,0 +1,254 @@
+# corpus_store.py
+# On-disk knowledge corpus for the knowledge agent, plus its ingestion CLI.
+#
+# A corpus directory holds a manifest and one or more append-only segments:
+#   manifest.json            embedder name, dimension, list of segments
+#   seg-00000.txt            all chunk texts of the segment, UTF-8, back to back
+#   seg-00000.offsets.npy    int64 byte offsets into the .txt (count + 1 entries)
+#   seg-00000.emb.npy        float32 (count, dim) row-normalized embeddings
+#   seg-00000.hashes.npy     uint64 content hashes, used to skip duplicates
+# Readers memory-map every file, so N gunicorn workers share the same page cache
+# instead of each holding a copy. Ingestion appends a new segment and then swaps
+# the manifest atomically; existing segments are never rewritten.
+#
+#   python backend/corpus_store.py --store backend/cache/corpus docs.jsonl guides/*.md
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+
+import numpy as np
+
+from retrieval import VectorIndex, make_embedder, normalize_rows
+
+MANIFEST = "manifest.json"
+DEFAULT_CHUNK_CHARS = 800
+
+
+# --- Reading source documents ---
+
+def iter_source_documents(paths):
+    """
+    Streams (title, text) pairs from JSONL and Markdown files.
+    JSONL lines look like {"city": "Paris", "title": "...", "text": "..."};
+    Markdown files are split on headings, each section titled by its heading.
+    """
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    title = " - ".join(part for part in (record.get("city"), record.get("title")) if part)
+                    yield title, record["text"]
+        elif path.endswith((".md", ".markdown")):
+            yield from _markdown_sections(path)
+        else:
+            raise ValueError(f"Unsupported document format: {path}")
+
+
+def _markdown_sections(path):
+    """Yields one (title, text) per section; titles include parent headings."""
+    default_title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ")
+    headings, lines = [], []  # headings: [(level, text), ...] of the current section
+
+    def title():
+        return " - ".join(text for _, text in headings) or default_title
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            heading = re.match(r"(#{1,6})\s+(.*)", line)
+            if heading:
+                if "".join(lines).strip():
+                    yield title(), "".join(lines)
+                level = len(heading.group(1))
+                headings = [h for h in headings if h[0] < level] + [(level, heading.group(2).strip())]
+                lines = []
+            else:
+                lines.append(line)
+    if "".join(lines).strip():
+        yield title(), "".join(lines)
+
+
+def chunk_text(title, text, max_chars=DEFAULT_CHUNK_CHARS):
+    """
+    Packs paragraphs (then sentences, for very long paragraphs) into chunks of
+    at most `max_chars`, each prefixed with its title so it stays retrievable
+    on its own.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(re.split(r"(?<=[.!?])\s+", paragraph))
+
+    chunks, current = [], ""
+    for piece in filter(None, pieces):
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {piece}".strip()
+    if current:
+        chunks.append(current)
+    return [f"{title}: {chunk}" if title else chunk for chunk in chunks]
+
+
+def content_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# --- The store ---
+
+class CorpusDocuments:
+    """Read-only sequence of chunk texts backed by memory-mapped segment blobs."""
+
+    def __init__(self, blobs, offsets):
+        self._blobs = blobs
+        self._offsets = offsets
+        self._starts = np.cumsum([0] + [len(o) - 1 for o in offsets])
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        segment = int(np.searchsorted(self._starts, index, side="right")) - 1
+        local = index - self._starts[segment]
+        start, end = self._offsets[segment][local], self._offsets[segment][local + 1]
+        return self._blobs[segment][start:end].decode("utf-8")
+
+
+class CorpusStore:
+    """A corpus directory opened for reading (memory-mapped) and appending."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.embedder = make_embedder(self.manifest["embedder"], self.manifest["dim"])
+
+        self._files, blobs, offsets, self.embeddings, self.hashes = [], [], [], [], []
+        for segment in self.manifest["segments"]:
+            base = os.path.join(path, segment["name"])
+            offsets.append(np.load(base + ".offsets.npy", mmap_mode="r"))
+            self.embeddings.append(np.load(base + ".emb.npy", mmap_mode="r"))
+            self.hashes.append(np.load(base + ".hashes.npy", mmap_mode="r"))
+            if os.path.getsize(base + ".txt"):
+                f = open(base + ".txt", "rb")
+                self._files.append(f)
+                blobs.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                blobs.append(b"")
+        self.documents = CorpusDocuments(blobs, offsets)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, MANIFEST))
+
+    @classmethod
+    def create(cls, path, embedder="hashing", dim=256):
+        os.makedirs(path, exist_ok=True)
+        if not cls.exists(path):
+            _write_manifest(path, {"embedder": embedder, "dim": dim, "segments": []})
+        return cls(path)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def vector_index(self):
+        """A VectorIndex whose segments are the memory-mapped embedding files."""
+        return VectorIndex(self.embedder, self.embeddings)
+
+    def append(self, chunks, batch_size=1024):
+        """
+        Embeds new chunks and writes them as a new segment; chunks already in the
+        store (by content hash) are skipped. Returns the number of chunks added.
+        Call CorpusStore(path) again to see the new segment.
+        """
+        seen = set()
+        for hashes in self.hashes:
+            seen.update(hashes.tolist())
+        fresh = []
+        for chunk in chunks:
+            h = content_hash(chunk)
+            if h not in seen:
+                seen.add(h)
+                fresh.append((h, chunk))
+        if not fresh:
+            return 0
+
+        name = f"seg-{len(self.manifest['segments']):05d}"
+        base = os.path.join(self.path, name)
+        encoded = [chunk.encode("utf-8") for _, chunk in fresh]
+        with open(base + ".txt", "wb") as f:
+            for data in encoded:
+                f.write(data)
+        np.save(base + ".offsets.npy", np.cumsum([0] + [len(data) for data in encoded], dtype=np.int64))
+        np.save(base + ".hashes.npy", np.asarray([h for h, _ in fresh], dtype=np.uint64))
+
+        texts = [chunk for _, chunk in fresh]
+        embeddings = np.concatenate([
+            normalize_rows(self.embedder.embed(texts[start:start + batch_size]))
+            for start in range(0, len(texts), batch_size)
+        ])
+        np.save(base + ".emb.npy", embeddings.astype(np.float32))
+
+        manifest = dict(self.manifest, segments=self.manifest["segments"] + [{"name": name, "count": len(fresh)}])
+        _write_manifest(self.path, manifest)
+        self.manifest = manifest
+        return len(fresh)
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+
+def _write_manifest(path, manifest):
+    # Write-then-rename so readers never see a half-written manifest.
+    tmp_path = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+
+def ingest(store_path, paths, embedder="hashing", dim=256, max_chars=DEFAULT_CHUNK_CHARS):
+    store = CorpusStore.create(store_path, embedder, dim)
+    chunks = (
+        chunk
+        for title, text in iter_source_documents(paths)
+        for chunk in chunk_text(title, text, max_chars)
+    )
+    added = store.append(chunks)
+    store.close()
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest destination documents into an on-disk knowledge corpus.")
+    parser.add_argument("paths", nargs="+", help=".jsonl or .md files")
+    parser.add_argument("--store", required=True, help="corpus directory (created if missing)")
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "gemini"])
+    parser.add_argument("--dim", type=int, default=256, help="embedding size for the hashing embedder")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_CHUNK_CHARS)
+    args = parser.parse_args()
+
+    dim = args.dim
+    if args.embedder == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        dim = 768
+    added = ingest(args.store, args.paths, args.embedder, dim, args.max_chars)
+    print(f"Ingested {added} new chunks into {args.store} ({len(CorpusStore(args.store))} total).")
+
+
+if __name__ == "__main__":
+    main()
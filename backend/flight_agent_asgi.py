@@ -0,0 +1,172 @@
+# flight_agent_asgi.py
+# Async (ASGI) serving mode for the flight agent. Same routes and JSON as
+# flight_agent.py, but AviationStack calls are non-blocking, so one worker can
+# hold many outstanding lookups without a thread each.
+#
+#   uvicorn flight_agent_asgi:app --port 5002 --workers 4
+#
+# The hot routes are native async handlers; anything else falls through to the
+# Flask app, which a2wsgi runs in a thread pool.
+
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+import httpx
+import requests
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from async_agent_client import AsyncAgentClient
+import codec
+from rate_limiter import RateLimitTimeout, work_priority
+from single_flight import AsyncSingleFlight
+import flight_agent as agent
+import telemetry
+
+# Shares the Flask app's quota limiter: one AviationStack budget per process.
+AVIATIONSTACK_CLIENT = AsyncAgentClient.from_env("aviationstack", "AVIATIONSTACK", read_timeout=5.0, max_retries=1,
+                                                 rate_limiter=agent.AVIATIONSTACK_LIMITER)
+ROUTE_FLIGHT = AsyncSingleFlight("route")
+telemetry.REGISTRY.register_stats("agent_client", AVIATIONSTACK_CLIENT.stats, agent="aviationstack-async")
+telemetry.REGISTRY.register_stats("single_flight", ROUTE_FLIGHT.stats, name="route-async")
+_refresh_tasks = set()
+
+
+async def fetch_route_flights(dep_iata, arr_iata):
+    with telemetry.span("aviationstack"):
+        api_response = await AVIATIONSTACK_CLIENT.get(agent.AVIATIONSTACK_API_URL,
+                                                      params=agent.route_params(dep_iata, arr_iata))
+    with telemetry.span("parse"):
+        return agent.parse_flights(api_response.json())
+
+
+async def load_route(cache_key):
+    dep_iata, arr_iata, _ = cache_key
+
+    async def load():
+        flight_options = await fetch_route_flights(dep_iata, arr_iata)
+        await asyncio.to_thread(agent.ROUTE_CACHE.set, cache_key, flight_options)
+        return flight_options
+
+    return await ROUTE_FLIGHT.do(cache_key, load)
+
+
+async def refresh_route(cache_key):
+    try:
+        with work_priority("refresh"):
+            await load_route(cache_key)
+        agent.ROUTE_CACHE.record_refresh(True)
+    except Exception as e:
+        telemetry.log(f"Flight Agent: background refresh for {cache_key} failed: {e}")
+        agent.ROUTE_CACHE.record_refresh(False)
+
+
+async def flight_options_for(origin_iata, destination_iata, date=None,
+                             filters=(None, None, agent.DEFAULT_FLIGHT_OPTIONS)):
+    cache_key = agent.route_key(origin_iata, destination_iata, date)
+    # An indexed SQLite read (well under a millisecond), so it runs inline;
+    # connection searches (and graph rebuilds) are CPU work and go to a thread.
+    local = agent.local_flights(cache_key, filters, connections=False)
+    if local is agent.NO_DIRECT_FLIGHTS:
+        itineraries = await asyncio.to_thread(agent.connecting_flights, cache_key, filters)
+        return {"flights": itineraries} if itineraries else local
+    if local is not None:
+        return local
+
+    if not agent.AVIATIONSTACK_API_KEY:
+        telemetry.fallback("no_api_key")
+        return agent.MOCK_FLIGHT_DATA
+
+    try:
+        # With CACHE_BACKEND=socket the route cache is a round trip to cache_server.py.
+        flight_options, state = await asyncio.to_thread(agent.ROUTE_CACHE.lookup, cache_key)
+        if state == "stale":
+            # Serve the stale answer now, refresh in the background.
+            task = asyncio.create_task(refresh_route(cache_key))
+            _refresh_tasks.add(task)
+            task.add_done_callback(_refresh_tasks.discard)
+        elif state == "miss":
+            with telemetry.span("route_lookup"):
+                flight_options = await load_route(cache_key)
+
+        flight_options = agent.filter_flights(flight_options, filters)
+        if not flight_options:
+            return agent.NO_DIRECT_FLIGHTS
+        return {"flights": flight_options}
+
+    except RateLimitTimeout as e:
+        telemetry.log(f"Flight Agent: {e}. Returning mock data.")
+        telemetry.fallback("rate_limited")
+        return agent.MOCK_FLIGHT_DATA
+    except (httpx.HTTPError, requests.exceptions.RequestException, ValueError, KeyError) as e:
+        # RequestException covers CircuitOpenError, raised while the breaker is open.
+        telemetry.log(f"Flight Agent API call failed: {e}. Returning mock data.")
+        telemetry.fallback("api_error")
+        return agent.MOCK_FLIGHT_DATA
+
+
+async def get_flight_options(request: Request):
+    data = await request.json()
+    origin_iata = data.get('origin')
+    destination_iata = data.get('destination')
+
+    if not all([origin_iata, destination_iata]):
+        return JSONResponse({"error": "Origin and Destination IATA codes are required"}, status_code=400)
+    try:
+        filters = agent.route_filters(data)
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid route filters: {e}"}, status_code=400)
+
+    return codec.asgi_response(request, await flight_options_for(origin_iata, destination_iata,
+                                                                 data.get('date'), filters))
+
+
+async def get_flight_options_batch(request: Request):
+    data = await request.json() or {}
+    routes = data.get('routes')
+
+    if not isinstance(routes, list) or not routes:
+        return JSONResponse({"error": "routes must be a non-empty list"}, status_code=400)
+    if len(routes) > agent.MAX_BATCH_ROUTES:
+        return JSONResponse({"error": f"At most {agent.MAX_BATCH_ROUTES} routes per batch"}, status_code=400)
+    if not all(agent.valid_route(r) for r in routes):
+        return JSONResponse({"error": "Every route needs string origin and destination IATA codes (and date, if any)"},
+                            status_code=400)
+
+    try:
+        keys = [agent.route_key(r['origin'], r['destination'], r.get('date')) + (agent.route_filters(r),)
+                for r in routes]
+    except ValueError as e:
+        return JSONResponse({"error": f"Invalid route filters: {e}"}, status_code=400)
+    unique = list(dict.fromkeys(keys))
+    with work_priority("batch"):
+        answers = dict(zip(unique, await asyncio.gather(*(flight_options_for(*key) for key in unique))))
+    return codec.asgi_response(request, {"results": [answers[key] for key in keys]})
+
+
+async def cache_stats(request: Request):
+    return JSONResponse({
+        "route_cache": await asyncio.to_thread(agent.ROUTE_CACHE.stats),
+        "schedule_store": agent.SCHEDULE_STORE.stats(),
+        "flight_graphs": agent.flight_graph_stats(),
+        "route_single_flight": ROUTE_FLIGHT.stats(),
+        "aviationstack_client": AVIATIONSTACK_CLIENT.stats(),
+        "aviationstack_rate_limiter": agent.AVIATIONSTACK_LIMITER.stats()
+    })
+
+
+ROUTES = [
+    Route('/get_flight_options', get_flight_options, methods=['POST']),
+    Route('/get_flight_options_batch', get_flight_options_batch, methods=['POST']),
+    Route('/cache_stats', cache_stats, methods=['GET']),
+]
+
+# /metrics and any other route are served by the mounted Flask app.
+app = Starlette(
+    routes=ROUTES + [Mount('/', WSGIMiddleware(agent.app))],
+    middleware=[Middleware(telemetry.TelemetryMiddleware, service="flight_agent",
+                           paths=[route.path for route in ROUTES])],
+)
@@ -0,0 +1,109 @@
+# generation_cache.py
+# Persistent cache of Gemini attraction generations, stored in a local SQLite
+# file so that it survives restarts and is shared by every worker on the host.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "generation_cache.sqlite3")
+
+# Bumping the last_access timestamp on every hit would turn reads into writes;
+# only touch it when it is older than this many seconds.
+_TOUCH_INTERVAL = 60.0
+
+
+def context_hash(context):
+    """Short, stable fingerprint of the retrieved context that fed a prompt."""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16]
+
+
+class GenerationCache:
+    """
+    SQLite-backed cache of generated activity lists.
+    Entries are keyed on (city key, context hash) so that a change to the
+    knowledge base invalidates the generations that depended on it. Entries
+    older than `ttl` seconds are ignored, and once the table holds more than
+    `max_entries` rows the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=86400.0, max_entries=5000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS generations (
+                   city_key TEXT NOT NULL,
+                   context_hash TEXT NOT NULL,
+                   activities TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   last_access REAL NOT NULL,
+                   PRIMARY KEY (city_key, context_hash)
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_last_access ON generations (last_access)")
+        self._conn.commit()
+
+    def get(self, city_key, ctx_hash):
+        """Returns the cached activity list, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT activities, created_at, last_access FROM generations WHERE city_key = ? AND context_hash = ?",
+                (city_key, ctx_hash),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self._stats["misses"] += 1
+                return None
+            if now - row[2] > _TOUCH_INTERVAL:
+                self._conn.execute(
+                    "UPDATE generations SET last_access = ? WHERE city_key = ? AND context_hash = ?",
+                    (now, city_key, ctx_hash),
+                )
+                self._conn.commit()
+            self._stats["hits"] += 1
+        return json.loads(row[0])
+
+    def set(self, city_key, ctx_hash, activities):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (city_key, context_hash, activities, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (city_key, ctx_hash, json.dumps(activities), now, now),
+            )
+            self._stats["writes"] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops expired rows, then least recently used rows beyond max_entries. Caller holds the lock."""
+        expired = self._conn.execute("DELETE FROM generations WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM generations WHERE rowid IN "
+                "(SELECT rowid FROM generations ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+        self._stats["evictions"] += expired + max(overflow, 0)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            (stats["size"],) = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats.update(ttl=self.ttl, max_entries=self.max_entries)
+        return stats
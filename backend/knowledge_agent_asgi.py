@@ -0,0 +1,191 @@
+# knowledge_agent_asgi.py
+# Async (ASGI) serving mode for the knowledge agent. Same routes and JSON as
+# knowledge_agent.py, but Gemini is called through its async API, so a worker
+# is not blocked for the whole generation.
+#
+#   uvicorn knowledge_agent_asgi:app --port 5001 --workers 4
+#
+# The hot routes are native async handlers; anything else falls through to the
+# Flask app, which a2wsgi runs in a thread pool.
+
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import activity_prompt
+from city_names import city_key
+import codec
+from rate_limiter import RateLimitTimeout, is_throttled, work_priority
+from single_flight import AsyncSingleFlight
+import knowledge_agent as agent
+import telemetry
+
+GENERATION_FLIGHT = AsyncSingleFlight("generation")
+telemetry.REGISTRY.register_stats("single_flight", GENERATION_FLIGHT.stats, name="generation-async")
+
+
+async def attractions_for(city):
+    # Index and cache lookups, retrieval and the first model build all block
+    # (SQLite, embeddings, imports): keep them off the event loop too.
+    indexed = await run_in_threadpool(agent.indexed_activities, city)
+    if indexed is not None:
+        return {"activities": indexed}
+
+    city, context, (cache_key, ctx_hash) = await run_in_threadpool(agent.prepare_city, city)
+    with telemetry.span("cache"):
+        cached = await run_in_threadpool(agent.GENERATION_CACHE.get, cache_key, ctx_hash)
+    if cached is not None:
+        return {"activities": cached}
+
+    model = await run_in_threadpool(agent.generation_model)
+    if not model:
+        telemetry.fallback("model_unavailable")
+        return agent.FALLBACK_ACTIVITIES
+
+    async def generate():
+        telemetry.log(f"Knowledge Agent: Sending prompt to Gemini for {city}...")
+        with telemetry.span("prompt"):
+            prompt = agent.build_prompt(city, context)
+        with telemetry.span("quota"):
+            await agent.GEMINI_LIMITER.acquire_async()
+        with telemetry.span("gemini"):
+            try:
+                response = await model.generate_content_async(
+                    prompt, generation_config=agent.GENERATION_CONFIG)
+            except Exception as e:
+                if is_throttled(e):
+                    agent.GEMINI_LIMITER.record_throttled()
+                raise
+        agent.GEMINI_LIMITER.record_success()
+        agent.record_usage(response)
+        with telemetry.span("parse"):
+            attractions = agent.parse_activities(response.text)
+        if not attractions:
+            raise ValueError("no activities in the model's answer")
+        # SQLite write: keep it off the event loop
+        await run_in_threadpool(agent.GENERATION_CACHE.set, cache_key, ctx_hash, attractions)
+        return attractions
+
+    try:
+        with telemetry.span("generate"):
+            return {"activities": await GENERATION_FLIGHT.do((cache_key, ctx_hash), generate)}
+    except RateLimitTimeout as e:
+        telemetry.log(f"Knowledge Agent: {e}. Returning fallback activities.")
+        telemetry.fallback("rate_limited")
+        return agent.RATE_LIMITED_ACTIVITIES
+    except Exception as e:
+        telemetry.log(f"Error in Knowledge Agent during Gemini call: {e}")
+        telemetry.log("Knowledge Agent: Returning fallback activities.")
+        telemetry.fallback("model_error")
+        return agent.FALLBACK_ACTIVITIES
+
+
+async def get_attractions(request: Request):
+    data = await request.json()
+    city = data.get('city')
+
+    if not city:
+        return JSONResponse({"error": "City is a required field"}, status_code=400)
+
+    return codec.asgi_response(request, await attractions_for(city))
+
+
+async def get_attractions_batch(request: Request):
+    data = await request.json() or {}
+    cities = data.get('cities')
+
+    if not isinstance(cities, list) or not cities or not all(isinstance(c, str) and c.strip() for c in cities):
+        return JSONResponse({"error": "cities must be a non-empty list of city names"}, status_code=400)
+    if len(cities) > agent.MAX_BATCH_CITIES:
+        return JSONResponse({"error": f"At most {agent.MAX_BATCH_CITIES} cities per batch"}, status_code=400)
+
+    unique = {city_key(city): city for city in cities}
+    with work_priority("batch"):
+        answers = dict(zip(unique, await asyncio.gather(*(attractions_for(city) for city in unique.values()))))
+    return codec.asgi_response(request, {"results": [answers[city_key(city)] for city in cities]})
+
+
+async def get_attractions_stream(request: Request):
+    data = await request.json()
+    city = data.get('city')
+
+    if not city:
+        return JSONResponse({"error": "City is a required field"}, status_code=400)
+
+    indexed = await run_in_threadpool(agent.indexed_activities, city)
+    if indexed is not None:
+        message = {"type": "activities", "activities": indexed}
+        return StreamingResponse(iter([agent.ndjson_line(message)]), media_type="application/x-ndjson")
+
+    city, context, (cache_key, ctx_hash) = await run_in_threadpool(agent.prepare_city, city)
+    cached = await run_in_threadpool(agent.GENERATION_CACHE.get, cache_key, ctx_hash)
+    if cached is not None:
+        message = {"type": "activities", "activities": cached}
+        return StreamingResponse(iter([agent.ndjson_line(message)]), media_type="application/x-ndjson")
+    model = await run_in_threadpool(agent.generation_model)
+    if not model:
+        telemetry.fallback("model_unavailable")
+        message = {"type": "activities", **agent.FALLBACK_ACTIVITIES}
+        return StreamingResponse(iter([agent.ndjson_line(message)]), media_type="application/x-ndjson")
+
+    async def generate():
+        parser = activity_prompt.ActivityStreamParser(agent.MAX_ACTIVITIES)
+        try:
+            await agent.GEMINI_LIMITER.acquire_async()
+            stream = await model.generate_content_async(
+                agent.build_prompt(city, context), stream=True, generation_config=agent.GENERATION_CONFIG)
+            async for chunk in stream:
+                agent.record_usage(chunk)
+                for activity in parser.feed(chunk.text):
+                    yield agent.ndjson_line({"type": "token", "text": activity + "\n"})
+            for activity in parser.finish():
+                yield agent.ndjson_line({"type": "token", "text": activity + "\n"})
+            agent.GEMINI_LIMITER.record_success()
+            attractions = parser.items
+            if not attractions:
+                raise ValueError("no activities in the model's answer")
+            await run_in_threadpool(agent.GENERATION_CACHE.set, cache_key, ctx_hash, attractions)
+            yield agent.ndjson_line({"type": "activities", "activities": attractions})
+        except RateLimitTimeout as e:
+            telemetry.log(f"Knowledge Agent: {e}. Returning fallback activities.")
+            telemetry.fallback("rate_limited")
+            yield agent.ndjson_line({"type": "activities", **agent.RATE_LIMITED_ACTIVITIES})
+        except Exception as e:
+            if is_throttled(e):
+                agent.GEMINI_LIMITER.record_throttled()
+            telemetry.log(f"Error in Knowledge Agent during Gemini stream: {e}")
+            telemetry.fallback("model_error")
+            yield agent.ndjson_line({"type": "activities", **agent.FALLBACK_ACTIVITIES})
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def cache_stats(request: Request):
+    return JSONResponse({
+        "generation_cache": agent.GENERATION_CACHE.stats(),
+        "generation_single_flight": GENERATION_FLIGHT.stats(),
+        "activity_index": agent.ACTIVITY_INDEX.stats(),
+        "activity_refresh": agent.ACTIVITY_REFRESHER.stats(),
+        "gemini_rate_limiter": agent.GEMINI_LIMITER.stats()
+    })
+
+
+ROUTES = [
+    Route('/get_attractions', get_attractions, methods=['POST']),
+    Route('/get_attractions_batch', get_attractions_batch, methods=['POST']),
+    Route('/get_attractions/stream', get_attractions_stream, methods=['POST']),
+    Route('/cache_stats', cache_stats, methods=['GET']),
+]
+
+# /metrics and any other route are served by the mounted Flask app.
+app = Starlette(
+    routes=ROUTES + [Mount('/', WSGIMiddleware(agent.app))],
+    middleware=[Middleware(telemetry.TelemetryMiddleware, service="knowledge_agent",
+                           paths=[route.path for route in ROUTES])],
+)
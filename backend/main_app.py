@@ -1,219 +1,896 @@
-# main_app.py
-
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
-
-app = Flask(__name__)
-CORS(app)
-
-KNOWLEDGE_AGENT_URL = "http://127.0.0.1:5001/get_attractions"
-FLIGHT_AGENT_URL = "http://127.0.0.1:5002/get_flight_options"
-
-@app.route('/api/plan_trip', methods=['POST'])
-def plan_trip_endpoint():
-    user_request = request.get_json()
-    city = user_request.get('city')
-    origin = user_request.get('origin')
-    travel_date = user_request.get('travel_date')
-
-    if not all([city, origin, travel_date]):
-        return jsonify({"error": "All fields are required!"}), 400
-
-    try:
-        # Call Knowledge Agent
-        knowledge_payload = {"city": city}
-        knowledge_response = requests.post(KNOWLEDGE_AGENT_URL, json=knowledge_payload)
-        knowledge_response.raise_for_status()
-        knowledge_data = knowledge_response.json()
-        
-        # Call Flight Agent
-        # The flight agent expects the destination city to be an IATA code, like 'LAX'
-        flight_payload = {"origin": origin, "destination": city, "date": travel_date}
-        flight_response = requests.post(FLIGHT_AGENT_URL, json=flight_payload)
-        flight_response.raise_for_status()
-        flight_data = flight_response.json()
-
-        # --- !! THIS IS THE FIX !! ---
-        # The frontend expects data inside a "raw_data" object.
-        # We also need to extract the list from the agent's response.
-        final_plan = {
-            "summary": f"Here is your AI-Generated trip plan for {city}, departing from {origin} on {travel_date}.",
-            "raw_data": {
-                "flights": flight_data.get('flights', []),  # Extract the list of flights
-                "activities": knowledge_data.get('activities', [])  # Extract the list of activities
-            },
-            "metadata": {
-                # This helps the frontend display service status
-                "services_used": ["flight", "knowledge", "rag"]
-            }
-        }
-        
-        return jsonify(final_plan)
-
-    except requests.exceptions.RequestException as e:
-        error_message = "An AI agent is currently unavailable. Please try again later."
-        # Check which agent failed
-        if KNOWLEDGE_AGENT_URL in str(e):
-            error_message = "The Knowledge Agent is unavailable."
-        elif FLIGHT_AGENT_URL in str(e):
-            error_message = "The Flight Agent is unavailable."
-        
-        return jsonify({"error": error_message, "details": str(e)}), 503
-
-if __name__ == '__main__':
-    app.run(port=5000)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-'''# main_app.py
-
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
-
-app = Flask(__name__)
-CORS(app)
-
-KNOWLEDGE_AGENT_URL = "http://127.0.0.1:5001/get_attractions"
-# CORRECTED: Point this to the new multi-flight endpoint in the flight agent
-FLIGHT_AGENT_URL = "http://127.0.0.1:5002/get_flight_options" # <-- CHANGED
-
-@app.route('/api/plan_trip', methods=['POST'])
-def plan_trip_endpoint():
-    # ... (code for user_request and knowledge_agent call remains the same)
-    user_request = request.get_json()
-    city = user_request.get('city')
-    origin = user_request.get('origin')
-    travel_date = user_request.get('travel_date')
-
-    if not all([city, origin, travel_date]):
-        return jsonify({"error": "All fields are required!"}), 400
-
-    try:
-        knowledge_payload = {"city": city}
-        knowledge_response = requests.post(KNOWLEDGE_AGENT_URL, json=knowledge_payload)
-        knowledge_response.raise_for_status()
-        knowledge_data = knowledge_response.json()
-        
-        # Call Flight Agent
-        flight_payload = {"origin": origin, "destination": city, "date": travel_date}
-        flight_response = requests.post(FLIGHT_AGENT_URL, json=flight_payload) #<-- This now calls the correct endpoint
-        flight_response.raise_for_status()
-        flight_data = flight_response.json()
-
-        # Combine results
-        final_plan = {
-            "summary": f"Your trip to {city} from {origin}",
-            "flight_details": flight_data, # flight_data now contains {"flights": [...]}
-            "suggested_activities": knowledge_data.get('activities', [])
-        }
-        
-        return jsonify(final_plan)
-
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": "An AI agent is currently unavailable. Please try again later.", "details": str(e)}), 503
-
-if __name__ == '__main__':
-    app.run(port=5000)'''
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-'''# main_app.py
-
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
-
-app = Flask(__name__)
-CORS(app)
-
-# Updated Agent URL
-KNOWLEDGE_AGENT_URL = "http://127.0.0.1:5001/get_attractions" # <-- CHANGED
-FLIGHT_AGENT_URL = "http://127.0.0.1:5002/get_flight_options" # <-- CHANGED
-
-@app.route('/api/plan_trip', methods=['POST'])
-def plan_trip_endpoint():
-    user_request = request.get_json()
-    city = user_request.get('city')
-    origin = user_request.get('origin')
-    travel_date = user_request.get('travel_date')
-
-    if not all([city, origin, travel_date]):
-        return jsonify({"error": "All fields are required!"}), 400
-
-    try:
-        # 1. Call the new Knowledge Agent
-        knowledge_payload = {"city": city}
-        knowledge_response = requests.post(KNOWLEDGE_AGENT_URL, json=knowledge_payload) # <-- CHANGED
-        knowledge_response.raise_for_status()
-        knowledge_data = knowledge_response.json()
-
-        # 2. Call Flight Agent (no changes here)
-        flight_payload = {"origin": origin, "destination": city, "date": travel_date}
-        flight_response = requests.post(FLIGHT_AGENT_URL, json=flight_payload)
-        flight_response.raise_for_status()
-        flight_data = flight_response.json()
-
-        # --- Combine results ---
-        final_plan = {
-            "summary": f"Your trip to {city} from {origin}",
-            "flight_details": flight_data,
-            "suggested_activities": knowledge_data.get('activities', [])
-        }
-        
-        return jsonify(final_plan)
-
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": "An AI agent is currently unavailable. Please try again later.", "details": str(e)}), 503
-
-if __name__ == '__main__':
+# main_app.py
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import json
+import os
+import queue
+import time
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
+import requests
+
+from agent_client import AgentClient, CircuitOpenError
+from agent_registry import AgentRegistry
+import codec
+from city_names import city_key
+from plan_store import DEFAULT_PLAN_STORE_PATH, PlanStore
+from resolver import DEFAULT_AIRPORTS_PATH, Resolver
+from single_flight import SingleFlight
+import startup
+import telemetry
+
+app = Flask(__name__)
+CORS(app)
+telemetry.install(app, "main_app")
+startup.install(app)
+
+# --- Agent registry ---
+# Each agent can run as several replicas, listed (comma-separated base URLs)
+# in KNOWLEDGE_AGENT_URLS and FLIGHT_AGENT_URLS. Every call goes to the
+# replica with the fewest requests outstanding from this worker; replicas that
+# fail calls or their /readyz check are taken out of rotation until they
+# recover (see agent_registry.py). The agent endpoints below are paths on
+# whichever replica is picked.
+KNOWLEDGE_AGENTS = AgentRegistry.from_env("knowledge", "KNOWLEDGE_AGENT", "http://127.0.0.1:5001")
+FLIGHT_AGENTS = AgentRegistry.from_env("flight", "FLIGHT_AGENT", "http://127.0.0.1:5002")
+
+KNOWLEDGE_AGENT_PATH = "/get_attractions"
+FLIGHT_AGENT_PATH = "/get_flight_options"
+KNOWLEDGE_STREAM_PATH = "/get_attractions/stream"
+KNOWLEDGE_BATCH_PATH = "/get_attractions_batch"
+FLIGHT_BATCH_PATH = "/get_flight_options_batch"
+
+# --- Agent clients ---
+# One pooled keep-alive client per agent. Timeouts, pool size and retry budget
+# can be overridden per agent, e.g. KNOWLEDGE_AGENT_READ_TIMEOUT=20.
+# The knowledge agent waits on Gemini, so it is given more room by default.
+# Both forward the caller's X-Request-ID so a plan can be traced across services.
+KNOWLEDGE_CLIENT = AgentClient.from_env("knowledge", "KNOWLEDGE_AGENT", read_timeout=12.0, max_retries=1,
+                                        propagate_request_id=True, registry=KNOWLEDGE_AGENTS)
+FLIGHT_CLIENT = AgentClient.from_env("flight", "FLIGHT_AGENT", read_timeout=6.0, max_retries=2,
+                                     propagate_request_id=True, registry=FLIGHT_AGENTS)
+
+# Overall per-call deadline (seconds), covering retries.
+KNOWLEDGE_AGENT_TIMEOUT = float(os.getenv("KNOWLEDGE_AGENT_TIMEOUT", "12"))
+FLIGHT_AGENT_TIMEOUT = float(os.getenv("FLIGHT_AGENT_TIMEOUT", "6"))
+AGENT_POOL_WORKERS = int(os.getenv("AGENT_POOL_WORKERS", "16"))
+
+# Shared, bounded pool so a burst of plans cannot spawn unbounded threads.
+AGENT_POOL = ThreadPoolExecutor(max_workers=AGENT_POOL_WORKERS, thread_name_prefix="agent-call")
+
+# Identical concurrent agent calls (same URL and payload) are coalesced.
+AGENT_FLIGHT = SingleFlight("agent-call")
+
+AGENT_RESULTS = telemetry.REGISTRY.counter(
+    "agent_results_total", "Agent calls made by the orchestrator, by outcome.", ("agent", "status"))
+
+# Exported on /metrics at scrape time.
+telemetry.REGISTRY.register_stats("agent_client", KNOWLEDGE_CLIENT.stats, agent="knowledge")
+telemetry.REGISTRY.register_stats("agent_client", FLIGHT_CLIENT.stats, agent="flight")
+telemetry.REGISTRY.register_stats("agent_registry", KNOWLEDGE_AGENTS.stats, agent="knowledge")
+telemetry.REGISTRY.register_stats("agent_registry", FLIGHT_AGENTS.stats, agent="flight")
+telemetry.REGISTRY.register_stats("single_flight", AGENT_FLIGHT.stats, name="agent-call")
+
+# --- Place resolution ---
+# Free-text cities and origins ("paris", "Barcel", "JFK") are resolved to a
+# canonical city name for the knowledge agent and an IATA code for the flight
+# agent before any agent is called. Input the resolver doesn't know for sure
+# (typos, "Portland" or "Paris, TX" when only Porto and Paris, France are in the
+# data) is passed through unchanged. The index is built on first use or during warm-up, and
+# every plan needs it, so readiness waits for it.
+RESOLVER = startup.lazy("resolver", lambda: Resolver.from_file(os.getenv("AIRPORTS_PATH", DEFAULT_AIRPORTS_PATH)),
+                        required=True)
+AUTOCOMPLETE_LIMIT = int(os.getenv("AUTOCOMPLETE_LIMIT", "8"))
+
+PLACE_RESOLUTIONS = telemetry.REGISTRY.counter(
+    "place_resolutions_total", "Free-text places resolved before calling the agents, by match kind.", ("match",))
+
+
+def resolve_place(text):
+    """(canonical city name, IATA code) for free text."""
+    with telemetry.span("resolve"):
+        found = RESOLVER.get().resolve(text)
+    PLACE_RESOLUTIONS.inc(found.match if found else "none")
+    if found is None:
+        return text, text
+    return found.place.city, found.place.iata
+
+
+def resolve_trip(city, origin):
+    """(city for the knowledge agent, origin code, destination code) for one trip."""
+    city, destination = resolve_place(city)
+    return city, resolve_place(origin)[1], destination
+
+
+# --- Plan store ---
+# Plans made with an X-User-ID header are kept per user (see plan_store.py):
+# /api/plans pages through them, and a new plan reuses the agent outputs the
+# user's earlier plans got for the same inputs, so editing one field only
+# re-runs the agent that depends on it. Flight data goes stale much sooner
+# than activities. Without the header nothing is stored or reused.
+USER_ID_HEADER = "X-User-ID"
+PLAN_STORE = PlanStore(
+    path=os.getenv("PLAN_STORE_PATH", DEFAULT_PLAN_STORE_PATH),
+    max_age={"knowledge": float(os.getenv("PLAN_REUSE_KNOWLEDGE_MAX_AGE", "86400")),
+             "flight": float(os.getenv("PLAN_REUSE_FLIGHT_MAX_AGE", "900"))},
+)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+MAX_HISTORY_PAGE_SIZE = 100
+
+PLAN_REUSE = telemetry.REGISTRY.counter(
+    "plan_reuse_total", "Agent outputs reused from a stored plan instead of calling the agent.", ("agent",))
+telemetry.REGISTRY.register_stats("plan_store", PLAN_STORE.stats)
+
+
+def request_user(headers):
+    """The caller's user id, or None for anonymous requests."""
+    return (headers.get(USER_ID_HEADER) or "").strip()[:128] or None
+
+
+def trip_inputs(city, origin_code, destination_code, travel_date):
+    """
+    Each agent's payload for one trip, and the input key the plan store
+    tracks it by: (payloads, keys), both keyed by agent name.
+    """
+    payloads = {
+        "knowledge": {"city": city},
+        "flight": {"origin": origin_code, "destination": destination_code, "date": travel_date},
+    }
+    keys = {"knowledge": city_key(city), "flight": "|".join(route_key(origin_code, destination_code, travel_date))}
+    return payloads, keys
+
+
+def storable(data):
+    """
+    False for the agents' stand-in answers (fallback activities, mock flights)
+    and for empty activity lists, none of which may be reused.
+    """
+    data = data or {}
+    if str(data.get("source", "")).startswith("fallback") or data.get("activities") == []:
+        return False
+    return not any(isinstance(f, dict) and f.get("source") == "mock" for f in data.get("flights", []))
+
+
+def reused_results(user_id, keys):
+    """agent -> result, in agent_result()'s shape, for the agents a stored plan of this user already answered."""
+    results = {}
+    if not user_id:
+        return results
+    with telemetry.span("plan_store"):
+        for agent, key in keys.items():
+            data = PLAN_STORE.reusable(user_id, agent, key)
+            if data is not None:
+                PLAN_REUSE.inc(agent)
+                results[agent] = {"data": data, "status": "ok", "error": None, "elapsed_ms": 0.0}
+    return results
+
+
+def store_plan(user_id, request_fields, keys, body, results, reused):
+    """Saves a finished plan with the agent outputs it depends on; adds plan_id and reused to its metadata."""
+    outputs = {agent: result["data"] for agent, result in results.items()
+               if agent not in reused and result["status"] == "ok" and storable(result["data"])}
+    inputs = {agent: keys[agent] for agent in list(reused) + list(outputs)}
+    body["metadata"]["reused"] = sorted(reused)
+    with telemetry.span("plan_store"):
+        plan_id = PLAN_STORE.save(user_id, f"{keys['knowledge']}|{keys['flight']}", request_fields, body,
+                                  inputs, outputs)
+    body["metadata"]["plan_id"] = plan_id
+    return body
+
+
+# --- Batch settings ---
+MAX_BATCH_TRIPS = int(os.getenv("MAX_BATCH_TRIPS", "500"))
+# Unique cities / routes per agent batch call; must not exceed the agents' own limits.
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "25"))
+BATCH_AGENT_TIMEOUT = float(os.getenv("BATCH_AGENT_TIMEOUT", "60"))
+
+
+def call_agent(client, url, payload, timeout):
+    """
+    POSTs to an agent and returns its decoded JSON body. Identical calls that
+    are in flight at the same time share one request.
+    """
+    key = (url, json.dumps(payload, sort_keys=True))
+    return AGENT_FLIGHT.do(key, lambda: codec.decode_response(
+        client.post(url, json=payload, deadline=timeout, headers={"Accept": codec.AGENT_ACCEPT})))
+
+
+def agent_result(fn, *args):
+    """
+    Runs one agent call and wraps the outcome as
+    {"data", "status", "error", "elapsed_ms"}. Never raises.
+    """
+    started = time.monotonic()
+    result = {"data": None, "status": "ok", "error": None}
+    try:
+        result["data"] = fn(*args)
+    except CircuitOpenError as e:
+        # Agent has been failing; don't wait on it, degrade straight away.
+        result.update(status="circuit_open", error=str(e))
+    except requests.exceptions.Timeout as e:
+        result.update(status="timeout", error=str(e))
+    except requests.exceptions.RequestException as e:
+        result.update(status="unavailable", error=str(e))
+    except ValueError as e:
+        # Agent answered but the body was not valid JSON
+        result.update(status="error", error=str(e))
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+def timed_out_result(name, started):
+    return {"data": None, "status": "timeout", "error": f"{name} agent did not answer in time",
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1)}
+
+
+def fan_out(calls):
+    """
+    Runs several agent calls concurrently.
+    `calls` maps a service name to (client, url, payload, timeout). Returns a dict
+    of service name -> {"data", "status", "error", "elapsed_ms"}; a slow or
+    failing agent only affects its own entry.
+    """
+    started = time.monotonic()
+    futures = {
+        name: telemetry.submit_in_context(AGENT_POOL, agent_result, call_agent, *call)
+        for name, call in calls.items()
+    }
+    # Never wait longer than the most generous per-call deadline.
+    wait(futures.values(), timeout=max(call[3] for call in calls.values()))
+
+    results = {}
+    for name, future in futures.items():
+        if future.done():
+            results[name] = future.result()
+        else:
+            # The worker thread finishes on its own once the client timeout fires.
+            future.cancel()
+            results[name] = timed_out_result(name, started)
+    return results
+
+
+def record_agent_stages(results):
+    """Reports each agent call's wall time as a stage and counts its outcome."""
+    for name, result in results.items():
+        telemetry.record_span(name, result["elapsed_ms"])
+        AGENT_RESULTS.inc(name, result["status"])
+
+
+def plan_request_fields(user_request):
+    user_request = user_request or {}
+    return user_request.get('city'), user_request.get('origin'), user_request.get('travel_date')
+
+
+def assemble_plan(city, origin, travel_date, results):
+    """
+    Builds the final plan from the per-agent results.
+    Returns (body, status_code); 503 only when every agent failed.
+    """
+    knowledge, flight = results["knowledge"], results["flight"]
+
+    if knowledge["status"] != "ok" and flight["status"] != "ok":
+        return {
+            "error": "An AI agent is currently unavailable. Please try again later.",
+            "details": {name: result["error"] for name, result in results.items()}
+        }, 503
+
+    services_used = []
+    if flight["status"] == "ok":
+        services_used.append("flight")
+    if knowledge["status"] == "ok":
+        services_used.extend(["knowledge", "rag"])
+
+    # The frontend expects data inside a "raw_data" object.
+    # We also need to extract the list from the agent's response.
+    final_plan = {
+        "summary": f"Here is your AI-Generated trip plan for {city}, departing from {origin} on {travel_date}.",
+        "raw_data": {
+            "flights": (flight["data"] or {}).get('flights', []),
+            "activities": (knowledge["data"] or {}).get('activities', [])
+        },
+        "metadata": {
+            # This helps the frontend display service status
+            "services_used": services_used,
+            "service_status": {
+                name: {"status": result["status"], "elapsed_ms": result["elapsed_ms"], "error": result["error"]}
+                for name, result in results.items()
+            }
+        }
+    }
+    return final_plan, 200
+
+
+def plan_for(user_id, city, origin, travel_date):
+    """
+    Plans one trip: (body, status_code). For a known user, agents whose
+    input one of the user's stored plans already covers are not called, and
+    the finished plan is stored.
+    """
+    # The flight agent expects IATA codes, like 'LAX', so free text is resolved first.
+    city, origin_code, destination_code = resolve_trip(city, origin)
+    payloads, keys = trip_inputs(city, origin_code, destination_code, travel_date)
+    reused = reused_results(user_id, keys)
+
+    # Call the Knowledge and Flight agents concurrently.
+    calls = {
+        "knowledge": (KNOWLEDGE_CLIENT, KNOWLEDGE_AGENT_PATH, payloads["knowledge"], KNOWLEDGE_AGENT_TIMEOUT),
+        "flight": (FLIGHT_CLIENT, FLIGHT_AGENT_PATH, payloads["flight"], FLIGHT_AGENT_TIMEOUT),
+    }
+    calls = {name: call for name, call in calls.items() if name not in reused}
+    results = fan_out(calls) if calls else {}
+    record_agent_stages(results)
+    results.update(reused)
+    body, status_code = assemble_plan(city, origin, travel_date, results)
+    if user_id and status_code == 200:
+        store_plan(user_id, (city, origin, travel_date), keys, body, results, reused)
+    return body, status_code
+
+
+@app.route('/api/plan_trip', methods=['POST'])
+def plan_trip_endpoint():
+    city, origin, travel_date = plan_request_fields(request.get_json())
+
+    if not all([city, origin, travel_date]):
+        return jsonify({"error": "All fields are required!"}), 400
+
+    body, status_code = plan_for(request_user(request.headers), city, origin, travel_date)
+    return codec.respond(body, status_code, compress=True)
+
+
+# --- Plan history ---
+
+def history_params(args):
+    """(page size, cursor) from the query string. Raises ValueError."""
+    limit = int(args.get('limit', HISTORY_PAGE_SIZE))
+    if not 1 <= limit <= MAX_HISTORY_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}")
+    cursor = args.get('cursor')
+    return limit, int(cursor) if cursor else None
+
+
+def user_required():
+    return jsonify({"error": f"The {USER_ID_HEADER} header is required"}), 401
+
+
+@app.route('/api/plans', methods=['GET'])
+def plans_endpoint():
+    """
+    ?limit=<n>&cursor=<next_cursor from the previous page>
+    The caller's plans, newest first: {"plans": [{"plan_id", "city",
+    "origin", "travel_date", "summary", "created_at"}, ...], "next_cursor"}.
+    next_cursor is null on the last page.
+    """
+    user_id = request_user(request.headers)
+    if not user_id:
+        return user_required()
+    try:
+        limit, cursor = history_params(request.args)
+    except ValueError:
+        return jsonify({"error": f"limit must be between 1 and {MAX_HISTORY_PAGE_SIZE}, "
+                                 "cursor a value returned as next_cursor"}), 400
+    with telemetry.span("plan_store"):
+        plans, next_cursor = PLAN_STORE.history(user_id, limit, cursor)
+    return codec.respond({"plans": plans, "next_cursor": next_cursor}, compress=True)
+
+
+@app.route('/api/plans/<int:plan_id>', methods=['GET', 'PATCH'])
+def plan_endpoint(plan_id):
+    """
+    GET: one of the caller's stored plans, {"plan_id", "city", "origin",
+    "travel_date", "created_at", "plan"}.
+    PATCH: replans it with some fields changed, e.g. {"travel_date": ...};
+    only the agents whose input changed are called again. Returns the new
+    plan, the same body /api/plan_trip returns.
+    """
+    user_id = request_user(request.headers)
+    if not user_id:
+        return user_required()
+    with telemetry.span("plan_store"):
+        stored = PLAN_STORE.get(user_id, plan_id)
+    if stored is None:
+        return jsonify({"error": "Plan not found"}), 404
+    if request.method == 'GET':
+        return codec.respond(stored, compress=True)
+
+    edits = request.get_json() or {}
+    if not isinstance(edits, dict):
+        return jsonify({"error": "The edits must be a JSON object"}), 400
+    city, origin, travel_date = (edits.get(field) or stored[field] for field in ('city', 'origin', 'travel_date'))
+    if not all(isinstance(value, str) for value in (city, origin, travel_date)):
+        return jsonify({"error": "city, origin and travel_date must be strings"}), 400
+    body, status_code = plan_for(user_id, city, origin, travel_date)
+    return codec.respond(body, status_code, compress=True)
+
+
+# --- Streaming variant ---
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_knowledge(city, on_token):
+    """
+    Reads the knowledge agent's NDJSON stream, calling on_token(text) for each
+    generated chunk. Returns the final {"activities": [...]} message.
+    """
+    final = {}
+    response = KNOWLEDGE_CLIENT.post(KNOWLEDGE_STREAM_PATH, json={"city": city},
+                                     deadline=KNOWLEDGE_AGENT_TIMEOUT, stream=True)
+    with response:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get("type") == "token":
+                on_token(message["text"])
+            else:
+                final = message
+    return final
+
+
+@app.route('/api/plan_trip/stream', methods=['POST'])
+def plan_trip_stream_endpoint():
+    """
+    Same request body as /api/plan_trip, answered as Server-Sent Events:
+      event: flights    -> {"flights": [...], "status": ...} as soon as the flight agent answers
+      event: token      -> {"text": ...} for each chunk Gemini generates
+      event: activities -> {"activities": [...], "status": ...} once generation is done
+      event: summary    -> the same body /api/plan_trip would return
+    """
+    city, origin, travel_date = plan_request_fields(request.get_json())
+
+    if not all([city, origin, travel_date]):
+        return jsonify({"error": "All fields are required!"}), 400
+
+    events = queue.Queue()
+    started = time.monotonic()
+    city, origin_code, destination_code = resolve_trip(city, origin)
+    flight_payload = {"origin": origin_code, "destination": destination_code, "date": travel_date}
+
+    telemetry.submit_in_context(AGENT_POOL, lambda: events.put(("flight", agent_result(
+        call_agent, FLIGHT_CLIENT, FLIGHT_AGENT_PATH, flight_payload, FLIGHT_AGENT_TIMEOUT))))
+    telemetry.submit_in_context(AGENT_POOL, lambda: events.put(("knowledge", agent_result(
+        stream_knowledge, city, lambda text: events.put(("token", text))))))
+
+    def generate():
+        results = {}
+        deadline = started + max(KNOWLEDGE_AGENT_TIMEOUT, FLIGHT_AGENT_TIMEOUT)
+        while len(results) < 2:
+            try:
+                kind, value = events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if kind == "token":
+                yield sse_event("token", {"text": value})
+            elif kind == "flight":
+                results["flight"] = value
+                yield sse_event("flights", {"flights": (value["data"] or {}).get('flights', []),
+                                            "status": value["status"]})
+            else:
+                results["knowledge"] = value
+                yield sse_event("activities", {"activities": (value["data"] or {}).get('activities', []),
+                                               "status": value["status"]})
+
+        for name in ("knowledge", "flight"):
+            if name not in results:
+                results[name] = timed_out_result(name, started)
+        body, status_code = assemble_plan(city, origin, travel_date, results)
+        yield sse_event("summary" if status_code == 200 else "error", body)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/api/stats', methods=['GET'])
+def stats_endpoint():
+    return jsonify({
+        "agent_clients": {"knowledge": KNOWLEDGE_CLIENT.stats(), "flight": FLIGHT_CLIENT.stats()},
+        "agent_endpoints": {"knowledge": KNOWLEDGE_AGENTS.describe(), "flight": FLIGHT_AGENTS.describe()},
+        "agent_single_flight": AGENT_FLIGHT.stats(),
+        "resolver": RESOLVER.get().stats(),
+        "plan_store": PLAN_STORE.stats()
+    })
+
+
+def autocomplete_params(args):
+    """(query, limit) from the query string. Raises ValueError."""
+    limit = int(args.get('limit', AUTOCOMPLETE_LIMIT))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return args.get('q', ''), limit
+
+
+@app.route('/api/autocomplete', methods=['GET'])
+def autocomplete_endpoint():
+    """
+    ?q=<what the user typed so far>&limit=<n>
+    Returns {"query", "suggestions": [{"label", "kind", "city", "iata",
+    "airports", "country", "match"}, ...]}, best first. Served from the
+    in-memory resolver index; no agent is called.
+    """
+    try:
+        query, limit = autocomplete_params(request.args)
+    except ValueError:
+        return jsonify({"error": "limit must be a positive integer"}), 400
+    return codec.respond({"query": query, "suggestions": RESOLVER.get().complete(query, limit)})
+
+
+# --- Batch planning ---
+
+def submit_batch_calls(client, url, field, items, timeout):
+    """
+    Posts `items` (already deduplicated, a dict of key -> payload item) to an
+    agent batch endpoint in chunks of BATCH_CHUNK_SIZE, all chunks concurrently.
+    Returns key -> (future of the chunk's agent_result, position in the chunk).
+    """
+    keys = list(items)
+    placement = {}
+    for start in range(0, len(keys), BATCH_CHUNK_SIZE):
+        chunk = keys[start:start + BATCH_CHUNK_SIZE]
+        future = telemetry.submit_in_context(AGENT_POOL, agent_result, call_agent, client, url,
+                                             {field: [items[key] for key in chunk]}, timeout)
+        for position, key in enumerate(chunk):
+            placement[key] = (future, position)
+    return placement
+
+
+def batch_item_result(placement, started):
+    """Turns one item of a batch call into the single-call result shape used by assemble_plan."""
+    future, position = placement
+    remaining = max(0.0, started + BATCH_AGENT_TIMEOUT - time.monotonic())
+    wait([future], timeout=remaining)
+    if not future.done():
+        return timed_out_result("batch", started)
+    result = dict(future.result())
+    if result["status"] == "ok":
+        try:
+            result["data"] = result["data"]["results"][position]
+        except (KeyError, IndexError, TypeError):
+            result.update(data=None, status="error", error="malformed batch response")
+    return result
+
+
+def route_key(origin, city, travel_date):
+    return (origin.strip().upper(), city.strip().upper(), travel_date.strip())
+
+
+@app.route('/api/plan_trips', methods=['POST'])
+def plan_trips_endpoint():
+    """
+    Batch variant of /api/plan_trip.
+    Body: {"trips": [{"city", "origin", "travel_date"}, ...]}
+    Returns {"results": [{"index", "status", "plan" | "error"}, ...]} in request
+    order. With ?stream=1 the results are sent as NDJSON, one line per trip, as
+    soon as each trip (and every trip before it) is ready.
+    Identical cities and routes across the batch are planned once, and each
+    agent sees a handful of batch calls instead of one call per trip.
+    """
+    trips = (request.get_json() or {}).get('trips')
+
+    if not isinstance(trips, list) or not trips:
+        return jsonify({"error": "trips must be a non-empty list"}), 400
+    if len(trips) > MAX_BATCH_TRIPS:
+        return jsonify({"error": f"At most {MAX_BATCH_TRIPS} trips per batch"}), 400
+
+    fields = [plan_request_fields(trip if isinstance(trip, dict) else {}) for trip in trips]
+    valid = [all(f) and all(isinstance(v, str) for v in f) for f in fields]
+
+    places = [resolve_trip(city, origin) if ok else None for (city, origin, _), ok in zip(fields, valid)]
+
+    cities, routes = {}, {}
+    for (_, _, travel_date), place in zip(fields, places):
+        if place:
+            city, origin_code, destination_code = place
+            cities.setdefault(city_key(city), city)
+            routes.setdefault(route_key(origin_code, destination_code, travel_date),
+                              {"origin": origin_code, "destination": destination_code, "date": travel_date})
+
+    started = time.monotonic()
+    city_calls = submit_batch_calls(KNOWLEDGE_CLIENT, KNOWLEDGE_BATCH_PATH, "cities", cities, BATCH_AGENT_TIMEOUT)
+    route_calls = submit_batch_calls(FLIGHT_CLIENT, FLIGHT_BATCH_PATH, "routes", routes, BATCH_AGENT_TIMEOUT)
+
+    def trip_results():
+        for index, ((_, origin, travel_date), place) in enumerate(zip(fields, places)):
+            if not place:
+                yield {"index": index, "status": 400, "error": "All fields are required!"}
+                continue
+            city, origin_code, destination_code = place
+            results = {
+                "knowledge": batch_item_result(city_calls[city_key(city)], started),
+                "flight": batch_item_result(route_calls[route_key(origin_code, destination_code, travel_date)],
+                                            started),
+            }
+            body, status_code = assemble_plan(city, origin, travel_date, results)
+            if status_code == 200:
+                yield {"index": index, "status": status_code, "plan": body}
+            else:
+                yield {"index": index, "status": status_code, **body}
+
+    if request.args.get('stream') in ('1', 'true'):
+        lines = (codec.dumps(result) + b"\n" for result in trip_results())
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
+    return codec.respond({"results": list(trip_results())}, compress=True)
+
+
+# --- Multi-city itineraries ---
+# By default at most half the agent pool in stops, so every leg's flight call
+# and every city's knowledge call can run at once: an itinerary takes as long
+# as its slowest call, not the sum of its legs.
+MAX_ITINERARY_STOPS = int(os.getenv("MAX_ITINERARY_STOPS", str(max(1, AGENT_POOL_WORKERS // 2))))
+
+
+def itinerary_legs(body):
+    """
+    Validates {"origin", "stops": [{"city", "travel_date"}, ...]} and returns
+    one (origin, city, travel_date) leg per stop, each leg departing from the
+    previous stop, with stop cities resolved to their canonical names. Raises
+    ValueError.
+    """
+    body = body or {}
+    origin, stops = body.get('origin'), body.get('stops')
+    if not isinstance(origin, str) or not origin.strip():
+        raise ValueError("origin is required")
+    if not isinstance(stops, list) or not stops:
+        raise ValueError("stops must be a non-empty list")
+    if len(stops) > MAX_ITINERARY_STOPS:
+        raise ValueError(f"At most {MAX_ITINERARY_STOPS} stops per itinerary")
+
+    legs = []
+    for index, stop in enumerate(stops):
+        stop = stop if isinstance(stop, dict) else {}
+        city, travel_date = stop.get('city'), stop.get('travel_date')
+        if not all(isinstance(v, str) and v.strip() for v in (city, travel_date)):
+            raise ValueError(f"stops[{index}] needs a city and a travel_date")
+        city = resolve_place(city)[0]
+        legs.append((origin, city, travel_date))
+        origin = city
+    return legs
+
+
+def itinerary_calls(legs, knowledge_client=KNOWLEDGE_CLIENT, flight_client=FLIGHT_CLIENT):
+    """
+    fan_out() calls for an itinerary: "flight:<leg index>" for every leg and
+    "knowledge:<city key>" once per distinct city, using the single-trip agent
+    endpoints.
+    """
+    calls = {}
+    for index, (origin, city, travel_date) in enumerate(legs):
+        calls[f"flight:{index}"] = (flight_client, FLIGHT_AGENT_PATH,
+                                    {"origin": resolve_place(origin)[1], "destination": resolve_place(city)[1],
+                                     "date": travel_date},
+                                    FLIGHT_AGENT_TIMEOUT)
+        calls.setdefault(f"knowledge:{city_key(city)}", (knowledge_client, KNOWLEDGE_AGENT_PATH, {"city": city},
+                                                         KNOWLEDGE_AGENT_TIMEOUT))
+    return calls
+
+
+def record_itinerary_stages(results):
+    """record_agent_stages() for itinerary calls: one stage per agent, timed by its slowest call."""
+    slowest = {}
+    for name, result in results.items():
+        agent = name.split(":", 1)[0]
+        AGENT_RESULTS.inc(agent, result["status"])
+        slowest[agent] = max(slowest.get(agent, 0.0), result["elapsed_ms"])
+    for agent, elapsed_ms in slowest.items():
+        telemetry.record_span(agent, elapsed_ms)
+
+
+def assemble_itinerary(legs, results):
+    """
+    One assemble_plan() per leg, from that leg's flight call and its city's
+    knowledge call. Returns (body, status_code); 503 only when every leg failed.
+    """
+    planned = []
+    for index, (origin, city, travel_date) in enumerate(legs):
+        body, status_code = assemble_plan(city, origin, travel_date, {
+            "knowledge": results[f"knowledge:{city_key(city)}"],
+            "flight": results[f"flight:{index}"],
+        })
+        leg = {"index": index, "origin": origin, "city": city, "travel_date": travel_date, "status": status_code}
+        if status_code == 200:
+            leg["plan"] = body
+        else:
+            leg.update(body)
+        planned.append(leg)
+
+    if all(leg["status"] != 200 for leg in planned):
+        return {
+            "error": "An AI agent is currently unavailable. Please try again later.",
+            "legs": planned
+        }, 503
+
+    route = " -> ".join([legs[0][0]] + [city for _, city, _ in legs])
+    return {
+        "summary": f"Here is your AI-Generated itinerary {route}, departing on {legs[0][2]}.",
+        "legs": planned,
+        "metadata": {
+            "legs_planned": sum(leg["status"] == 200 for leg in planned),
+            "service_status": {
+                name: {"status": result["status"], "elapsed_ms": result["elapsed_ms"], "error": result["error"]}
+                for name, result in results.items()
+            }
+        }
+    }, 200
+
+
+@app.route('/api/plan_itinerary', methods=['POST'])
+def plan_itinerary_endpoint():
+    """
+    Multi-city variant of /api/plan_trip.
+    Body: {"origin": "JFK", "stops": [{"city": "LHR", "travel_date": "2026-05-01"},
+                                      {"city": "CDG", "travel_date": "2026-05-04"}]}
+    Plans every leg (origin -> first stop -> second stop ...) and every
+    distinct city concurrently; "legs" holds one /api/plan_trip style plan per
+    stop, in order. A city visited twice is looked up once.
+    """
+    try:
+        legs = itinerary_legs(request.get_json())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    results = fan_out(itinerary_calls(legs))
+    record_itinerary_stages(results)
+    body, status_code = assemble_itinerary(legs, results)
+    return codec.respond(body, status_code, compress=True)
+
+
+startup.start_warming("main_app")
+
+if __name__ == '__main__':
+    app.run(port=5000)
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+'''# main_app.py
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+import requests
+
+app = Flask(__name__)
+CORS(app)
+
+KNOWLEDGE_AGENT_URL = "http://127.0.0.1:5001/get_attractions"
+# CORRECTED: Point this to the new multi-flight endpoint in the flight agent
+FLIGHT_AGENT_URL = "http://127.0.0.1:5002/get_flight_options" # <-- CHANGED
+
+@app.route('/api/plan_trip', methods=['POST'])
+def plan_trip_endpoint():
+    # ... (code for user_request and knowledge_agent call remains the same)
+    user_request = request.get_json()
+    city = user_request.get('city')
+    origin = user_request.get('origin')
+    travel_date = user_request.get('travel_date')
+
+    if not all([city, origin, travel_date]):
+        return jsonify({"error": "All fields are required!"}), 400
+
+    try:
+        knowledge_payload = {"city": city}
+        knowledge_response = requests.post(KNOWLEDGE_AGENT_URL, json=knowledge_payload)
+        knowledge_response.raise_for_status()
+        knowledge_data = knowledge_response.json()
+        
+        # Call Flight Agent
+        flight_payload = {"origin": origin, "destination": city, "date": travel_date}
+        flight_response = requests.post(FLIGHT_AGENT_URL, json=flight_payload) #<-- This now calls the correct endpoint
+        flight_response.raise_for_status()
+        flight_data = flight_response.json()
+
+        # Combine results
+        final_plan = {
+            "summary": f"Your trip to {city} from {origin}",
+            "flight_details": flight_data, # flight_data now contains {"flights": [...]}
+            "suggested_activities": knowledge_data.get('activities', [])
+        }
+        
+        return jsonify(final_plan)
+
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": "An AI agent is currently unavailable. Please try again later.", "details": str(e)}), 503
+
+if __name__ == '__main__':
+    app.run(port=5000)'''
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+'''# main_app.py
+
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+import requests
+
+app = Flask(__name__)
+CORS(app)
+
+# Updated Agent URL
+KNOWLEDGE_AGENT_URL = "http://127.0.0.1:5001/get_attractions" # <-- CHANGED
+FLIGHT_AGENT_URL = "http://127.0.0.1:5002/get_flight_options" # <-- CHANGED
+
+@app.route('/api/plan_trip', methods=['POST'])
+def plan_trip_endpoint():
+    user_request = request.get_json()
+    city = user_request.get('city')
+    origin = user_request.get('origin')
+    travel_date = user_request.get('travel_date')
+
+    if not all([city, origin, travel_date]):
+        return jsonify({"error": "All fields are required!"}), 400
+
+    try:
+        # 1. Call the new Knowledge Agent
+        knowledge_payload = {"city": city}
+        knowledge_response = requests.post(KNOWLEDGE_AGENT_URL, json=knowledge_payload) # <-- CHANGED
+        knowledge_response.raise_for_status()
+        knowledge_data = knowledge_response.json()
+
+        # 2. Call Flight Agent (no changes here)
+        flight_payload = {"origin": origin, "destination": city, "date": travel_date}
+        flight_response = requests.post(FLIGHT_AGENT_URL, json=flight_payload)
+        flight_response.raise_for_status()
+        flight_data = flight_response.json()
+
+        # --- Combine results ---
+        final_plan = {
+            "summary": f"Your trip to {city} from {origin}",
+            "flight_details": flight_data,
+            "suggested_activities": knowledge_data.get('activities', [])
+        }
+        
+        return jsonify(final_plan)
+
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": "An AI agent is currently unavailable. Please try again later.", "details": str(e)}), 503
+
+if __name__ == '__main__':
     app.run(port=5000)'''
\ No newline at end of file
@@ -0,0 +1,306 @@
+# main_app_asgi.py
+# Async (ASGI) serving mode for the orchestrator. Same routes and JSON as
+# main_app.py; agent calls are awaited on one event loop instead of holding a
+# pool thread each, so concurrency is no longer capped by thread count.
+#
+#   uvicorn main_app_asgi:app --port 5000 --workers 4
+#
+# The hot routes are native async handlers; anything else falls through to the
+# Flask app, which a2wsgi runs in a thread pool.
+
+import asyncio
+import json
+import time
+
+from a2wsgi import WSGIMiddleware
+import httpx
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from agent_client import CircuitOpenError
+from async_agent_client import AsyncAgentClient
+import codec
+from city_names import city_key
+from single_flight import AsyncSingleFlight
+import main_app as sync_app
+import telemetry
+
+# Balanced over the same agent registries as the Flask app.
+KNOWLEDGE_CLIENT = AsyncAgentClient.from_env("knowledge", "KNOWLEDGE_AGENT", read_timeout=12.0, max_retries=1,
+                                             propagate_request_id=True, registry=sync_app.KNOWLEDGE_AGENTS)
+FLIGHT_CLIENT = AsyncAgentClient.from_env("flight", "FLIGHT_AGENT", read_timeout=6.0, max_retries=2,
+                                          propagate_request_id=True, registry=sync_app.FLIGHT_AGENTS)
+AGENT_FLIGHT = AsyncSingleFlight("agent-call")
+
+telemetry.REGISTRY.register_stats("agent_client", KNOWLEDGE_CLIENT.stats, agent="knowledge-async")
+telemetry.REGISTRY.register_stats("agent_client", FLIGHT_CLIENT.stats, agent="flight-async")
+telemetry.REGISTRY.register_stats("single_flight", AGENT_FLIGHT.stats, name="agent-call-async")
+
+
+async def call_agent(client, url, payload, timeout):
+    key = (url, json.dumps(payload, sort_keys=True))
+
+    async def post():
+        return codec.decode_response(
+            await client.post(url, json=payload, deadline=timeout, headers={"Accept": codec.AGENT_ACCEPT}))
+
+    return await AGENT_FLIGHT.do(key, post)
+
+
+async def agent_result(coro_fn, *args, timeout=None):
+    """Async counterpart of main_app.agent_result; `timeout` is a hard deadline."""
+    started = time.monotonic()
+    result = {"data": None, "status": "ok", "error": None}
+    try:
+        result["data"] = await asyncio.wait_for(coro_fn(*args), timeout)
+    except CircuitOpenError as e:
+        result.update(status="circuit_open", error=str(e))
+    except (asyncio.TimeoutError, httpx.TimeoutException) as e:
+        result.update(status="timeout", error=str(e) or "agent did not answer in time")
+    except httpx.HTTPError as e:
+        result.update(status="unavailable", error=str(e))
+    except ValueError as e:
+        result.update(status="error", error=str(e))
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+async def place_resolver():
+    """The resolver; its first use builds the index (tens of ms), so that runs in the threadpool."""
+    if sync_app.RESOLVER.ready:
+        return sync_app.RESOLVER.get()
+    return await run_in_threadpool(sync_app.RESOLVER.get)
+
+
+async def plan_trip(request: Request):
+    city, origin, travel_date = sync_app.plan_request_fields(await request.json())
+
+    if not all([city, origin, travel_date]):
+        return JSONResponse({"error": "All fields are required!"}, status_code=400)
+
+    user_id = sync_app.request_user(request.headers)
+    await place_resolver()  # built: resolve_trip() is then a few microseconds
+    city, origin_code, destination_code = sync_app.resolve_trip(city, origin)
+    payloads, keys = sync_app.trip_inputs(city, origin_code, destination_code, travel_date)
+    # Plan store reads and writes are SQLite: keep them off the event loop
+    reused = await run_in_threadpool(sync_app.reused_results, user_id, keys) if user_id else {}
+
+    calls = {
+        "knowledge": (KNOWLEDGE_CLIENT, sync_app.KNOWLEDGE_AGENT_PATH, payloads["knowledge"],
+                      sync_app.KNOWLEDGE_AGENT_TIMEOUT),
+        "flight": (FLIGHT_CLIENT, sync_app.FLIGHT_AGENT_PATH, payloads["flight"], sync_app.FLIGHT_AGENT_TIMEOUT),
+    }
+    calls = {name: call for name, call in calls.items() if name not in reused}
+    outcomes = await asyncio.gather(*(agent_result(call_agent, *call, timeout=call[3]) for call in calls.values()))
+    results = dict(zip(calls, outcomes))
+    sync_app.record_agent_stages(results)
+    results.update(reused)
+    body, status_code = sync_app.assemble_plan(city, origin, travel_date, results)
+    if user_id and status_code == 200:
+        await run_in_threadpool(sync_app.store_plan, user_id, (city, origin, travel_date), keys, body, results,
+                                reused)
+    return codec.asgi_response(request, body, status_code, compress=True)
+
+
+async def stream_knowledge(city, on_token):
+    final = {}
+    async with KNOWLEDGE_CLIENT.stream("POST", sync_app.KNOWLEDGE_STREAM_PATH, json={"city": city},
+                                       deadline=sync_app.KNOWLEDGE_AGENT_TIMEOUT) as response:
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if message.get("type") == "token":
+                on_token(message["text"])
+            else:
+                final = message
+    return final
+
+
+async def plan_trip_stream(request: Request):
+    city, origin, travel_date = sync_app.plan_request_fields(await request.json())
+
+    if not all([city, origin, travel_date]):
+        return JSONResponse({"error": "All fields are required!"}, status_code=400)
+
+    events = asyncio.Queue()
+    await place_resolver()
+    city, origin_code, destination_code = sync_app.resolve_trip(city, origin)
+    flight_payload = {"origin": origin_code, "destination": destination_code, "date": travel_date}
+
+    async def run_flight():
+        events.put_nowait(("flight", await agent_result(
+            call_agent, FLIGHT_CLIENT, sync_app.FLIGHT_AGENT_PATH, flight_payload,
+            sync_app.FLIGHT_AGENT_TIMEOUT, timeout=sync_app.FLIGHT_AGENT_TIMEOUT)))
+
+    async def run_knowledge():
+        events.put_nowait(("knowledge", await agent_result(
+            stream_knowledge, city, lambda text: events.put_nowait(("token", text)),
+            timeout=sync_app.KNOWLEDGE_AGENT_TIMEOUT)))
+
+    async def generate():
+        # Both agent_result calls carry their own deadlines, so both events always arrive.
+        tasks = [asyncio.create_task(run_flight()), asyncio.create_task(run_knowledge())]
+        results = {}
+        try:
+            while len(results) < 2:
+                kind, value = await events.get()
+                if kind == "token":
+                    yield sync_app.sse_event("token", {"text": value})
+                elif kind == "flight":
+                    results["flight"] = value
+                    yield sync_app.sse_event("flights", {"flights": (value["data"] or {}).get('flights', []),
+                                                         "status": value["status"]})
+                else:
+                    results["knowledge"] = value
+                    yield sync_app.sse_event("activities", {"activities": (value["data"] or {}).get('activities', []),
+                                                            "status": value["status"]})
+            body, status_code = sync_app.assemble_plan(city, origin, travel_date, results)
+            yield sync_app.sse_event("summary" if status_code == 200 else "error", body)
+        finally:
+            # Client went away (or we are done): stop any agent call still running.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def plan_trips(request: Request):
+    trips = (await request.json() or {}).get('trips')
+
+    if not isinstance(trips, list) or not trips:
+        return JSONResponse({"error": "trips must be a non-empty list"}, status_code=400)
+    if len(trips) > sync_app.MAX_BATCH_TRIPS:
+        return JSONResponse({"error": f"At most {sync_app.MAX_BATCH_TRIPS} trips per batch"}, status_code=400)
+
+    fields = [sync_app.plan_request_fields(trip if isinstance(trip, dict) else {}) for trip in trips]
+    valid = [all(f) and all(isinstance(v, str) for v in f) for f in fields]
+
+    await place_resolver()
+    places = [sync_app.resolve_trip(city, origin) if ok else None
+              for (city, origin, _), ok in zip(fields, valid)]
+
+    cities, routes = {}, {}
+    for (_, _, travel_date), place in zip(fields, places):
+        if place:
+            city, origin_code, destination_code = place
+            cities.setdefault(city_key(city), city)
+            routes.setdefault(sync_app.route_key(origin_code, destination_code, travel_date),
+                              {"origin": origin_code, "destination": destination_code, "date": travel_date})
+
+    def submit(client, url, field, items):
+        keys, placement = list(items), {}
+        for start in range(0, len(keys), sync_app.BATCH_CHUNK_SIZE):
+            chunk = keys[start:start + sync_app.BATCH_CHUNK_SIZE]
+            task = asyncio.ensure_future(agent_result(
+                call_agent, client, url, {field: [items[key] for key in chunk]},
+                sync_app.BATCH_AGENT_TIMEOUT, timeout=sync_app.BATCH_AGENT_TIMEOUT))
+            for position, key in enumerate(chunk):
+                placement[key] = (task, position)
+        return placement
+
+    async def item_result(placement):
+        task, position = placement
+        result = dict(await task)
+        if result["status"] == "ok":
+            try:
+                result["data"] = result["data"]["results"][position]
+            except (KeyError, IndexError, TypeError):
+                result.update(data=None, status="error", error="malformed batch response")
+        return result
+
+    city_calls = submit(KNOWLEDGE_CLIENT, sync_app.KNOWLEDGE_BATCH_PATH, "cities", cities)
+    route_calls = submit(FLIGHT_CLIENT, sync_app.FLIGHT_BATCH_PATH, "routes", routes)
+
+    async def trip_results():
+        for index, ((_, origin, travel_date), place) in enumerate(zip(fields, places)):
+            if not place:
+                yield {"index": index, "status": 400, "error": "All fields are required!"}
+                continue
+            city, origin_code, destination_code = place
+            results = {
+                "knowledge": await item_result(city_calls[city_key(city)]),
+                "flight": await item_result(
+                    route_calls[sync_app.route_key(origin_code, destination_code, travel_date)]),
+            }
+            body, status_code = sync_app.assemble_plan(city, origin, travel_date, results)
+            if status_code == 200:
+                yield {"index": index, "status": status_code, "plan": body}
+            else:
+                yield {"index": index, "status": status_code, **body}
+
+    if request.query_params.get('stream') in ('1', 'true'):
+        async def lines():
+            async for result in trip_results():
+                yield codec.dumps(result) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return codec.asgi_response(request, {"results": [result async for result in trip_results()]}, compress=True)
+
+
+async def plan_itinerary(request: Request):
+    await place_resolver()
+    try:
+        legs = sync_app.itinerary_legs(await request.json())
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    calls = sync_app.itinerary_calls(legs, KNOWLEDGE_CLIENT, FLIGHT_CLIENT)
+    outcomes = await asyncio.gather(*(
+        agent_result(call_agent, *call, timeout=call[3]) for call in calls.values()))
+    results = dict(zip(calls, outcomes))
+    sync_app.record_itinerary_stages(results)
+    body, status_code = sync_app.assemble_itinerary(legs, results)
+    return codec.asgi_response(request, body, status_code, compress=True)
+
+
+async def autocomplete(request: Request):
+    try:
+        query, limit = sync_app.autocomplete_params(request.query_params)
+    except ValueError:
+        return JSONResponse({"error": "limit must be a positive integer"}, status_code=400)
+    resolver = await place_resolver()
+    return codec.asgi_response(request, {"query": query, "suggestions": resolver.complete(query, limit)})
+
+
+async def stats(request: Request):
+    resolver = await place_resolver()
+    return JSONResponse({
+        "agent_clients": {"knowledge": KNOWLEDGE_CLIENT.stats(), "flight": FLIGHT_CLIENT.stats()},
+        "agent_endpoints": {"knowledge": sync_app.KNOWLEDGE_AGENTS.describe(),
+                            "flight": sync_app.FLIGHT_AGENTS.describe()},
+        "agent_single_flight": AGENT_FLIGHT.stats(),
+        "resolver": resolver.stats(),
+        "plan_store": sync_app.PLAN_STORE.stats()
+    })
+
+
+async def malformed_json(request: Request, exc):
+    # What the Flask app answers too (a 400), instead of a 500.
+    return JSONResponse({"error": "The request body is not valid JSON"}, status_code=400)
+
+
+ROUTES = [
+    Route('/api/plan_trip', plan_trip, methods=['POST']),
+    Route('/api/plan_trip/stream', plan_trip_stream, methods=['POST']),
+    Route('/api/plan_trips', plan_trips, methods=['POST']),
+    Route('/api/plan_itinerary', plan_itinerary, methods=['POST']),
+    Route('/api/autocomplete', autocomplete, methods=['GET']),
+    Route('/api/stats', stats, methods=['GET']),
+]
+
+# /metrics and any other route are served by the mounted Flask app.
+app = Starlette(
+    routes=ROUTES + [Mount('/', WSGIMiddleware(sync_app.app))],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"]),
+        Middleware(telemetry.TelemetryMiddleware, service="main_app", paths=[route.path for route in ROUTES]),
+    ],
+    exception_handlers={json.JSONDecodeError: malformed_json},
+)
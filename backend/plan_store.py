@@ -0,0 +1,185 @@
+# plan_store.py
+# Per-user store of finished trip plans, in a local SQLite file (shared by
+# every worker on the host), plus the agent outputs each plan was built from.
+#
+#   plans          one row per (user, request key): the latest plan for that
+#                  trip. Replanning the same trip replaces the row under a new,
+#                  higher plan_id, so plan_id order is recency order and
+#                  history pages are keyset scans of idx_plans_user.
+#   plan_inputs    plan -> (agent, input key) it depends on; the input key is
+#                  what the agent was asked (the city for the knowledge agent;
+#                  origin, destination and date for the flight agent).
+#   agent_outputs  (agent, input key) -> the agent's answer, shared between
+#                  plans and users.
+#
+# A new plan reuses an agent output when one of the same user's stored plans
+# depends on exactly that input and the output is younger than the agent's
+# max age. Changing the travel date then only re-runs the flight agent, and
+# changing the city only re-runs what the new city affects.
+
+import os
+import sqlite3
+import threading
+import time
+
+import codec
+
+DEFAULT_PLAN_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "plan_store.sqlite3")
+
+
+class PlanStore:
+    """
+    SQLite-backed plan history and agent-output reuse. `max_age` maps an
+    agent name to how long (seconds) its outputs may be reused; agents not
+    listed are never reused.
+    """
+
+    def __init__(self, path=DEFAULT_PLAN_STORE_PATH, max_age=None):
+        self.path = path
+        self.max_age = dict(max_age or {})
+        self._lock = threading.Lock()
+        self._stats = {"plans_saved": 0, "reused": 0, "reuse_misses": 0, "history_pages": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS plans (
+                   plan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   user_id TEXT NOT NULL,
+                   request_key TEXT NOT NULL,
+                   city TEXT NOT NULL,
+                   origin TEXT NOT NULL,
+                   travel_date TEXT NOT NULL,
+                   summary TEXT NOT NULL,
+                   body BLOB NOT NULL,
+                   created_at REAL NOT NULL,
+                   UNIQUE (user_id, request_key)
+               );
+               CREATE INDEX IF NOT EXISTS idx_plans_user ON plans (user_id, plan_id);
+               CREATE TABLE IF NOT EXISTS plan_inputs (
+                   plan_id INTEGER NOT NULL,
+                   agent TEXT NOT NULL,
+                   user_id TEXT NOT NULL,
+                   input_key TEXT NOT NULL,
+                   PRIMARY KEY (plan_id, agent)
+               );
+               CREATE INDEX IF NOT EXISTS idx_plan_inputs_key ON plan_inputs (agent, input_key, user_id);
+               CREATE TABLE IF NOT EXISTS agent_outputs (
+                   agent TEXT NOT NULL,
+                   input_key TEXT NOT NULL,
+                   data BLOB NOT NULL,
+                   created_at REAL NOT NULL,
+                   PRIMARY KEY (agent, input_key)
+               );"""
+        )
+        self._conn.commit()
+
+    def reusable(self, user_id, agent, input_key):
+        """The stored output one of the user's plans got for this agent input, or None if there is none fresh."""
+        max_age = self.max_age.get(agent, 0)
+        with self._lock:
+            row = None
+            if max_age > 0:
+                row = self._conn.execute(
+                    "SELECT o.data FROM plan_inputs i JOIN agent_outputs o "
+                    "ON o.agent = i.agent AND o.input_key = i.input_key "
+                    "WHERE i.user_id = ? AND i.agent = ? AND i.input_key = ? AND o.created_at >= ? LIMIT 1",
+                    (user_id, agent, input_key, time.time() - max_age),
+                ).fetchone()
+            self._stats["reused" if row else "reuse_misses"] += 1
+        return codec.loads(row[0]) if row else None
+
+    def save(self, user_id, request_key, request, body, inputs, outputs):
+        """
+        Stores a finished plan and returns its plan_id. `request` is the
+        (city, origin, travel_date) the user asked for; `inputs` maps each
+        agent the plan depends on to its input key, and `outputs` holds the
+        freshly computed answers among them (reused ones are already stored).
+        An earlier plan for the same request key is replaced.
+        """
+        now = time.time()
+        city, origin, travel_date = request
+        with self._lock:
+            old = self._conn.execute("SELECT plan_id FROM plans WHERE user_id = ? AND request_key = ?",
+                                     (user_id, request_key)).fetchone()
+            old_inputs = self._drop(old[0]) if old is not None else []
+            for agent, data in outputs.items():
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO agent_outputs (agent, input_key, data, created_at) VALUES (?, ?, ?, ?)",
+                    (agent, inputs[agent], codec.dumps(data), now),
+                )
+            plan_id = self._conn.execute(
+                "INSERT INTO plans (user_id, request_key, city, origin, travel_date, summary, body, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, request_key, city, origin, travel_date, body.get("summary", ""), codec.dumps(body), now),
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO plan_inputs (plan_id, agent, user_id, input_key) VALUES (?, ?, ?, ?)",
+                [(plan_id, agent, user_id, input_key) for agent, input_key in inputs.items()],
+            )
+            self._prune(old_inputs)
+            self._conn.commit()
+            self._stats["plans_saved"] += 1
+        return plan_id
+
+    def _drop(self, plan_id):
+        """Deletes a plan and returns the (agent, input key) pairs it depended on. Caller holds the lock."""
+        inputs = self._conn.execute("SELECT agent, input_key FROM plan_inputs WHERE plan_id = ?",
+                                    (plan_id,)).fetchall()
+        self._conn.execute("DELETE FROM plan_inputs WHERE plan_id = ?", (plan_id,))
+        self._conn.execute("DELETE FROM plans WHERE plan_id = ?", (plan_id,))
+        return inputs
+
+    def _prune(self, inputs):
+        """Deletes the outputs for these (agent, input key) pairs that no plan depends on any more."""
+        for agent, input_key in inputs:
+            self._conn.execute(
+                "DELETE FROM agent_outputs WHERE agent = ? AND input_key = ? AND NOT EXISTS "
+                "(SELECT 1 FROM plan_inputs i WHERE i.agent = agent_outputs.agent "
+                "AND i.input_key = agent_outputs.input_key)",
+                (agent, input_key),
+            )
+
+    def get(self, user_id, plan_id):
+        """A stored plan as {"plan_id", "city", "origin", "travel_date", "created_at", "plan"}, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan_id, city, origin, travel_date, created_at, body FROM plans "
+                "WHERE plan_id = ? AND user_id = ?",
+                (plan_id, user_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"plan_id": row[0], "city": row[1], "origin": row[2], "travel_date": row[3],
+                "created_at": row[4], "plan": codec.loads(row[5])}
+
+    def history(self, user_id, limit=20, before=None):
+        """
+        One page of the user's plans, newest first, without the plan bodies.
+        `before` is the cursor from the previous page (a plan_id). Returns
+        (entries, next cursor or None).
+        """
+        query = "SELECT plan_id, city, origin, travel_date, summary, created_at FROM plans WHERE user_id = ?"
+        params = [user_id]
+        if before is not None:
+            query += " AND plan_id < ?"
+            params.append(before)
+        query += " ORDER BY plan_id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+            self._stats["history_pages"] += 1
+        entries = [{"plan_id": r[0], "city": r[1], "origin": r[2], "travel_date": r[3], "summary": r[4],
+                    "created_at": r[5]} for r in rows[:limit]]
+        return entries, (entries[-1]["plan_id"] if len(rows) > limit else None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            (stats["plans"],) = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()
+            (stats["agent_outputs"],) = self._conn.execute("SELECT COUNT(*) FROM agent_outputs").fetchone()
+        lookups = stats["reused"] + stats["reuse_misses"]
+        stats["reuse_rate"] = round(stats["reused"] / lookups, 4) if lookups else 0.0
+        return stats
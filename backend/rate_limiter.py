@@ -0,0 +1,275 @@
+# rate_limiter.py
+# Per-upstream quota control for Gemini and AviationStack.
+#
+# A token bucket admits calls at `rate_per_minute` (with a small burst). Calls
+# above the rate wait in a bounded priority queue instead of hitting the
+# provider and failing: interactive requests are served first, then batch,
+# then precompute work, and background cache refreshes last. Every priority
+# has a maximum queue wait; a caller that runs out of it (or finds the queue
+# full) gets RateLimitTimeout and serves its fallback answer, so one spike
+# degrades the lowest-priority work first instead of everyone at once.
+#
+# Lower priorities also leave `interactive_reserve` of the burst untouched, so
+# a batch that arrives first cannot drain the bucket ahead of user requests.
+#
+# The rate adapts to the provider: a 429 halves it (and honours Retry-After),
+# each success wins back a twentieth of the configured rate (AIMD).
+#
+# The priority of the current work is a context variable, like the request ID
+# in telemetry.py: wrap batch or background work in work_priority("batch")
+# and every limited call made inside it queues at that priority. Limits are
+# per process, so divide the provider quota by the number of workers.
+
+import asyncio
+import contextlib
+from contextvars import ContextVar
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import telemetry
+
+PRIORITIES = ("interactive", "batch", "precompute", "refresh")
+DEFAULT_MAX_WAIT = {"interactive": 2.0, "batch": 10.0, "precompute": 60.0, "refresh": 30.0}
+
+_priority = ContextVar("work_priority", default="interactive")
+
+QUEUE_WAIT = telemetry.REGISTRY.histogram(
+    "rate_limit_wait_seconds", "Time spent queued for upstream quota, by priority.", ("upstream", "priority"))
+
+
+class RateLimitTimeout(Exception):
+    """No quota became available within the caller's maximum wait (or the queue was full)."""
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextlib.contextmanager
+def work_priority(priority):
+    """Runs the enclosed block (and tasks it creates) at `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"unknown priority: {priority!r}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def is_throttled(error):
+    """True for a provider "slow down": HTTP 429 from requests/httpx, or Gemini's ResourceExhausted."""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+
+def retry_after(response):
+    """Seconds from a 429 response's Retry-After header, if it has a numeric one."""
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Waiter:
+    __slots__ = ("rank", "sequence", "priority", "deadline", "enqueued")
+
+    def __init__(self, rank, sequence, priority, deadline, enqueued):
+        self.rank = rank
+        self.sequence = sequence
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued = enqueued
+
+    def __lt__(self, other):
+        return (self.rank, self.sequence) < (other.rank, other.sequence)
+
+
+class RateLimiter:
+    """
+    Token bucket plus priority wait queue for one upstream. Thread-safe; the
+    async callers of the ASGI apps share the same instance. A rate of 0
+    disables limiting.
+    """
+
+    def __init__(self, name, rate_per_minute, burst=None, max_queue=200, max_wait=None, min_rate_fraction=0.1,
+                 interactive_reserve=0.2):
+        self.name = name
+        self.configured_rate = float(rate_per_minute)
+        self.rate = self.configured_rate
+        self.min_rate = self.configured_rate * min_rate_fraction
+        # Default burst: ten seconds' worth of calls.
+        self.burst = float(burst) if burst else max(1.0, self.configured_rate / 6)
+        self.max_queue = max_queue
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        # Tokens a call needs in the bucket before it may take one, per priority.
+        reserve = min(self.burst, 1 + self.burst * interactive_reserve)
+        self._needed = {priority: 1.0 if priority == "interactive" else reserve for priority in PRIORITIES}
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {"granted": 0, "queued": 0, "timeouts": 0, "rejected": 0, "throttled": 0}
+
+    @classmethod
+    def from_env(cls, name, prefix, **defaults):
+        """
+        Settings from the environment, e.g. GEMINI_RATE_PER_MIN, GEMINI_BURST,
+        GEMINI_MAX_QUEUE and GEMINI_MAX_WAIT_BATCH (seconds).
+        """
+        for key, cast in {"rate_per_minute": float, "burst": float, "max_queue": int}.items():
+            value = os.getenv(f"{prefix}_{'RATE_PER_MIN' if key == 'rate_per_minute' else key.upper()}")
+            if value is not None:
+                defaults[key] = cast(value)
+        max_wait = dict(defaults.pop("max_wait", None) or {})
+        for priority in PRIORITIES:
+            value = os.getenv(f"{prefix}_MAX_WAIT_{priority.upper()}")
+            if value is not None:
+                max_wait[priority] = float(value)
+        return cls(name, max_wait=max_wait, **defaults)
+
+    @property
+    def enabled(self):
+        return self.configured_rate > 0
+
+    # --- Bucket ---
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate / 60.0)
+        self._refilled_at = now
+
+    def _enter(self, priority):
+        """Grants immediately (None) or queues the caller (its _Waiter). Caller holds the lock."""
+        priority = priority or _priority.get()
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and self._tokens >= self._needed[priority] and now >= self._blocked_until:
+            self._tokens -= 1
+            self._stats["granted"] += 1
+            QUEUE_WAIT.observe(0.0, self.name, priority)
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise RateLimitTimeout(f"{self.name}: quota queue full ({self.max_queue} waiting)")
+        waiter = _Waiter(PRIORITIES.index(priority), next(self._sequence), priority,
+                         now + self.max_wait[priority], now)
+        heapq.heappush(self._waiters, waiter)
+        self._stats["queued"] += 1
+        return waiter
+
+    def _poll(self, waiter):
+        """
+        (True, 0) once `waiter` is at the head of the queue and a token is
+        available, else (False, seconds to sleep). Raises RateLimitTimeout past
+        its deadline. Caller holds the lock.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        needed = self._needed[waiter.priority]
+        if self._waiters[0] is waiter and self._tokens >= needed and now >= self._blocked_until:
+            heapq.heappop(self._waiters)
+            self._tokens -= 1
+            self._stats["granted"] += 1
+            QUEUE_WAIT.observe(now - waiter.enqueued, self.name, waiter.priority)
+            return True, 0.0
+        if now >= waiter.deadline:
+            self._abandon(waiter)
+            self._stats["timeouts"] += 1
+            raise RateLimitTimeout(
+                f"{self.name}: no quota within {self.max_wait[waiter.priority]}s ({waiter.priority})")
+        if self._waiters[0] is not waiter:
+            # Woken by notify_all() whenever the head is granted or gives up.
+            return False, waiter.deadline - now
+        next_token = max(0.0, needed - self._tokens) * 60.0 / max(self.rate, 1e-9)
+        wait = max(self._blocked_until - now, next_token, 0.001)
+        return False, min(wait, waiter.deadline - now)
+
+    def _abandon(self, waiter):
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+        # The head may have changed.
+        self._cond.notify_all()
+
+    def acquire(self, priority=None):
+        """
+        Blocks until a call is allowed; `priority` defaults to the current
+        work_priority(). Raises RateLimitTimeout.
+        """
+        if not self.enabled:
+            return
+        with self._cond:
+            waiter = self._enter(priority)
+            if waiter is None:
+                return
+            try:
+                while True:
+                    granted, wait = self._poll(waiter)
+                    if granted:
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(wait)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+    async def acquire_async(self, priority=None):
+        """acquire() for coroutines: queues the same way, sleeps on the event loop."""
+        if not self.enabled:
+            return
+        with self._cond:
+            waiter = self._enter(priority)
+        if waiter is None:
+            return
+        try:
+            while True:
+                with self._cond:
+                    granted, wait = self._poll(waiter)
+                    if granted:
+                        self._cond.notify_all()
+                        return
+                # Async waiters are not woken by notify(); poll at least every 50 ms.
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            with self._cond:
+                self._abandon(waiter)
+            raise
+
+    # --- Adaptation ---
+
+    def record_throttled(self, retry_after=None):
+        """The provider answered 429: halve the rate and pause for Retry-After if given."""
+        if not self.enabled:
+            return
+        with self._cond:
+            self._stats["throttled"] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        telemetry.log(f"Rate limiter {self.name}: throttled by provider, now {self.rate:.1f}/min")
+
+    def record_success(self):
+        if self.enabled and self.rate < self.configured_rate:
+            with self._cond:
+                self.rate = min(self.configured_rate, self.rate + self.configured_rate / 20)
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            stats = dict(self._stats)
+            stats.update(
+                rate_per_minute=round(self.rate, 2),
+                configured_rate_per_minute=self.configured_rate,
+                tokens=round(self._tokens, 2),
+                queue_depth=len(self._waiters),
+            )
+            for priority in PRIORITIES:
+                stats[f"queue_depth_{priority}"] = sum(1 for w in self._waiters if w.priority == priority)
+        return stats
@@ -0,0 +1,223 @@
+# resolver.py
+# Free-text place resolution: "paris", "Barcel", "nyc", "heathrow" or "LHR" ->
+# a canonical city name (for the knowledge agent) and an IATA code (for the
+# flight agent), before any agent is called. The same index answers
+# /api/autocomplete.
+#
+# Plans only take exact, alias, IATA and unique-prefix matches: a fuzzy hit is
+# a guess ("Portland" is closer to Porto than to nothing, "Paris, TX" to
+# Paris), so typo tolerance is left to autocomplete, where the user picks.
+#
+# Built once, in memory, from data/airports.csv plus city_names.CITY_ALIASES:
+#
+#   terms      cleaned city name / alias / airport name / IATA code -> place,
+#              for exact hits
+#   trie       over every term; each node keeps the best-ranked places below
+#              it, so a prefix lookup is a walk of len(prefix) steps
+#   trigrams   trigram -> terms containing it, for typos: terms sharing
+#              trigrams with the query are scored by Dice similarity
+#
+# Places rank by their row in the data file (traffic order), cities ahead of
+# their own airports. Exact lookups take about a microsecond, prefix and
+# fuzzy ones a few to a few tens; see benchmarks/bench_resolver.py.
+
+from collections import namedtuple
+import csv
+import os
+
+from city_names import CITY_ALIASES, clean_city
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_AIRPORTS_PATH = os.path.join(BACKEND_DIR, "data", "airports.csv")
+
+# Best places kept per trie node, i.e. the most autocomplete can return.
+TOP_PER_NODE = 10
+FUZZY_MIN_SCORE = 0.5
+# Shorter terms (IATA codes, "la", "nyc") are only matched exactly or by prefix.
+FUZZY_MIN_LENGTH = 4
+# Shorter prefixes are never taken as a resolution, however few places share them.
+PREFIX_MIN_LENGTH = 4
+
+# kind is "city" or "airport"; a city's iata is its primary airport.
+Place = namedtuple("Place", "kind city iata airports country airport rank")
+Match = namedtuple("Match", "place match score")
+
+
+def _aliases(field):
+    return [alias for alias in (field or "").split(";") if alias.strip()]
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.top = []  # place ids, best rank first
+
+
+class Resolver:
+    """In-memory index of cities, airports and aliases. Read-only once built, so safe to share."""
+
+    def __init__(self, rows):
+        """
+        `rows` are dicts with iata, airport, city, country, city_aliases and
+        airport_aliases (";"-separated), in rank order; a city's first row is
+        its primary airport.
+        """
+        self.places = []
+        cities, airports = {}, {}
+        for rank, row in enumerate(rows):
+            code, city = row["iata"].strip().upper(), row["city"].strip()
+            entry = cities.get(city)
+            if entry is None:
+                entry = cities[city] = {"rank": rank, "airports": [], "country": row.get("country", "").strip(),
+                                        "aliases": []}
+            if code not in entry["airports"]:
+                entry["airports"].append(code)
+            entry["aliases"].extend(_aliases(row.get("city_aliases")))
+            # An airport serving several cities belongs to the first one listed.
+            airports.setdefault(code, (rank, row["airport"].strip(), city, _aliases(row.get("airport_aliases"))))
+
+        names = []  # (name, match kind, place id)
+        for city, entry in cities.items():
+            pid = self._add(Place("city", city, entry["airports"][0], tuple(entry["airports"]), entry["country"],
+                                  None, entry["rank"]))
+            names.append((city, "name", pid))
+            names.extend((alias, "alias", pid) for alias in entry["aliases"])
+        city_ids = {place.city: pid for pid, place in enumerate(self.places)}
+        for alias, city in CITY_ALIASES.items():
+            if city in city_ids:
+                names.append((alias, "alias", city_ids[city]))
+        for code, (rank, airport, city, aliases) in airports.items():
+            pid = self._add(Place("airport", city, code, (code,), cities[city]["country"], airport, rank))
+            names.append((airport, "airport", pid))
+            names.append((code, "iata", pid))
+            names.extend((alias, "airport", pid) for alias in aliases)
+
+        # Cities first at equal rank, so "london" ranks London above Heathrow.
+        names.sort(key=lambda n: (self.places[n[2]].rank, self.places[n[2]].kind != "city"))
+        self.terms = {}
+        self.root = _TrieNode()
+        self._term_list, self._trigrams, self._trigram_counts = [], {}, []
+        for name, match, pid in names:
+            term = clean_city(name)
+            if not term or term in self.terms:
+                continue
+            self.terms[term] = (pid, match)
+            self._insert(term, pid)
+            if len(term) >= FUZZY_MIN_LENGTH:
+                tid = len(self._term_list)
+                self._term_list.append(term)
+                grams = trigrams(term)
+                self._trigram_counts.append(len(grams))
+                for gram in grams:
+                    self._trigrams.setdefault(gram, []).append(tid)
+        self._trie_nodes = self._count_nodes(self.root)
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_AIRPORTS_PATH):
+        """Reads the CSV data file; lines starting with "#" are comments."""
+        with open(path, newline="", encoding="utf-8") as f:
+            return cls(list(csv.DictReader(line for line in f if not line.startswith("#"))))
+
+    def _add(self, place):
+        self.places.append(place)
+        return len(self.places) - 1
+
+    def _insert(self, term, pid):
+        node = self.root
+        for char in term:
+            node = node.children.setdefault(char, _TrieNode())
+            # Terms arrive best-ranked first, so each node's list stays sorted.
+            if len(node.top) < TOP_PER_NODE and pid not in node.top:
+                node.top.append(pid)
+
+    def _count_nodes(self, node):
+        return 1 + sum(self._count_nodes(child) for child in node.children.values())
+
+    # --- Lookups ---
+
+    def resolve(self, text, fuzzy=False):
+        """
+        The Match for free text, or None: an exact term, else a prefix of
+        terms for one city only, else (with `fuzzy`) the most similar term.
+        """
+        term = clean_city(text or "")
+        if not term:
+            return None
+        hit = self.terms.get(term)
+        if hit is not None:
+            return Match(self.places[hit[0]], hit[1], 1.0)
+        node = self._walk(term) if len(term) >= PREFIX_MIN_LENGTH else None
+        # A node whose list is full may have more places below it than it keeps.
+        if node is not None and len(node.top) < TOP_PER_NODE:
+            if len({self.places[pid].city for pid in node.top}) == 1:
+                return Match(self.places[node.top[0]], "prefix", 1.0)
+        if not fuzzy:
+            return None
+        matches = self.fuzzy(term, limit=1)
+        return matches[0] if matches else None
+
+    def _walk(self, term):
+        """The trie node for `term` (already cleaned), or None."""
+        node = self.root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def fuzzy(self, term, limit=5, min_score=FUZZY_MIN_SCORE):
+        """Places whose terms are most similar to `term` (already cleaned), best first."""
+        if len(term) < FUZZY_MIN_LENGTH:
+            return []
+        grams = trigrams(term)
+        shared = {}
+        for gram in grams:
+            for tid in self._trigrams.get(gram, ()):
+                shared[tid] = shared.get(tid, 0) + 1
+        scored = {}
+        for tid, count in shared.items():
+            score = 2.0 * count / (len(grams) + self._trigram_counts[tid])
+            if score >= min_score:
+                pid = self.terms[self._term_list[tid]][0]
+                if score > scored.get(pid, 0.0):
+                    scored[pid] = score
+        best = sorted(scored.items(), key=lambda item: (-item[1], self.places[item[0]].rank))[:limit]
+        return [Match(self.places[pid], "fuzzy", round(score, 3)) for pid, score in best]
+
+    def complete(self, prefix, limit=8):
+        """
+        Autocomplete: places with a term starting with `prefix`, best-ranked
+        first, topped up with fuzzy matches when the prefix has a typo.
+        """
+        term = clean_city(prefix or "")
+        if not term:
+            return []
+        limit = min(limit, TOP_PER_NODE)
+        node = self._walk(term)
+        matches = [Match(self.places[pid], "prefix", 1.0) for pid in node.top[:limit]] if node else []
+        if len(matches) < limit:
+            seen = {match.place for match in matches}
+            matches.extend(match for match in self.fuzzy(term, limit) if match.place not in seen)
+        return [suggestion(match) for match in matches[:limit]]
+
+    def stats(self):
+        return {"places": len(self.places), "terms": len(self.terms), "trie_nodes": self._trie_nodes,
+                "trigrams": len(self._trigrams)}
+
+
+def suggestion(match):
+    """A Match as the JSON /api/autocomplete returns."""
+    place = match.place
+    if place.kind == "city":
+        label = f"{place.city}, {place.country} ({', '.join(place.airports)})"
+    else:
+        label = f"{place.airport} ({place.iata}), {place.city}"
+    return {"label": label, "kind": place.kind, "city": place.city, "iata": place.iata,
+            "airports": list(place.airports), "country": place.country, "match": match.match}
@@ -0,0 +1,222 @@
+# retrieval.py
+# Retrieval engine for the knowledge agent's RAG step.
+# Documents are embedded once into a row-normalized float32 matrix, so a query
+# is a single matrix-vector product followed by a partial sort. An optional
+# inverted keyword index adds BM25 scores for hybrid ranking.
+
+import math
+import re
+import zlib
+
+import numpy as np
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def normalize_rows(matrix):
+    """Scales each row to unit length (zero rows are left as zeros)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# --- Embedders ---
+# An embedder is any object with a `dim` attribute and an `embed(texts)` method
+# returning a (len(texts), dim) float32 array.
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free embedder using signed feature hashing of
+    unigrams and bigrams. Good enough for keyword-ish city lookups and for
+    offline tests and benchmarks; it needs no network and no model weights.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 rather than hash(): Python's str hash is salted per process
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return vectors
+
+
+class GeminiEmbedder:
+    """Embeds texts with Gemini's embedding model (requires GEMINI_API_KEY)."""
+
+    def __init__(self, model="models/embedding-001", dim=768):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts):
+        import google.generativeai as genai
+        result = genai.embed_content(model=self.model, content=list(texts), task_type="retrieval_document")
+        return np.asarray(result["embedding"], dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def make_embedder(name, dim=256):
+    if name == "gemini":
+        return GeminiEmbedder()
+    if name == "hashing":
+        return HashingEmbedder(dim)
+    raise ValueError(f"Unknown embedder: {name}")
+
+
+# --- Indexes ---
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first, without a full sort."""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class VectorIndex:
+    """
+    Dense top-k search over precomputed, row-normalized embedding matrices.
+    The index is a list of segments (in-memory arrays or read-only memory maps
+    from the on-disk corpus); document ids run across segments in order.
+    """
+
+    def __init__(self, embedder, segments=()):
+        self.embedder = embedder
+        self.segments = list(segments)
+
+    def __len__(self):
+        return sum(segment.shape[0] for segment in self.segments)
+
+    def add(self, texts, batch_size=1024):
+        """Embeds documents and appends them as a new segment."""
+        if not len(texts):
+            return
+        batches = [
+            normalize_rows(self.embedder.embed(texts[start:start + batch_size]))
+            for start in range(0, len(texts), batch_size)
+        ]
+        self.segments.append(np.concatenate(batches))
+
+    def embed_queries(self, queries):
+        return normalize_rows(self.embedder.embed(queries))
+
+    def scores(self, query_vectors):
+        """Cosine scores, shape (n_queries, n_docs)."""
+        # One pass over each (row-major) segment; this is memory-bound, so its
+        # cost grows linearly with n_docs * dim.
+        if not self.segments:
+            return np.zeros((query_vectors.shape[0], 0), dtype=np.float32)
+        parts = [(segment @ query_vectors.T).T for segment in self.segments]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts, axis=1)
+
+    def search(self, query, k=5):
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries, k=5):
+        """Returns, per query, a list of (doc_id, score) pairs, best first."""
+        all_scores = self.scores(self.embed_queries(queries))
+        return [[(int(i), float(row[i])) for i in top_k(row, k)] for row in all_scores]
+
+
+class KeywordIndex:
+    """Inverted index (token -> posting array of doc ids) with BM25 scoring."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = []
+        self._lengths = np.zeros(0, dtype=np.float32)  # array copy of doc_lengths, rebuilt after add()
+        self._postings = {}  # token -> {doc_id: term frequency}
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, texts):
+        for text in texts:
+            doc_id = len(self.doc_lengths)
+            tokens = tokenize(text)
+            self.doc_lengths.append(len(tokens))
+            for token in tokens:
+                postings = self._postings.setdefault(token, {})
+                postings[doc_id] = postings.get(doc_id, 0) + 1
+        self._lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+
+    def scores(self, query, normalize=False):
+        """
+        Dense BM25 score vector over all documents. With `normalize`, scores are
+        divided by the best score the query could possibly reach, so a document
+        matching only one of several query terms stays well below 1.
+        """
+        n_docs = len(self.doc_lengths)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+        lengths = self._lengths
+        avg_length = lengths.mean() or 1.0
+        ceiling = 0.0
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token) or {}
+            ceiling += math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5)) * (self.k1 + 1)
+            if not postings:
+                continue
+            ids = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = math.log(1 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[ids] / avg_length)
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if normalize and ceiling > 0:
+            scores /= ceiling
+        return scores
+
+
+class Retriever:
+    """
+    Ranks documents for a query using dense similarity, optionally blended
+    with BM25 keyword scores (`keyword_weight` in [0, 1]).
+    `documents` may be any sequence supporting len() and integer indexing.
+    """
+
+    def __init__(self, embedder, documents=(), use_keywords=True, keyword_weight=0.5, vector_index=None):
+        self.documents = list(documents) if vector_index is None else documents
+        self.vectors = vector_index if vector_index is not None else VectorIndex(embedder)
+        self.keywords = KeywordIndex() if use_keywords else None
+        self.keyword_weight = keyword_weight if use_keywords else 0.0
+        if vector_index is None and self.documents:
+            self.vectors.add(self.documents)
+        if self.keywords is not None:
+            self.keywords.add([self.documents[i] for i in range(len(self.documents))])
+
+    def add(self, texts):
+        self.documents.extend(texts)
+        self.vectors.add(texts)
+        if self.keywords is not None:
+            self.keywords.add(texts)
+
+    def search(self, query, k=5, min_score=0.0):
+        """Returns up to k (document, score) pairs scoring at least `min_score`."""
+        if not len(self.documents):
+            return []
+        scores = self.vectors.scores(self.vectors.embed_queries([query]))[0]
+        if self.keywords is not None:
+            keyword_scores = self.keywords.scores(query, normalize=True)
+            scores = (1 - self.keyword_weight) * scores + self.keyword_weight * keyword_scores
+        return [
+            (self.documents[i], float(scores[i]))
+            for i in top_k(scores, k)
+            if scores[i] >= min_score
+        ]
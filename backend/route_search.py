@@ -0,0 +1,231 @@
+# route_search.py
+# Connecting-itinerary search over the local schedule store.
+#
+# FlightGraph packs a few days of synced flights into flat arrays, sorted by
+# (departure airport, arrival airport, departure time):
+#
+#   dep_time / arr_time    minutes since midnight of the base date, one entry per flight
+#   edge_to / edge_lo / edge_hi
+#                          one entry per airport pair ("edge"): destination airport
+#                          and the [lo, hi) slice of its flights
+#   out_offsets            CSR offsets: airport a's edges are out_offsets[a]:out_offsets[a + 1]
+#
+# so "the first flight from X to Y leaving after t" is a bisect inside one
+# edge's slice. search() is a time-dependent Dijkstra on arrival time, bounded
+# to max_stops + 1 legs: a label is (arrival, legs, airport, flight), a flight
+# enters the heap at most once per leg position (through the earliest arrival
+# that reaches it), and the first k labels popped at the destination with
+# distinct final flights are the k best itineraries by (arrival, stops). Before the
+# search, reverse reachability masks (airports that can reach the destination
+# within j more legs) prune every expansion to airports that can still finish
+# in time, which keeps the search to a few thousand labels on a global
+# schedule. See benchmarks/bench_route_search.py.
+#
+# Times are AviationStack's local scheduled times. Connection times compare an
+# arrival and a departure at the same airport, so they are exact; arrival times
+# at the destination are comparable between itineraries to the same place.
+
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+import heapq
+import itertools
+
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _int_array(values):
+    """numpy int array -> compact array('l'); scalar indexing on it is much cheaper than on numpy."""
+    packed = array("l")
+    packed.frombytes(np.ascontiguousarray(values, dtype=np.dtype("l")).tobytes())
+    return packed
+
+
+class FlightGraph:
+    """Array-backed flight network for connection searches; built once per schedule sync."""
+
+    def __init__(self, rows, base_date):
+        """
+        `rows` are ScheduleStore.day_flights() tuples; `base_date` (a date) is
+        minute 0. Flights without usable scheduled times are skipped.
+        """
+        self.base_date = base_date
+        day_offsets = {}
+
+        def minutes(timestamp):
+            day = timestamp[:10]
+            offset = day_offsets.get(day)
+            if offset is None:
+                offset = day_offsets[day] = (date.fromisoformat(day) - base_date).days * MINUTES_PER_DAY
+            return offset + int(timestamp[11:13]) * 60 + int(timestamp[14:16])
+
+        dep_codes, arr_codes, dep_times, arr_times, details = [], [], [], [], []
+        for dep_iata, arr_iata, departure_time, arrival_time, *rest in rows:
+            try:
+                dep, arr = minutes(departure_time), minutes(arrival_time)
+            except (TypeError, ValueError):
+                continue
+            dep_codes.append(dep_iata)
+            arr_codes.append(arr_iata)
+            dep_times.append(dep)
+            arr_times.append(arr)
+            details.append((departure_time, arrival_time, *rest))
+
+        self.airports = sorted(set(dep_codes) | set(arr_codes))
+        self.index = {code: i for i, code in enumerate(self.airports)}
+        n_airports = len(self.airports)
+
+        dep_airport = np.array([self.index[code] for code in dep_codes], dtype=np.int64)
+        arr_airport = np.array([self.index[code] for code in arr_codes], dtype=np.int64)
+        dep_time = np.array(dep_times, dtype=np.int64)
+        order = np.lexsort((dep_time, arr_airport, dep_airport))
+        dep_airport, arr_airport = dep_airport[order], arr_airport[order]
+
+        self.dep_time = _int_array(dep_time[order])
+        self.arr_time = _int_array(np.array(arr_times, dtype=np.int64)[order])
+        self.details = [details[i] for i in order.tolist()]
+
+        # One edge per (departure, arrival) airport pair, in the same order.
+        pair = dep_airport * max(n_airports, 1) + arr_airport
+        starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]]) if len(pair) else np.array([], dtype=np.int64)
+        self._edge_from = dep_airport[starts]
+        self._edge_to = arr_airport[starts]
+        self.edge_to = _int_array(self._edge_to)
+        self.edge_lo = _int_array(starts)
+        self.edge_hi = _int_array(np.r_[starts[1:], len(pair)])
+        self.out_offsets = _int_array(np.searchsorted(self._edge_from, np.arange(n_airports + 1)))
+        self.edge_of = {pair: e for e, pair in enumerate(zip(self._edge_from.tolist(), self.edge_to))}
+
+    @classmethod
+    def from_store(cls, store, flight_date, days=2):
+        """Flights departing on `flight_date` (ISO string) and the following days-1 days."""
+        base = date.fromisoformat(flight_date)
+        dates = [(base + timedelta(days=offset)).isoformat() for offset in range(days)]
+        return cls(store.day_flights(dates), base)
+
+    def __len__(self):
+        return len(self.dep_time)
+
+    def stats(self):
+        return {"airports": len(self.airports), "edges": len(self.edge_to), "flights": len(self)}
+
+    # --- Search ---
+
+    def _reach_masks(self, dest, max_legs):
+        """masks[j][a]: airport a can reach `dest` in at most j legs."""
+        reach = np.zeros(len(self.airports), dtype=bool)
+        reach[dest] = True
+        masks = [reach]
+        for _ in range(max_legs - 1):
+            reach = reach.copy()
+            reach[self._edge_from[masks[-1][self._edge_to]]] = True
+            masks.append(reach)
+        return masks
+
+    def search(self, origin, destination, depart_after=0, depart_before=MINUTES_PER_DAY - 1, k=5,
+               max_stops=2, min_connection=45, max_connection=720):
+        """
+        The k best itineraries from `origin` to `destination` leaving on the
+        base date between depart_after and depart_before (minutes after
+        midnight), ordered by arrival then stops. Each itinerary is a list of
+        flight indices (see itinerary()).
+        """
+        o, d = self.index.get(origin), self.index.get(destination)
+        if o is None or d is None or o == d:
+            return []
+        max_legs = max_stops + 1
+        masks = self._reach_masks(d, max_legs)
+        dep_time, arr_time = self.dep_time, self.arr_time
+        edge_to, edge_lo, edge_hi, out_offsets = self.edge_to, self.edge_lo, self.edge_hi, self.out_offsets
+        heap, sequence = [], itertools.count()
+        pushed = set()  # (flight, legs) already on the heap
+        results, final_flights = [], set()
+
+        def expand(airport, legs, earliest, latest, label):
+            # Edges whose next airport can still reach the destination in time.
+            remaining = max_legs - legs - 1
+            if remaining == 0:
+                edge = self.edge_of.get((airport, d))
+                candidates = () if edge is None else (edge,)
+            else:
+                lo, hi = out_offsets[airport], out_offsets[airport + 1]
+                if lo == hi:
+                    return
+                candidates = (np.flatnonzero(masks[remaining][self._edge_to[lo:hi]]) + lo).tolist()
+            visited = _airports_on(label, origin=o)
+            for edge in candidates:
+                if edge_to[edge] in visited:
+                    continue
+                # Every departure in the window is a candidate: a later one can
+                # still arrive first. A flight already reached through an
+                # earlier arrival is skipped (same onward trip, later feeder).
+                for flight in range(bisect_left(dep_time, earliest, edge_lo[edge], edge_hi[edge]), edge_hi[edge]):
+                    if dep_time[flight] > latest:
+                        break
+                    if (flight, legs + 1) in pushed:
+                        continue
+                    pushed.add((flight, legs + 1))
+                    heapq.heappush(heap, (arr_time[flight], legs + 1, next(sequence), edge_to[edge], flight, label))
+
+        expand(o, 0, depart_after, depart_before, None)
+        while heap and len(results) < k:
+            arrival, legs, _, airport, flight, parent = heapq.heappop(heap)
+            label = (flight, airport, parent)
+            if airport == d:
+                # Ties on the final flight keep the version with fewer stops (popped first).
+                if flight not in final_flights:
+                    final_flights.add(flight)
+                    results.append(_flights_of(label))
+            elif legs < max_legs:
+                expand(airport, legs, arrival + min_connection, arrival + max_connection, label)
+        return results
+
+    def itinerary(self, flights):
+        """A list of flight indices -> a flight-option shaped dict with the legs attached."""
+        legs = []
+        for flight in flights:
+            (departure_time, arrival_time, departure_airport, arrival_airport,
+             airline, flight_number, status) = self.details[flight]
+            legs.append({
+                "airline": airline,
+                "flight_number": flight_number,
+                "departure_airport": departure_airport,
+                "departure_time": departure_time,
+                "arrival_airport": arrival_airport,
+                "arrival_time": arrival_time,
+                "status": status,
+                "price_usd": "Contact airline for price"
+            })
+        via = [leg["arrival_airport"] for leg in legs[:-1]]
+        stops = len(via)
+        return {
+            "airline": " + ".join(dict.fromkeys(leg["airline"] or "Unknown" for leg in legs)),
+            "flight_number": " / ".join(leg["flight_number"] or "?" for leg in legs),
+            "departure_airport": legs[0]["departure_airport"],
+            "departure_time": legs[0]["departure_time"],
+            "arrival_airport": legs[-1]["arrival_airport"],
+            "arrival_time": legs[-1]["arrival_time"],
+            "status": f"{stops} stop{'s' if stops > 1 else ''} via {', '.join(via)}",
+            "price_usd": "Contact airline for price",
+            "stops": stops,
+            "layover_minutes": [self.dep_time[b] - self.arr_time[a] for a, b in zip(flights, flights[1:])],
+            "legs": legs,
+        }
+
+
+def _flights_of(label):
+    flights = []
+    while label is not None:
+        flight, _, label = label
+        flights.append(flight)
+    return flights[::-1]
+
+
+def _airports_on(label, origin):
+    airports = {origin}
+    while label is not None:
+        _, airport, label = label
+        airports.add(airport)
+    return airports
@@ -0,0 +1,292 @@
+# schedule_store.py
+# Local copy of flight schedules, so the flight agent can answer routes from
+# disk instead of calling AviationStack on every request.
+#
+# A bulk sync job pulls every departure from the configured airports for the
+# next few days (paginated /flights?dep_iata=...&flight_date=...) and replaces
+# that airport-day in a SQLite table indexed on
+# (dep_iata, arr_iata, flight_date, dep_minutes). Route queries are then a
+# single index range scan, including filters the live API can't serve
+# cheaply: a departure time window and ordering by departure time. The
+# synced_days table records which airport-days are covered, so an empty
+# answer for a covered day means "no flights", and only uncovered days fall
+# back to the live API.
+#
+# Run the sync from cron (or by hand), e.g. against the local stub:
+#
+#   python backend/benchmarks/stubs.py --port 5999 &
+#   AVIATIONSTACK_API_URL=http://127.0.0.1:5999/v1/flights AVIATIONSTACK_API_KEY=stub \
+#       python backend/schedule_store.py --airports JFK LAX LHR --days 3
+
+import argparse
+from datetime import date, timedelta
+import os
+import sqlite3
+import threading
+import time
+
+from rate_limiter import RateLimiter, work_priority
+import telemetry
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.path.join(BACKEND_DIR, "cache", "schedules.sqlite3")
+
+# AviationStack's maximum page size
+PAGE_SIZE = 100
+
+
+def clock_minutes(timestamp):
+    """Minutes after local midnight from an ISO timestamp ("2026-10-20T08:15:00+00:00" -> 495)."""
+    try:
+        hours, minutes = timestamp[11:16].split(":")
+        return int(hours) * 60 + int(minutes)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_clock(value):
+    """ "HH:MM" -> minutes after midnight; raises ValueError on anything else."""
+    hours, _, minutes = str(value).partition(":")
+    total = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= total < 24 * 60:
+        raise ValueError(f"not a time of day: {value!r}")
+    return total
+
+
+def schedule_row(record, synced_at):
+    """One AviationStack /flights record -> a flights table row (None if unusable)."""
+    try:
+        departure, arrival = record["departure"], record["arrival"]
+        return (
+            departure["iata"].upper(), arrival["iata"].upper(), record["flight_date"],
+            clock_minutes(departure["scheduled"]), departure["scheduled"], arrival["scheduled"],
+            departure.get("airport"), arrival.get("airport"),
+            (record.get("airline") or {}).get("name"), (record.get("flight") or {}).get("iata"),
+            record.get("flight_status"), synced_at,
+        )
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+class ScheduleStore:
+    """SQLite flight schedules, queried per route and day."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_age=86400.0):
+        self.path = path
+        # A synced airport-day older than this is no longer trusted.
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "covered": 0, "uncovered": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS flights (
+                   dep_iata TEXT NOT NULL,
+                   arr_iata TEXT NOT NULL,
+                   flight_date TEXT NOT NULL,
+                   dep_minutes INTEGER,
+                   departure_time TEXT,
+                   arrival_time TEXT,
+                   departure_airport TEXT,
+                   arrival_airport TEXT,
+                   airline TEXT,
+                   flight_number TEXT,
+                   status TEXT,
+                   synced_at REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS idx_flights_route
+                   ON flights (dep_iata, arr_iata, flight_date, dep_minutes);
+               CREATE INDEX IF NOT EXISTS idx_flights_day ON flights (dep_iata, flight_date);
+               CREATE TABLE IF NOT EXISTS synced_days (
+                   dep_iata TEXT NOT NULL,
+                   flight_date TEXT NOT NULL,
+                   flights INTEGER NOT NULL,
+                   synced_at REAL NOT NULL,
+                   PRIMARY KEY (dep_iata, flight_date)
+               );"""
+        )
+        self._conn.commit()
+
+    def covers(self, dep_iata, flight_date):
+        """True if this airport-day was synced within max_age."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at FROM synced_days WHERE dep_iata = ? AND flight_date = ?",
+                (dep_iata.upper(), flight_date),
+            ).fetchone()
+        return row is not None and time.time() - row[0] <= self.max_age
+
+    def route_flights(self, dep_iata, arr_iata, flight_date, depart_after=None, depart_before=None, limit=3):
+        """
+        Flights on one route and day, ordered by departure, as flight agent
+        option dicts. `depart_after` / `depart_before` are minutes after
+        midnight (inclusive). Returns None if the day is not covered by a sync.
+        """
+        if not self.covers(dep_iata, flight_date):
+            self._count("uncovered")
+            return None
+        self._count("covered")
+
+        sql = ("SELECT airline, flight_number, departure_airport, departure_time, arrival_airport, "
+               "arrival_time, status FROM flights WHERE dep_iata = ? AND arr_iata = ? AND flight_date = ?")
+        params = [dep_iata.upper(), arr_iata.upper(), flight_date]
+        if depart_after is not None:
+            sql += " AND dep_minutes >= ?"
+            params.append(depart_after)
+        if depart_before is not None:
+            sql += " AND dep_minutes <= ?"
+            params.append(depart_before)
+        sql += " ORDER BY dep_minutes LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {
+                "airline": airline,
+                "flight_number": flight_number,
+                "departure_airport": departure_airport,
+                "departure_time": departure_time,
+                "arrival_airport": arrival_airport,
+                "arrival_time": arrival_time,
+                "status": status,
+                "price_usd": "Contact airline for price"
+            }
+            for airline, flight_number, departure_airport, departure_time, arrival_airport, arrival_time, status in rows
+        ]
+
+    def day_flights(self, flight_dates):
+        """
+        Every stored flight departing on `flight_dates` (ISO strings), as
+        (dep_iata, arr_iata, departure_time, arrival_time, departure_airport,
+        arrival_airport, airline, flight_number, status) rows.
+        """
+        marks = ", ".join("?" * len(flight_dates))
+        with self._lock:
+            return self._conn.execute(
+                "SELECT dep_iata, arr_iata, departure_time, arrival_time, departure_airport, arrival_airport, "
+                f"airline, flight_number, status FROM flights WHERE flight_date IN ({marks})",
+                list(flight_dates),
+            ).fetchall()
+
+    def version(self):
+        """Changes whenever a sync replaces or prunes data; used to invalidate derived indexes."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), MAX(synced_at) FROM synced_days").fetchone()
+
+    def replace_day(self, dep_iata, flight_date, records):
+        """Atomically replaces everything stored for one airport-day with `records`."""
+        now = time.time()
+        rows = [row for row in (schedule_row(record, now) for record in records) if row is not None]
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM flights WHERE dep_iata = ? AND flight_date = ?",
+                                   (dep_iata.upper(), flight_date))
+                self._conn.executemany("INSERT INTO flights VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._conn.execute("INSERT OR REPLACE INTO synced_days VALUES (?, ?, ?, ?)",
+                                   (dep_iata.upper(), flight_date, len(rows), now))
+        return len(rows)
+
+    def prune(self, before_date):
+        """Drops days before `before_date` (ISO string)."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM flights WHERE flight_date < ?", (before_date,))
+                self._conn.execute("DELETE FROM synced_days WHERE flight_date < ?", (before_date,))
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+            self._stats["queries"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["flights"], = self._conn.execute("SELECT COUNT(*) FROM flights").fetchone()
+            stats["synced_days"], = self._conn.execute("SELECT COUNT(*) FROM synced_days").fetchone()
+        stats["coverage_rate"] = round(stats["covered"] / stats["queries"], 4) if stats["queries"] else 0.0
+        return stats
+
+
+# --- Bulk sync ---
+
+def fetch_departures(client, api_url, api_key, dep_iata, flight_date):
+    """Every departure from `dep_iata` on `flight_date`, following AviationStack pagination."""
+    records, offset = [], 0
+    while True:
+        response = client.get(api_url, params={
+            "access_key": api_key, "dep_iata": dep_iata, "flight_date": flight_date,
+            "limit": PAGE_SIZE, "offset": offset,
+        })
+        body = response.json()
+        page = body.get("data", [])
+        records.extend(page)
+        total = (body.get("pagination") or {}).get("total", len(records))
+        offset += len(page)
+        if not page or offset >= total:
+            return records
+
+
+def sync_schedules(store, client, api_url, api_key, airports, days=3, start=None):
+    """
+    Refreshes `days` days (from `start`, default today) for each airport.
+    Pacing comes from the client's rate limiter, at precompute priority. A
+    failed airport-day keeps its previous data. Returns {"days": n, "flights": n, "failed": n}.
+    """
+    start = start or date.today()
+    totals = {"days": 0, "flights": 0, "failed": 0}
+    with work_priority("precompute"):
+        for dep_iata in airports:
+            for offset in range(days):
+                flight_date = (start + timedelta(days=offset)).isoformat()
+                try:
+                    records = fetch_departures(client, api_url, api_key, dep_iata, flight_date)
+                except Exception as e:
+                    telemetry.log(f"Schedule sync: {dep_iata} {flight_date} failed: {e}")
+                    totals["failed"] += 1
+                    continue
+                totals["flights"] += store.replace_day(dep_iata, flight_date, records)
+                totals["days"] += 1
+    store.prune(start.isoformat())
+    return totals
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from agent_client import AgentClient
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Sync flight schedules from AviationStack into the local store")
+    parser.add_argument("--airports", nargs="+",
+                        default=os.getenv("SCHEDULE_SYNC_AIRPORTS", "").split() or None,
+                        help="departure airports (default: SCHEDULE_SYNC_AIRPORTS)")
+    parser.add_argument("--days", type=int, default=int(os.getenv("SCHEDULE_SYNC_DAYS", "3")))
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="first day (default: today)")
+    parser.add_argument("--store", default=os.getenv("SCHEDULE_STORE_PATH", DEFAULT_STORE_PATH))
+    parser.add_argument("--api-url", default=os.getenv("AVIATIONSTACK_API_URL", "http://api.aviationstack.com/v1/flights"))
+    parser.add_argument("--rate-per-minute", type=float, default=60.0)
+    args = parser.parse_args()
+
+    api_key = os.getenv("AVIATIONSTACK_API_KEY")
+    if not args.airports:
+        parser.error("no airports: pass --airports or set SCHEDULE_SYNC_AIRPORTS")
+    if not api_key:
+        parser.error("AVIATIONSTACK_API_KEY is not set")
+
+    # Requests are spaced to --rate-per-minute and slow down further on 429s.
+    limiter = RateLimiter("aviationstack-sync", args.rate_per_minute, burst=1, max_wait={"precompute": 600.0})
+    client = AgentClient.from_env("aviationstack-sync", "AVIATIONSTACK", read_timeout=30.0, max_retries=3,
+                                  rate_limiter=limiter)
+    started = time.monotonic()
+    totals = sync_schedules(ScheduleStore(args.store), client, args.api_url, api_key, args.airports,
+                            days=args.days, start=args.start)
+    print(f"Synced {totals['days']} airport-days ({totals['flights']} flights, {totals['failed']} failed) "
+          f"in {time.monotonic() - started:.1f}s into {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# server_timing.py
+# Per-request stage timings, reported in a Server-Timing response header
+# (e.g. "retrieval;dur=1.8, generate;dur=302.4") so benchmarks and browser dev
+# tools can see where a request spent its time.
+#
+# Stages are collected in a context variable: anything running in the request's
+# own thread (Flask) or task (ASGI) can call record() without passing state
+# around. Work handed to a pool with the context copied (telemetry.submit_in_context,
+# run_in_threadpool, asyncio.to_thread) records into the same stage dict, so its
+# spans are included too. Stages are summed per name, not laid out on a
+# timeline: stages that ran in parallel (e.g. the agents' calls) overlap, and
+# their total can exceed the request's wall time. Pool work still running when
+# the response is sent is left out. The per-request wiring lives in
+# telemetry.py, whose span() records here.
+
+from contextvars import ContextVar
+
+_stages = ContextVar("server_timing_stages", default=None)
+
+
+def begin():
+    """Starts collecting stages for the current request; returns the stage dict."""
+    stages = {}
+    _stages.set(stages)
+    return stages
+
+
+def record(name, elapsed_ms):
+    """Adds `elapsed_ms` to stage `name` (repeated stages accumulate)."""
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + elapsed_ms
+
+
+def header_value(stages=None):
+    stages = _stages.get() if stages is None else stages
+    return ", ".join(f"{name};dur={elapsed_ms:.1f}" for name, elapsed_ms in (stages or {}).items())
+
+
+def parse_header(value):
+    """Inverse of header_value: {"stage": elapsed_ms}. Unknown parameters are ignored."""
+    stages = {}
+    for entry in (value or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, number = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    stages[name] = float(number)
+                except ValueError:
+                    pass
+    return stages
@@ -0,0 +1,146 @@
+# single_flight.py
+# Request coalescing: concurrent calls with the same key share one execution
+# of the underlying work and receive its result (or its exception).
+
+import asyncio
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process coalescing is unavailable
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    In-process single-flight group, optionally extended across worker processes.
+
+    Within a process, the first caller for a key (the leader) runs `fn` and
+    every concurrent caller with the same key waits for that outcome.
+
+    With `lock_dir`, the leader additionally takes an exclusive file lock for
+    the key before running `fn`. A leader in another worker that was blocked on
+    the same lock then calls `recheck()` (typically a lookup in a cache shared
+    between workers) and only runs `fn` itself if that still returns None.
+    """
+
+    def __init__(self, name, lock_dir=None):
+        self.name = name
+        self.lock_dir = lock_dir if fcntl is not None else None
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "cross_process_hits": 0}
+
+    def do(self, key, fn, recheck=None):
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir:
+            self._count("executions")
+            return fn()
+
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        path = os.path.join(self.lock_dir, f"{self.name}-{digest}.lock")
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is doing this exact call: wait for it, then see
+                # whether it left a result behind for us.
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if recheck is not None:
+                    result = recheck()
+                    if result is not None:
+                        self._count("cross_process_hits")
+                        return result
+            try:
+                self._count("executions")
+                return fn()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["cross_process"] = bool(self.lock_dir)
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    asyncio flavour of SingleFlight for the ASGI serving mode: concurrent
+    awaiters of the same key share one run of `fn()` (a coroutine function).
+    In-process only.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "cross_process_hits": 0}
+
+    async def do(self, key, fn):
+        self._stats["calls"] += 1
+        task = self._calls.get(key)
+        if task is None:
+            self._stats["executions"] += 1
+            # Run the shared call as its own task: a waiter that gets cancelled
+            # (e.g. by its deadline) must not cancel it for everyone else.
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every waiter gave up
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        stats["cross_process"] = False
+        return stats
@@ -0,0 +1,240 @@
+# startup.py
+# Lazy initialization of heavy clients and indexes, readiness reporting and
+# the startup profile, shared by the three services.
+#
+# Expensive components (the Gemini client and its half-second of imports,
+# the retrieval index, the place resolver, ...) are registered with lazy()
+# instead of being built at import time, so a worker imports in milliseconds
+# and serves whatever does not need them (activity index and cache hits)
+# right away. start_warming() then builds them in a background thread; a
+# request that needs one before that finishes builds it itself, and
+# concurrent callers wait on the same build.
+#
+#   GET /healthz   200 while the process is up (liveness)
+#   GET /readyz    503 "warming" until every required component is built
+#                  (required = needed for cache-served traffic), 503 "failed"
+#                  if one of them failed; then 200 "warming" while optional
+#                  components are still building, 200 "degraded" if one failed,
+#                  200 "ready" once all are built
+#   GET /startup   the startup profile: import time and, per component, when
+#                  its build started and how long it took, in ms since the
+#                  process started (or was forked)
+#
+# LAZY_INIT=0 builds every component during import instead, e.g. for a
+# preloading server that should fork fully warm workers. STARTUP_WARM=0
+# skips the background warm-up, so components are only built on first use.
+# Forking waits for builds in progress; a forked worker inherits what its
+# parent already built and warms the rest.
+
+import os
+import threading
+import time
+
+import telemetry
+
+LAZY_INIT = os.getenv("LAZY_INIT", "1") == "1"
+STARTUP_WARM = os.getenv("STARTUP_WARM", "1") == "1"
+# A failed build is retried on first use after this many seconds.
+RETRY_AFTER = float(os.getenv("STARTUP_RETRY_AFTER", "30"))
+
+
+def _process_started():
+    """perf_counter() at process start, from /proc where available; else now."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.perf_counter() - max(0.0, age)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.perf_counter()
+
+
+_state = {"started": _process_started(), "imported": None, "service": None, "warming": False}
+_components = []
+_UNSET = object()
+
+
+def _ms_since_start(at):
+    return None if at is None else round((at - _state["started"]) * 1000, 1)
+
+
+class ComponentUnavailable(RuntimeError):
+    """A lazy component's last build failed and is not due for a retry yet."""
+
+
+class Lazy:
+    """
+    A component built by `factory()` on first get(). Thread-safe: concurrent
+    first callers share one build. A failed build raises to its caller and
+    is retried after RETRY_AFTER seconds; until then get() raises
+    ComponentUnavailable.
+    """
+
+    def __init__(self, name, factory, required=False):
+        self.name = name
+        self.factory = factory
+        self.required = required
+        self.state = "cold"  # cold, warming, ready or failed
+        self.error = None
+        self.started_at = None
+        self.init_ms = None
+        self._value = _UNSET
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        value = self._value
+        if value is not _UNSET:
+            return value
+        with self._lock:
+            if self._value is _UNSET:
+                self._build()
+        return self._value
+
+    def _build(self):
+        """Caller holds the lock."""
+        if self.state == "failed" and time.perf_counter() - self._failed_at < RETRY_AFTER:
+            raise ComponentUnavailable(f"{self.name} is unavailable: {self.error}")
+        self.state, self.started_at = "warming", time.perf_counter()
+        try:
+            value = self.factory()
+        except Exception as e:
+            self.state, self.error, self._failed_at = "failed", str(e), time.perf_counter()
+            self.init_ms = round((self._failed_at - self.started_at) * 1000, 1)
+            telemetry.log(f"Startup: {self.name} failed to initialize: {e}")
+            raise
+        self.init_ms = round((time.perf_counter() - self.started_at) * 1000, 1)
+        self.state, self.error, self._value = "ready", None, value
+
+    def peek(self):
+        """The component if it is already built, else None; never builds it."""
+        value = self._value
+        return None if value is _UNSET else value
+
+    @property
+    def ready(self):
+        return self._value is not _UNSET
+
+    def describe(self):
+        return {"state": self.state, "required": self.required, "started_ms": _ms_since_start(self.started_at),
+                "init_ms": self.init_ms, "error": self.error}
+
+
+def lazy(name, factory, required=False):
+    """Registers a lazily built component; with LAZY_INIT=0 it is built right away."""
+    component = Lazy(name, factory, required)
+    _components.append(component)
+    if not LAZY_INIT:
+        try:
+            component.get()
+        except Exception:
+            pass  # recorded on the component and reported by /readyz
+    return component
+
+
+def _warm():
+    for component in sorted(_components, key=lambda c: not c.required):
+        try:
+            component.get()
+        except Exception:
+            pass
+
+
+def start_warming(service):
+    """
+    Call at the end of a service module: records the import as done and
+    builds the remaining components in the background.
+    """
+    _state["service"] = service
+    if _state["imported"] is None:
+        _state["imported"] = time.perf_counter()
+    if STARTUP_WARM:
+        _state["warming"] = True
+        threading.Thread(target=_warm, name="startup-warm", daemon=True).start()
+
+
+def _before_fork():
+    # Wait out builds in progress: a child forked halfway through one would
+    # inherit a half-imported module or client it can never finish.
+    for component in _components:
+        component._lock.acquire()
+
+
+def _after_fork_in_parent():
+    for component in _components:
+        component._lock.release()
+
+
+def _after_fork():
+    # The child has no warm-up thread; keep what the parent built and start
+    # again from here for the rest.
+    _state["started"] = _state["imported"] = time.perf_counter()
+    for component in _components:
+        component._lock = threading.Lock()
+    if _state["warming"]:
+        start_warming(_state["service"])
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent, after_in_child=_after_fork)
+
+
+# --- Readiness and profile ---
+
+def readiness():
+    """(status, HTTP status code) as served by /readyz."""
+    required = [c for c in _components if c.required]
+    if any(c.state == "failed" for c in required):
+        return "failed", 503
+    if not all(c.ready for c in required):
+        return "warming", 503
+    if any(c.state == "failed" for c in _components):
+        return "degraded", 200
+    if not all(c.ready for c in _components):
+        return "warming", 200
+    return "ready", 200
+
+
+def profile():
+    ready_at = None
+    if _components and all(c.ready for c in _components):
+        ready_at = max(c.started_at + c.init_ms / 1000 for c in _components)
+    return {
+        "service": _state["service"],
+        "pid": os.getpid(),
+        "lazy_init": LAZY_INIT,
+        "import_ms": _ms_since_start(_state["imported"]),
+        "ready_ms": _ms_since_start(ready_at) if _components else _ms_since_start(_state["imported"]),
+        "uptime_ms": _ms_since_start(time.perf_counter()),
+        "components": {c.name: c.describe() for c in _components},
+    }
+
+
+def stats():
+    status, status_code = readiness()
+    return {"ready": int(status == "ready"), "serving": int(status_code == 200),
+            "import_ms": _ms_since_start(_state["imported"]) or 0.0,
+            "components_ready": sum(c.ready for c in _components), "components": len(_components)}
+
+
+def install(app):
+    """Flask: GET /healthz, /readyz and /startup; startup gauges on /metrics."""
+    from flask import jsonify
+
+    telemetry.REGISTRY.register_stats("startup", stats)
+
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        return jsonify({"status": "ok"})
+
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        status, status_code = readiness()
+        components = {c.name: {"state": c.state, "required": c.required, "error": c.error} for c in _components}
+        return jsonify({"status": status, "components": components}), status_code
+
+    @app.route('/startup', methods=['GET'])
+    def startup_profile():
+        return jsonify(profile())
+
+    return app
@@ -0,0 +1,179 @@
+# stub_model.py
+# Offline stand-in for the Gemini GenerativeModel, used by benchmarks and local
+# load tests (KNOWLEDGE_MODEL=stub). It mimics the parts of the API the
+# knowledge agent uses: generate_content / generate_content_async, with and
+# without stream=True, generation_config (JSON mode and max_output_tokens) and
+# usage_metadata. Free-text answers are chatty the way real ones are: an intro
+# line, markdown bullets with a description each, and a closing line.
+#
+# LatencyProfile is shared with the stub AviationStack server in
+# benchmarks/stubs.py, so both upstreams take the same latency/error settings.
+
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class StubModelError(RuntimeError):
+    """Injected failure, standing in for a quota or 5xx error from Gemini."""
+
+
+class LatencyProfile:
+    """
+    Latency and error model for a stub upstream.
+    fixed: always `mean_ms`; uniform: `mean_ms` +/- `jitter_ms`;
+    exponential / lognormal: long-tailed around `mean_ms` (lognormal uses
+    `jitter_ms` as the standard deviation). `error_rate` is the fraction of
+    calls that fail.
+    """
+
+    def __init__(self, mean_ms=300.0, jitter_ms=0.0, dist="uniform", error_rate=0.0):
+        if dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"unknown latency distribution {dist!r}, expected one of {LATENCY_DISTRIBUTIONS}")
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.dist = dist
+        self.error_rate = error_rate
+
+    @classmethod
+    def from_env(cls, prefix, mean_ms=300.0):
+        return cls(
+            mean_ms=float(os.getenv(f"{prefix}_LATENCY_MS", str(mean_ms))),
+            jitter_ms=float(os.getenv(f"{prefix}_JITTER_MS", "0")),
+            dist=os.getenv(f"{prefix}_LATENCY_DIST", "uniform"),
+            error_rate=float(os.getenv(f"{prefix}_ERROR_RATE", "0")),
+        )
+
+    def sample(self):
+        """One latency draw, in seconds."""
+        if self.dist == "fixed" or self.mean_ms <= 0:
+            ms = self.mean_ms
+        elif self.dist == "uniform":
+            ms = self.mean_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        elif self.dist == "exponential":
+            ms = random.expovariate(1.0 / self.mean_ms)
+        else:
+            # Parameters chosen so the distribution's mean and std are mean_ms and jitter_ms.
+            sigma2 = math.log(1 + (self.jitter_ms / self.mean_ms) ** 2)
+            ms = random.lognormvariate(math.log(self.mean_ms) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, ms) / 1000
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def describe(self):
+        return {"mean_ms": self.mean_ms, "jitter_ms": self.jitter_ms, "dist": self.dist, "error_rate": self.error_rate}
+
+
+# Tokens are counted as in activity_prompt: about four characters each.
+CHARS_PER_TOKEN = 4
+
+
+class StubUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class StubResponse:
+    def __init__(self, text, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class StubGenerativeModel:
+    """
+    Sleeps for one `latency` draw per call plus `ms_per_token` per output
+    token, spread evenly over the chunks when streaming, then answers with
+    `n_items` made-up attractions for the city named in the prompt (or raises
+    StubModelError, at the profile's error rate). Prompt tokens are free, as
+    prefill is small next to decoding.
+    """
+
+    def __init__(self, latency=None, n_items=5, chunks=5, ms_per_token=0.0):
+        self.latency = latency or LatencyProfile()
+        self.n_items = n_items
+        self.chunks = chunks
+        self.ms_per_token = ms_per_token
+
+    # STUB_MODEL_LATENCY_MS, _JITTER_MS, _LATENCY_DIST, _ERROR_RATE, _MS_PER_TOKEN
+    @classmethod
+    def from_env(cls):
+        return cls(latency=LatencyProfile.from_env("STUB_MODEL"),
+                   ms_per_token=float(os.getenv("STUB_MODEL_MS_PER_TOKEN", "0")))
+
+    def _check(self, failing):
+        if failing:
+            raise StubModelError("stub model: injected failure")
+
+    def _text(self, prompt, generation_config):
+        match = re.search(r"attractions (?:for|in) (.+?)[.\n]", prompt)
+        city = match.group(1) if match else "the city"
+        config = generation_config or {}
+        get = config.get if isinstance(config, dict) else lambda key: getattr(config, key, None)
+        if get("response_mime_type") == "application/json":
+            text = json.dumps([f"{city} attraction {i + 1}: a short note on why it is worth a visit"
+                               for i in range(self.n_items)])
+        else:
+            text = "\n".join(
+                [f"Here are some top tourist attractions in {city}:", ""]
+                + [f"* **{city} attraction {i + 1}**: a longer description of the place, its history, what to "
+                   f"see there and the best time of day to go, as a chatty model would write it."
+                   for i in range(self.n_items)]
+                + ["", f"Enjoy your trip to {city}!"])
+        max_tokens = get("max_output_tokens")
+        if max_tokens:
+            text = text[:max_tokens * CHARS_PER_TOKEN]
+        return text
+
+    def _usage(self, prompt, text):
+        return StubUsage(-(-len(prompt) // CHARS_PER_TOKEN), -(-len(text) // CHARS_PER_TOKEN))
+
+    def _call(self, prompt, generation_config):
+        # Failures are decided up front but raised after the latency, like a real timeout or 5xx.
+        text = self._text(prompt, generation_config)
+        usage = self._usage(prompt, text)
+        delay = self.latency.sample() + usage.candidates_token_count * self.ms_per_token / 1000
+        return text, usage, delay, self.latency.should_fail()
+
+    def _pieces(self, text):
+        size = max(1, -(-len(text) // self.chunks))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def generate_content(self, prompt, stream=False, generation_config=None, **kwargs):
+        text, usage, delay, failing = self._call(prompt, generation_config)
+        if not stream:
+            time.sleep(delay)
+            self._check(failing)
+            return StubResponse(text, usage)
+
+        def chunks():
+            pieces = self._pieces(text)
+            for n, piece in enumerate(pieces):
+                time.sleep(delay / len(pieces))
+                self._check(failing and n == len(pieces) // 2)
+                yield StubResponse(piece, usage if n == len(pieces) - 1 else None)
+        return chunks()
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, **kwargs):
+        text, usage, delay, failing = self._call(prompt, generation_config)
+        if not stream:
+            await asyncio.sleep(delay)
+            self._check(failing)
+            return StubResponse(text, usage)
+
+        async def chunks():
+            pieces = self._pieces(text)
+            for n, piece in enumerate(pieces):
+                await asyncio.sleep(delay / len(pieces))
+                self._check(failing and n == len(pieces) // 2)
+                yield StubResponse(piece, usage if n == len(pieces) - 1 else None)
+        return chunks()
@@ -0,0 +1,287 @@
+# telemetry.py
+# Lightweight tracing and metrics shared by the three services:
+#
+#   * a request ID (X-Request-ID), taken from the incoming request or minted,
+#     kept in a context variable and forwarded by the agent clients, so one
+#     plan can be followed through main_app and both agents' logs;
+#   * span(): times a stage, feeds the per-stage histogram and the
+#     Server-Timing header;
+#   * Counter / Histogram and stats callbacks, rendered in the Prometheus text
+#     format on GET /metrics.
+#
+# Hot-path cost is a perf_counter pair, a dict update and a bisect under a lock
+# per span. Cache and client statistics are only read when /metrics is scraped.
+# Each process (or uvicorn worker) keeps its own registry.
+
+import bisect
+import contextlib
+import contextvars
+from contextvars import ContextVar
+import math
+import threading
+import time
+import uuid
+
+import server_timing
+
+REQUEST_ID_HEADER = "X-Request-ID"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_request_id = ContextVar("request_id", default=None)
+
+
+# --- Request IDs ---
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id=None):
+    """Adopts an incoming request ID (or mints one) for the current context and returns it."""
+    # Only accept sane IDs from the outside; they end up in logs and headers.
+    if not request_id or len(request_id) > 64 or not request_id.isprintable():
+        request_id = new_request_id()
+    _request_id.set(request_id)
+    return request_id
+
+
+def propagation_headers():
+    """Headers to add to an outgoing call so the callee joins the same trace."""
+    request_id = _request_id.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+def submit_in_context(pool, fn, *args):
+    """pool.submit() that carries the caller's request ID (and other context) into the worker."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def log(message):
+    """print(), prefixed with the current request ID when there is one."""
+    request_id = _request_id.get()
+    print(f"[{request_id}] {message}" if request_id else message)
+
+
+# --- Metrics ---
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram, in seconds."""
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        names = self.labels + ("le",)
+        for key, values in series:
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), values):
+                running += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{self.name}_bucket{_label_text(names, key + (le,))} {running}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._stats_sources = []  # (prefix, labels dict, callable returning a flat dict)
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats_fn, **labels):
+        """
+        Exposes the numeric fields of `stats_fn()` (e.g. TTLCache.stats) as
+        gauges named <prefix>_<field>, read at scrape time.
+        """
+        self._stats_sources.append((prefix, labels, stats_fn))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, labels, stats_fn in self._stats_sources:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                lines.append(f"# {prefix}: stats unavailable ({e})")
+                continue
+            label_text = _label_text(tuple(labels), tuple(labels.values()))
+            for field, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{field} gauge")
+                lines.append(f"{prefix}_{field}{label_text} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route.", ("service", "route", "status"))
+STAGE_DURATION = REGISTRY.histogram(
+    "stage_duration_seconds", "Time spent in each pipeline stage.", ("service", "stage"))
+UPSTREAM_DURATION = REGISTRY.histogram(
+    "upstream_request_duration_seconds", "Outgoing HTTP attempts, by client and outcome.",
+    ("client", "outcome"))
+FALLBACKS = REGISTRY.counter(
+    "fallback_responses_total", "Responses served from fallback/mock data.", ("service", "kind"))
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Set once per process by install() / TelemetryMiddleware.
+_service = {"name": "unknown"}
+
+
+# --- Spans ---
+
+def record_span(name, elapsed_ms):
+    """Records an already-measured stage (e.g. an agent call's elapsed_ms)."""
+    STAGE_DURATION.observe(elapsed_ms / 1000, _service["name"], name)
+    server_timing.record(name, elapsed_ms)
+
+
+@contextlib.contextmanager
+def span(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, (time.perf_counter() - started) * 1000)
+
+
+def fallback(kind):
+    FALLBACKS.inc(_service["name"], kind)
+
+
+# --- Wiring ---
+
+def install(app, service):
+    """
+    Flask: request IDs, Server-Timing, request histogram and GET /metrics.
+    """
+    from flask import Response, g, request
+
+    _service["name"] = service
+
+    @app.before_request
+    def _begin_request():
+        g.telemetry_started = time.perf_counter()
+        set_request_id(request.headers.get(REQUEST_ID_HEADER))
+        server_timing.begin()
+
+    @app.after_request
+    def _end_request(response):
+        response.headers[REQUEST_ID_HEADER] = current_request_id() or ""
+        value = server_timing.header_value()
+        if value:
+            response.headers["Server-Timing"] = value
+        started = g.get("telemetry_started")
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - started, service, route, response.status_code)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+
+    return app
+
+
+class TelemetryMiddleware:
+    """
+    ASGI counterpart of install() for the native routes listed in `paths`;
+    anything else is passed through untouched (the mounted Flask app
+    instruments itself, including /metrics).
+    """
+
+    def __init__(self, app, service, paths):
+        self.app = app
+        self.service = service
+        self.paths = frozenset(paths)
+        _service["name"] = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode("latin-1"), b"")
+        request_id = set_request_id(incoming.decode("latin-1"))
+        stages = server_timing.begin()
+        status = {"code": 500}
+
+        async def send_with_telemetry(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode("latin-1"), request_id.encode("latin-1")))
+                if stages:
+                    headers.append((b"server-timing", server_timing.header_value(stages).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_telemetry)
+        finally:
+            REQUEST_DURATION.observe(time.perf_counter() - started, self.service, scope["path"], status["code"])
@@ -0,0 +1,102 @@
+# test_route_search.py
+# FlightGraph.search() against exhaustive enumeration on small random
+# schedules: the same (arrival, stops) for the k best itineraries.
+#
+#   python -m pytest backend/tests
+
+from datetime import date, timedelta
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from route_search import FlightGraph  # noqa: E402
+
+BASE_DATE = date(2026, 10, 20)
+
+
+def random_schedule(rng, n_airports, n_flights):
+    """day_flights()-shaped rows over two days; airport names are the codes."""
+    codes = [f"A{i:02d}" for i in range(n_airports)]
+    pairs = [(a, b) for a in codes for b in codes if a != b and rng.random() < 0.5]
+    rows = []
+    for n in range(n_flights):
+        dep_iata, arr_iata = rng.choice(pairs)
+        departure = rng.randrange(0, 2 * 24 * 60 - 60, 5)
+        arrival = departure + rng.randrange(30, 600, 5)
+
+        def stamp(minutes):
+            day = BASE_DATE + timedelta(days=minutes // (24 * 60))
+            return f"{day.isoformat()}T{minutes // 60 % 24:02d}:{minutes % 60:02d}:00+00:00"
+
+        rows.append((dep_iata, arr_iata, stamp(departure), stamp(arrival), dep_iata, arr_iata, "XX", f"XX{n}",
+                     "scheduled"))
+    return codes, rows
+
+
+def brute_force(graph, origin, destination, depart_after, depart_before, k, max_stops, min_connection,
+                max_connection):
+    """Every itinerary by depth-first search; the best (arrival, stops) per final flight, k best overall."""
+    best = {}  # final flight -> (arrival, stops)
+    o, d = graph.index[origin], graph.index[destination]
+    by_airport = {}
+    for flight in range(len(graph)):
+        by_airport.setdefault(graph.index[graph.details[flight][2]], []).append(flight)
+
+    def walk(airport, flights, visited):
+        if airport == d:
+            key = (graph.arr_time[flights[-1]], len(flights) - 1)
+            best[flights[-1]] = min(best.get(flights[-1], key), key)
+            return
+        if len(flights) > max_stops:
+            return
+        for flight in by_airport.get(airport, ()):
+            departure = graph.dep_time[flight]
+            if flights:
+                wait = departure - graph.arr_time[flights[-1]]
+                if not min_connection <= wait <= max_connection:
+                    continue
+            elif not depart_after <= departure <= depart_before:
+                continue
+            to = graph.index[graph.details[flight][3]]
+            if to not in visited:
+                walk(to, flights + [flight], visited | {to})
+
+    walk(o, [], {o})
+    return sorted(best.values())[:k]
+
+
+def summary(graph, itineraries):
+    return [(graph.arr_time[flights[-1]], len(flights) - 1) for flights in itineraries]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_search_matches_brute_force(seed):
+    rng = random.Random(seed)
+    codes, rows = random_schedule(rng, n_airports=rng.randint(4, 7), n_flights=rng.randint(20, 120))
+    graph = FlightGraph(rows, BASE_DATE)
+    settings = {"k": rng.choice([1, 3, 5]), "max_stops": rng.choice([0, 1, 2]),
+                "min_connection": rng.choice([0, 45]), "max_connection": rng.choice([180, 720])}
+    for _ in range(10):
+        origin, destination = rng.sample(graph.airports, 2)
+        depart_after = rng.randrange(0, 20 * 60, 15)
+        depart_before = min(depart_after + rng.choice([120, 480, 24 * 60]), 24 * 60 - 1)
+        found = graph.search(origin, destination, depart_after, depart_before, **settings)
+        expected = brute_force(graph, origin, destination, depart_after, depart_before, **settings)
+        assert summary(graph, found) == expected, (origin, destination, depart_after, depart_before, settings)
+
+
+def test_later_departure_arriving_earlier_is_found():
+    # From B the 10:00 is slow and the 11:00 fast; k=1 must still take the 11:00.
+    day = BASE_DATE.isoformat()
+    rows = [
+        ("A", "B", f"{day}T08:00:00", f"{day}T09:00:00", "A", "B", "XX", "XX1", "scheduled"),
+        ("B", "C", f"{day}T10:00:00", f"{day}T20:00:00", "B", "C", "XX", "XX2", "scheduled"),
+        ("B", "C", f"{day}T11:00:00", f"{day}T12:00:00", "B", "C", "XX", "XX3", "scheduled"),
+    ]
+    graph = FlightGraph(rows, BASE_DATE)
+    [flights] = graph.search("A", "C", k=1)
+    assert graph.itinerary(flights)["flight_number"] == "XX1 / XX3"
@@ -0,0 +1,125 @@
+# ttl_cache.py
+# Bounded cache with LRU eviction, a TTL, and stale-while-revalidate. Entries
+# live in a cache_backend: in this process by default, or in a cache server
+# shared by every replica on the host.
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from cache_backend import MemoryBackend
+import telemetry
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after `ttl` seconds.
+
+    With `stale_ttl` > 0, an expired entry younger than `ttl + stale_ttl` is still
+    returned immediately by get_or_load() while a background refresh replaces it.
+    Only values returned by the loader are cached; if the loader raises, nothing
+    is stored and the error propagates (or, for background refreshes, the stale
+    value is kept). `backend` defaults to a MemoryBackend of `max_entries`.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0, stale_ttl=0.0, refresh_workers=2, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend if backend is not None else MemoryBackend(max_entries)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="cache-refresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _lookup(self, key):
+        """Returns (value, state) with state in {"fresh", "stale", "miss"}."""
+        # The backend drops entries past ttl + stale_ttl itself.
+        entry = self.backend.get(key)
+        if entry is None:
+            return None, "miss"
+        value, stored_at = entry
+        age = self.backend.clock() - stored_at
+        if age < self.ttl:
+            return value, "fresh"
+        if age < self.ttl + self.stale_ttl:
+            return value, "stale"
+        return None, "miss"
+
+    def lookup(self, key):
+        """
+        Returns (value, state) with state "fresh", "stale" or "miss", and counts
+        it in the stats. For callers (like the async agents) that schedule their
+        own loads and refreshes instead of using get_or_load().
+        """
+        value, state = self._lookup(key)
+        with self._lock:
+            self._stats[{"fresh": "hits", "stale": "stale_hits", "miss": "misses"}[state]] += 1
+        return value, state
+
+    def record_refresh(self, succeeded):
+        with self._lock:
+            self._stats["refreshes" if succeeded else "refresh_errors"] += 1
+
+    def get(self, key):
+        """Returns the cached value if it is still fresh, else None."""
+        value, state = self._lookup(key)
+        with self._lock:
+            if state == "fresh":
+                self._stats["hits"] += 1
+                return value
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        if self.ttl + self.stale_ttl > 0:
+            self.backend.set(key, value, self.backend.clock(), self.ttl + self.stale_ttl)
+
+    def get_or_load(self, key, loader, refresh=None):
+        """
+        Returns the cached value for `key`, calling `loader()` on a miss.
+        Background refreshes call `refresh()` instead when given (e.g. the same
+        load at a lower priority).
+        """
+        value, state = self._lookup(key)
+        with self._lock:
+            if state == "fresh":
+                self._stats["hits"] += 1
+                return value
+            if state == "stale":
+                self._stats["stale_hits"] += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._refresh_pool.submit(self._refresh, key, refresh or loader)
+                return value
+            self._stats["misses"] += 1
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def _refresh(self, key, loader):
+        try:
+            value = loader()
+        except Exception as e:
+            telemetry.log(f"TTLCache: background refresh for {key} failed: {e}")
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+        else:
+            self.set(key, value)
+            with self._lock:
+                self._stats["refreshes"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(self.backend.stats())
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        stats.update(max_entries=self.max_entries, ttl=self.ttl, stale_ttl=self.stale_ttl)
+        return stats
@@ -1,6 +1,9 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import './App.css';
 
+// Pause in typing before /api/autocomplete is asked.
+const SUGGESTION_DELAY_MS = 150;
+
 function App() {
   const [formData, setFormData] = useState({ 
     city: '', 
@@ -16,9 +19,47 @@ function App() {
   });
   const [error, setError] = useState('');
   const [serviceStatus, setServiceStatus] = useState({});
+  const [suggestions, setSuggestions] = useState({ city: [], origin: [] });
+
+  // Per field: the pending debounce timer and the request in flight. Each
+  // keystroke cancels both, so only the latest query's suggestions land.
+  const suggestionTimers = useRef({});
+  const suggestionRequests = useRef({});
+
+  const fetchSuggestions = async (field, query, signal) => {
+    try {
+      const response = await fetch(
+        `http://127.0.0.1:5000/api/autocomplete?q=${encodeURIComponent(query)}&limit=6`, { signal });
+      const data = await response.json();
+      if (!signal.aborted) {
+        setSuggestions(current => ({ ...current, [field]: data.suggestions || [] }));
+      }
+    } catch (err) {
+      // Suggestions are a convenience; typing still works without them.
+    }
+  };
+
+  const scheduleSuggestions = (field, query) => {
+    clearTimeout(suggestionTimers.current[field]);
+    if (suggestionRequests.current[field]) {
+      suggestionRequests.current[field].abort();
+    }
+    if (query.trim().length < 2) {
+      setSuggestions(current => ({ ...current, [field]: [] }));
+      return;
+    }
+    suggestionTimers.current[field] = setTimeout(() => {
+      const controller = new AbortController();
+      suggestionRequests.current[field] = controller;
+      fetchSuggestions(field, query, controller.signal);
+    }, SUGGESTION_DELAY_MS);
+  };
 
   const handleInputChange = (e) => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
+    if (e.target.name === 'city' || e.target.name === 'origin') {
+      scheduleSuggestions(e.target.name, e.target.value);
+    }
   };
 
   const handleSubmit = async (e) => {
@@ -93,15 +134,25 @@ function App() {
             placeholder="Destination (e.g., Paris)"
             value={formData.city}
             onChange={handleInputChange}
+            list="city-suggestions"
+            autoComplete="off"
             required
           />
+          <datalist id="city-suggestions">
+            {suggestions.city.map(s => <option key={s.label} value={s.city}>{s.label}</option>)}
+          </datalist>
           <input
             name="origin"
             placeholder="Origin Airport (e.g., JFK)"
             value={formData.origin}
             onChange={handleInputChange}
+            list="origin-suggestions"
+            autoComplete="off"
             required
           />
+          <datalist id="origin-suggestions">
+            {suggestions.origin.map(s => <option key={s.label} value={s.iata}>{s.label}</option>)}
+          </datalist>
           <input
             name="travel_date"
             type="date"